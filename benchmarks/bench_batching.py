@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# Compares per-item pluggable method calls with a batched companion routed through call_batch.
+# Uses NumPy for the batched implementation when it is installed, a list comprehension otherwise.
+# Usage: python benchmarks/bench_batching.py [ITEMS]
+import sys
+import timeit
+
+import offshoot
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Shape(offshoot.Pluggable):
+
+    @offshoot.expected
+    def area(self, side):
+        raise NotImplementedError()
+
+    @offshoot.batched
+    def area_batch(self, sides):
+        raise NotImplementedError()
+
+
+class Square(Shape):
+
+    def area(self, side):
+        return side * side
+
+
+class BatchedSquare(Square):
+
+    def area_batch(self, sides):
+        if numpy is not None:
+            sides = numpy.asarray(sides)
+            return sides * sides
+
+        return [side * side for side in sides]
+
+
+def bench(items, number=5):
+    sides = list(range(items))
+
+    if numpy is not None:
+        sides = numpy.arange(items)
+
+    square = Square()
+    batched_square = BatchedSquare()
+
+    assert list(offshoot.call_batch(square, "area", sides)) == list(offshoot.call_batch(batched_square, "area", sides))
+
+    per_item_time = min(timeit.repeat(lambda: offshoot.call_batch(square, "area", sides), number=number, repeat=3)) / number
+    batched_time = min(timeit.repeat(lambda: offshoot.call_batch(batched_square, "area", sides), number=number, repeat=3)) / number
+
+    print("%9d items | per-item: %9.3f ms (%6.1f ns/item) | batched: %9.3f ms (%6.1f ns/item) | speedup: %6.1fx" % (
+        items,
+        per_item_time * 1000,
+        per_item_time / items * 1e9,
+        batched_time * 1000,
+        batched_time / items * 1e9,
+        per_item_time / batched_time
+    ))
+
+
+if __name__ == "__main__":
+    print("NumPy: %s" % ("yes" if numpy is not None else "no"))
+
+    if len(sys.argv) > 1:
+        bench(int(sys.argv[1]))
+    else:
+        for items in [1000, 100000, 1000000]:
+            bench(items)
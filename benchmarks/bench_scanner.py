@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# Compares the fast class header scanner with the full AST walk on a code-generated plugin file.
+# Usage: python benchmarks/bench_scanner.py [TABLE_ROWS]
+import sys
+import timeit
+
+from offshoot.scanner import scan_class_headers, ast_class_headers
+
+
+def generate_plugin_source(rows):
+    lines = [
+        "from shape import Shape",
+        "",
+        "TABLE = ["
+    ]
+
+    for i in range(rows):
+        lines.append("    (%d, %d.5, \"row-%d\", {\"key\": [%d, %d, %d]})," % (i, i, i, i, i + 1, i + 2))
+
+    lines.extend([
+        "]",
+        "",
+        "",
+        "class GeneratedShape(Shape):",
+        "    \"\"\"A shape backed by a generated lookup table.\"\"\"",
+        "",
+        "    def area(self):",
+        "        return TABLE[0][1]",
+        "",
+        "    def draw(self):",
+        "        return None",
+        ""
+    ])
+
+    return "\n".join(lines)
+
+
+def bench(rows, number=5):
+    source = generate_plugin_source(rows)
+
+    assert scan_class_headers(source) == ast_class_headers(source)
+
+    scanner_time = min(timeit.repeat(lambda: scan_class_headers(source), number=number, repeat=3)) / number
+    ast_time = min(timeit.repeat(lambda: ast_class_headers(source), number=number, repeat=3)) / number
+
+    print("%8d rows | %7.1f KB | scanner: %8.3f ms | ast.walk: %8.3f ms | speedup: %6.1fx" % (
+        rows,
+        len(source) / 1024,
+        scanner_time * 1000,
+        ast_time * 1000,
+        ast_time / scanner_time
+    ))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        bench(int(sys.argv[1]))
+    else:
+        for rows in [100, 1000, 10000, 50000]:
+            bench(rows)
@@ -1,9 +1,34 @@
 from offshoot.base import *
 
 from offshoot.plugin import Plugin, PluginError
-from offshoot.pluggable import Pluggable
-from offshoot.manifest import Manifest
+from offshoot.pluggable import Pluggable, call_batch
+from offshoot.manifest import Manifest, load_plugin_class
+from offshoot.registry import PluginRegistry
+
+import offshoot.metrics
+import offshoot.budgets
+import offshoot.index
+import offshoot.archives
+import offshoot.compiling
+import offshoot.store
+import offshoot.versions
+import offshoot.sync
+import offshoot.daemon
+import offshoot.locking
+
+from offshoot.budgets import PluginTimeoutError, PluginUnavailableError
+from offshoot.processes import PluginProcessProxy, process_proxies
+from offshoot.fanout import map, imap, gather, PluginResult
+from offshoot.hooks import hook_chain, dispatch
+from offshoot.pools import PluginInstancePool, instance_pools
+from offshoot.caching import cached
+from offshoot.prefetching import prefetch
+from offshoot.forking import preload
+from offshoot.unloading import unload
 
 
 config = load_configuration("offshoot.yml")
 pluggable_classes = lambda: map_pluggable_classes(config)
+pluggable_directives = lambda: map_pluggable_directives(config)
+
+offshoot.archives.install_finder()
@@ -0,0 +1,252 @@
+import os
+import sys
+import shutil
+import zipfile
+import threading
+import importlib.abc
+import importlib.util
+
+import offshoot
+
+
+archive_extension = ".zip"
+
+_archives = dict()
+_lock = threading.Lock()
+
+
+class PluginArchive:
+    # The member index is read once; sources and code objects are cached as they get used
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+        stat = os.stat(file_path)
+        self.signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+        self._zip_file = zipfile.ZipFile(file_path)
+        self.members = {info.filename: info for info in self._zip_file.infolist()}
+
+        self.directories = set()
+
+        for member in self.members:
+            parts = member.rstrip("/").split("/")
+
+            for i in range(1, len(parts)):
+                self.directories.add("/".join(parts[:i]))
+
+        self._sources = dict()
+        self._code = dict()
+        self._lock = threading.Lock()
+
+    def has(self, member):
+        return member in self.members
+
+    def is_directory(self, member):
+        return member in self.directories
+
+    def read(self, member):
+        source = self._sources.get(member)
+
+        if source is None:
+            if member not in self.members:
+                raise FileNotFoundError("'%s' is not in the '%s' plugin archive." % (member, self.file_path))
+
+            with self._lock:
+                source = self._sources[member] = self._zip_file.read(member)
+
+        return source
+
+    def code(self, member):
+        code = self._code.get(member)
+
+        if code is None:
+            code = self._code[member] = compile(self.read(member), self.path(member), "exec", dont_inherit=True)
+
+        return code
+
+    def path(self, member):
+        return os.path.join(self.file_path, *member.split("/"))
+
+    def close(self):
+        self._zip_file.close()
+
+
+class ArchiveFinder(importlib.abc.MetaPathFinder):
+
+    def find_spec(self, fullname, path, target=None):
+        prefix = plugins_package() + "."
+
+        if not fullname.startswith(prefix):
+            return None
+
+        parts = fullname[len(prefix):].split(".")
+        archive = archive_for(parts[0])
+
+        if archive is None:
+            return None
+
+        member = "/".join(parts)
+
+        if archive.has(member + "/__init__.py"):
+            member_file, is_package = member + "/__init__.py", True
+        elif archive.has(member + ".py"):
+            member_file, is_package = member + ".py", False
+        elif archive.is_directory(member):
+            member_file, is_package = None, True
+        else:
+            return None
+
+        loader = ArchiveLoader(archive, member_file, is_package)
+
+        spec = importlib.util.spec_from_loader(fullname, loader, origin=archive.path(member_file) if member_file else None, is_package=is_package)
+        spec.has_location = member_file is not None
+
+        if is_package:
+            spec.submodule_search_locations = [archive.path(member)]
+
+        return spec
+
+    def invalidate_caches(self):
+        invalidate()
+
+
+class ArchiveLoader(importlib.abc.InspectLoader):
+
+    def __init__(self, archive, member_file, is_package):
+        self.archive = archive
+        self.member_file = member_file
+        self.package = is_package
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        code = self.get_code(module.__name__)
+
+        if code is not None:
+            exec(code, module.__dict__)
+
+    def get_code(self, fullname):
+        return self.archive.code(self.member_file) if self.member_file else None
+
+    def get_source(self, fullname):
+        return self.archive.read(self.member_file).decode("utf-8") if self.member_file else ""
+
+    def is_package(self, fullname):
+        return self.package
+
+
+def plugins_package():
+    return offshoot.config["file_paths"]["plugins"].replace(os.sep, ".")
+
+
+def archive_path_for(plugin_name):
+    return os.path.join(offshoot.config["file_paths"]["plugins"], plugin_name + archive_extension)
+
+
+def archive_for(plugin_name):
+    if plugin_name in _archives:
+        return _archives[plugin_name]
+
+    with _lock:
+        if plugin_name not in _archives:
+            archive_path = archive_path_for(plugin_name)
+
+            # A plain plugin directory always wins over an archive of the same name
+            if os.path.isdir(os.path.join(offshoot.config["file_paths"]["plugins"], plugin_name)) or not os.path.isfile(archive_path):
+                _archives[plugin_name] = None
+            else:
+                _archives[plugin_name] = PluginArchive(archive_path)
+
+    return _archives[plugin_name]
+
+
+def archived_member(file_path):
+    plugins_directory = os.path.normpath(offshoot.config["file_paths"]["plugins"])
+    relative_path = os.path.relpath(os.path.normpath(file_path), plugins_directory)
+
+    if relative_path.startswith(os.pardir) or os.sep not in relative_path:
+        return None
+
+    archive = archive_for(relative_path.split(os.sep)[0])
+
+    if archive is None:
+        return None
+
+    return archive, relative_path.replace(os.sep, "/")
+
+
+def read_plugin_file(file_path):
+    archived = archived_member(file_path)
+
+    if archived is None:
+        with open(file_path, "rb") as f:
+            return f.read()
+
+    return archived[0].read(archived[1])
+
+
+def plugin_file_signature(file_path):
+    archived = archived_member(file_path)
+
+    if archived is None:
+        return offshoot.registry.file_signature(file_path)
+
+    archive, member = archived
+    signature = offshoot.registry.file_signature(archive.file_path)
+
+    # A replaced archive gets indexed again on next use
+    if signature != archive.signature:
+        invalidate(archive_name=os.path.basename(archive.file_path)[:-len(archive_extension)])
+        return signature
+
+    return signature if archive.has(member) else None
+
+
+def invalidate(archive_name=None):
+    with _lock:
+        archive_names = [archive_name] if archive_name is not None else list(_archives)
+
+        # Dropped archives aren't closed: loaders of modules imported from them may still read from them.
+        # Their ZipFile is closed once the last of those loaders is gone.
+        for name in archive_names:
+            _archives.pop(name, None)
+
+
+def pack(plugin_name, remove_directory=False):
+    plugin_directory = os.path.join(offshoot.config["file_paths"]["plugins"], plugin_name)
+    archive_path = archive_path_for(plugin_name)
+
+    with zipfile.ZipFile(archive_path + ".tmp", "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for directory, directory_names, file_names in os.walk(plugin_directory):
+            directory_names[:] = sorted(name for name in directory_names if name != "__pycache__")
+
+            for file_name in sorted(file_names):
+                if file_name.endswith(".pyc"):
+                    continue
+
+                file_path = os.path.join(directory, file_name)
+                zip_file.write(file_path, os.path.relpath(file_path, offshoot.config["file_paths"]["plugins"]).replace(os.sep, "/"))
+
+    os.replace(archive_path + ".tmp", archive_path)
+
+    if remove_directory:
+        shutil.rmtree(plugin_directory)
+
+    invalidate(plugin_name)
+
+    return archive_path
+
+
+def module_runner_arguments(plugin_name, module):
+    if archive_for(plugin_name) is None:
+        return ["-m", module]
+
+    # 'python -m' resolves the module before offshoot is imported, so it can't see archived plugins
+    return ["-c", "import offshoot, runpy; runpy.run_module(%r, run_name='__main__', alter_sys=True)" % module]
+
+
+def install_finder():
+    if not any(isinstance(finder, ArchiveFinder) for finder in sys.meta_path):
+        sys.meta_path.insert(0, ArchiveFinder())
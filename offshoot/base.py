@@ -3,12 +3,24 @@ import warnings
 
 import sys
 import inspect
+import importlib
 import os
 
 import ast
 
-from offshoot.pluggable import Pluggable
+from offshoot.pluggable import Pluggable, find_decorators, directives_for_decorators, batched_pairing_errors
 from offshoot.manifest import Manifest
+from offshoot.scanner import class_headers
+from offshoot.archives import read_plugin_file, invalidate as invalidate_archives
+from offshoot.compiling import default_bytecode_configuration
+from offshoot.registry import PluginRegistry, default_check_interval
+
+
+pluggable_callbacks = ["on_file_install", "on_file_uninstall"]
+
+_directive_table_cache = dict()
+
+plugin_registry = PluginRegistry()
 
 
 def default_configuration():
@@ -17,7 +29,9 @@ def default_configuration():
         "file_paths": {
             "plugins": "plugins",
             "config": "config/config.plugins.yml".replace("/", os.sep),
-            "libraries": "requirements.plugins.txt"
+            "libraries": "requirements.plugins.txt",
+            "socket": "offshoot.sock",
+            "store": "offshoot.store"
         },
         "allow": {
             "files": True,
@@ -26,7 +40,12 @@ def default_configuration():
             "libraries": True,
             "callbacks": True
         },
-        "sandbox_configuration_keys": True
+        "sandbox_configuration_keys": True,
+        "static_pluggables": False,
+        "discovery_index": False,
+        "discovery_check_interval": default_check_interval,
+        "content_store": False,
+        "bytecode": default_bytecode_configuration()
     }
 
 
@@ -51,8 +70,7 @@ def map_pluggable_classes(config):
 
     for m in config.get("modules"):
         try:
-            exec("import %s" % m)
-            classes = inspect.getmembers(sys.modules[m], inspect.isclass)
+            classes = inspect.getmembers(importlib.import_module(m), inspect.isclass)
 
             for c in classes:
                 if not issubclass(c[1], Pluggable):
@@ -65,37 +83,131 @@ def map_pluggable_classes(config):
     return pluggable_classes
 
 
-def validate_plugin_file(file_path, pluggable, directives):
-    is_valid = True
-    messages = list()
+def map_pluggable_directives(config):
+    class_entries = dict()
+
+    for m in config.get("modules"):
+        module_file_path = find_module_file(m)
+
+        if module_file_path is None:
+            warnings.warn("'%s' does not appear to be a valid module. Skipping!" % m)
+            continue
+
+        for class_entry in module_directive_table(module_file_path):
+            class_entries[class_entry["name"]] = dict(module=m, file_path=module_file_path, **class_entry)
+
+    pluggable_directives = dict()
+    pluggable_names = {"Pluggable"}
+
+    while True:
+        new_names = [name for name, entry in class_entries.items() if name not in pluggable_names and pluggable_names.intersection(entry["bases"])]
+
+        if not len(new_names):
+            break
+
+        pluggable_names.update(new_names)
+
+    for name, entry in class_entries.items():
+        if name not in pluggable_names:
+            continue
+
+        # Callbacks are inherited from every pluggable ancestor, not only from the direct bases
+        callbacks = set()
+        ancestors = [name]
+        visited = set()
+
+        while len(ancestors):
+            ancestor = ancestors.pop()
+
+            if ancestor in visited or ancestor not in class_entries:
+                continue
+
+            visited.add(ancestor)
+
+            callbacks.update(class_entries[ancestor]["callbacks"])
+            ancestors.extend(base for base in class_entries[ancestor]["bases"] if base in pluggable_names)
+
+        pluggable_directives[name] = {
+            "module": entry["module"],
+            "file_path": entry["file_path"],
+            "directives": entry["directives"],
+            "callbacks": sorted(callbacks),
+            "errors": batched_pairing_errors(entry["directives"])
+        }
+
+    return pluggable_directives
+
+
+def module_directive_table(file_path):
+    stat = os.stat(file_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _directive_table_cache.get(file_path)
+
+    if cached is not None and cached[0] == signature:
+        return cached[1]
 
     with open(file_path, "r") as f:
         syntax_tree = ast.parse(f.read())
 
-    seen_pluggable = False
+    directive_table = list()
+
+    for statement in syntax_tree.body:
+        if not isinstance(statement, ast.ClassDef):
+            continue
 
-    for statement in ast.walk(syntax_tree):
-        if isinstance(statement, ast.ClassDef):
-            class_name = statement.name
+        decorated_methods = find_decorators(statement)
 
-            current_expected = directives["expected"][:]
-            bases = list(map(lambda b: b.id if isinstance(b, ast.Name) else b.attr, statement.bases))
+        directive_table.append({
+            "name": statement.name,
+            "bases": [b.id if isinstance(b, ast.Name) else b.attr for b in statement.bases if isinstance(b, (ast.Name, ast.Attribute))],
+            "directives": directives_for_decorators(decorated_methods),
+            "callbacks": [callback for callback in pluggable_callbacks if callback in decorated_methods]
+        })
 
-            if pluggable in bases:
-                seen_pluggable = True
+    _directive_table_cache[file_path] = (signature, directive_table)
 
-                for body_item in statement.body:
-                    if isinstance(body_item, ast.FunctionDef):
-                        if body_item.name in directives["forbidden"]:
-                            is_valid = False
-                            messages.append("%s: '%s' method should not appear in the class." % (class_name, body_item.name))
+    return directive_table
 
-                        if body_item.name in current_expected:
-                            current_expected.remove(body_item.name)
 
-                if len(current_expected):
+def find_module_file(module):
+    module_path = module.replace("/", ".").split(".")
+
+    for path in sys.path:
+        base_path = os.path.join(path or os.getcwd(), *module_path)
+
+        for file_path in ["%s.py" % base_path, os.path.join(base_path, "__init__.py")]:
+            if os.path.isfile(file_path):
+                return file_path
+
+    return None
+
+
+def validate_plugin_file(file_path, pluggable, directives):
+    is_valid = True
+    messages = list()
+
+    headers = class_headers(read_plugin_file(file_path).decode("utf-8"))
+
+    seen_pluggable = False
+
+    for class_name, bases, methods in headers:
+        current_expected = directives["expected"][:]
+
+        if pluggable in bases:
+            seen_pluggable = True
+
+            for method in methods:
+                if method in directives["forbidden"]:
                     is_valid = False
-                    messages.append("%s: Some expected methods are missing from the class: %s" % (class_name, ", ".join(current_expected)))
+                    messages.append("%s: '%s' method should not appear in the class." % (class_name, method))
+
+                if method in current_expected:
+                    current_expected.remove(method)
+
+            if len(current_expected):
+                is_valid = False
+                messages.append("%s: Some expected methods are missing from the class: %s" % (class_name, ", ".join(current_expected)))
 
     if seen_pluggable is False:
         is_valid = False
@@ -116,64 +228,34 @@ def installed_plugins():
     return installed
 
 
-def discover(pluggable, scope=None, selection=None):
-    manifest = Manifest()
-
-    plugin_file_paths = manifest.plugin_files_for_pluggable(pluggable)
-
-    valid_class_names = list()
-    import_statements = list()
+def discover(pluggable, scope=None, selection=None, fresh=False):
+    class_mapping = plugin_registry.discover(pluggable, selection=selection, fresh=fresh)
 
-    for plugin_file_path, pluggable in plugin_file_paths:
-        plugin_module = plugin_file_path.replace(os.sep, ".").replace(".py", "")
-
-        valid, plugin_class = file_contains_pluggable(plugin_file_path, pluggable)
+    if scope is not None:
+        scope.update(class_mapping)
+        return dict()
 
-        if valid:
-            if selection:
-                if isinstance(selection, str):
-                    selection = [selection]
-                        
-                if not plugin_class in selection:
-                    continue
-            
-            valid_class_names.append(plugin_class)
-            import_statements.append("from %s import %s" % (plugin_module, plugin_class))
+    return dict(class_mapping)
 
-    for import_statement in import_statements:
-        if scope is not None:
-            exec(import_statement, scope)
-        else:
-            exec(import_statement)
 
-    if scope is None:
-        class_mapping = dict()
+def invalidate_discovery(pluggable=None):
+    plugin_registry.invalidate(pluggable)
 
-        for valid_class_name in valid_class_names:
-            class_mapping[valid_class_name] = eval(valid_class_name)
-
-        return class_mapping
-    else:
-        return dict()
+    if pluggable is None:
+        invalidate_archives()
 
 
 def file_contains_pluggable(file_path, pluggable):
     plugin_class = None
 
     try:
-        with open(file_path, "r") as f:
-            syntax_tree = ast.parse(f.read())
+        headers = class_headers(read_plugin_file(file_path).decode("utf-8"))
     except FileNotFoundError:
         return [False, None]
 
-    for statement in ast.walk(syntax_tree):
-        if isinstance(statement, ast.ClassDef):
-            class_name = statement.name
-
-            bases = list(map(lambda b: b.id if isinstance(b, ast.Name) else b.attr, statement.bases))
-
-            if pluggable in bases:
-                plugin_class = class_name
+    for class_name, bases, methods in headers:
+        if pluggable in bases:
+            plugin_class = class_name
 
     return [plugin_class is not None, plugin_class]
 
@@ -182,9 +264,9 @@ def executable_hook(plugin_class):
     command = sys.argv[1]
 
     if command == "install":
-        plugin_class.install()
+        plugin_class.install(force="--force" in sys.argv[2:])
     elif command == "uninstall":
-        plugin_class.uninstall()
+        plugin_class.uninstall(cascade="--cascade" in sys.argv[2:])
 
 
 # Magic Validation Decorators
@@ -198,3 +280,9 @@ def expected(func):
 
 def forbidden(func):
     return func
+
+
+def batched(func):
+    # Tags the pluggable's placeholder so that call_batch can tell when a plugin leaves it unimplemented
+    func.__offshoot_batched__ = True
+    return func
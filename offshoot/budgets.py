@@ -0,0 +1,284 @@
+import time
+import asyncio
+import inspect
+import threading
+import concurrent.futures
+
+import offshoot
+
+from offshoot.plugin import PluginError
+from offshoot.forking import after_fork_in_child
+from offshoot.pluggable import pluggable_class_for
+from offshoot.wrappers import wrap_method
+
+
+default_failure_threshold = 5
+default_cooldown = 30.0
+
+# Each plugin gets its own threads: a plugin that hangs can only exhaust its own
+max_workers_per_plugin = 4
+
+_budget_states = dict()
+_plugin_executors = dict()
+
+_lock = threading.Lock()
+
+
+class PluginTimeoutError(PluginError):
+    pass
+
+
+class PluginUnavailableError(PluginError):
+    pass
+
+
+class BudgetState:
+
+    def __init__(self, plugin, pluggable, method, budget):
+        self.plugin = plugin
+        self.pluggable = pluggable
+        self.method = method
+        self.budget = budget
+
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.short_circuits = 0
+        self.rejections = 0
+        self.fallbacks = 0
+
+        self.consecutive_timeouts = 0
+        self.opened_at = None
+        self.probing = False
+
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        with self.lock:
+            self.calls += 1
+
+            if self.opened_at is None:
+                return True
+
+            # Half-open: after the cooldown, a single probe call goes through while the others keep short-circuiting
+            if not self.probing and time.monotonic() - self.opened_at >= self.budget.get("cooldown", default_cooldown):
+                self.probing = True
+                return True
+
+            self.short_circuits += 1
+
+            return False
+
+    def rejected(self):
+        with self.lock:
+            self.rejections += 1
+            self.probing = False
+
+    def succeeded(self):
+        with self.lock:
+            self.consecutive_timeouts = 0
+            self.opened_at = None
+            self.probing = False
+
+    def timed_out(self):
+        with self.lock:
+            self.timeouts += 1
+            self.consecutive_timeouts += 1
+
+            if self.opened_at is not None or self.consecutive_timeouts >= self.budget.get("failure_threshold", default_failure_threshold):
+                self.opened_at = time.monotonic()
+
+            self.probing = False
+
+    def failed(self):
+        with self.lock:
+            self.errors += 1
+
+            # A probe that raised did not prove the plugin healthy: the cooldown starts over
+            if self.probing:
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def fallback(self, error):
+        if "fallback" not in self.budget:
+            raise error
+
+        with self.lock:
+            self.fallbacks += 1
+
+        return self.budget["fallback"]
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "pluggable": self.pluggable,
+                "timeout": self.budget["timeout"],
+                "calls": self.calls,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "short_circuits": self.short_circuits,
+                "rejections": self.rejections,
+                "fallbacks": self.fallbacks,
+                "open": self.is_open
+            }
+
+    def reset(self):
+        with self.lock:
+            self.calls = 0
+            self.timeouts = 0
+            self.errors = 0
+            self.short_circuits = 0
+            self.rejections = 0
+            self.fallbacks = 0
+
+            self.consecutive_timeouts = 0
+            self.opened_at = None
+            self.probing = False
+
+
+def budgets_for(pluggable_class, pluggable):
+    budgets = dict()
+
+    for method, budget in (getattr(pluggable_class, "budgets", None) or dict()).items():
+        budgets[method] = dict(budget)
+
+    for method, budget in ((offshoot.config.get("budgets") or dict()).get(pluggable) or dict()).items():
+        budgets[method] = {**budgets.get(method, dict()), **budget}
+
+    return {method: budget for method, budget in budgets.items() if budget.get("timeout") is not None}
+
+
+def enforce_class(plugin_class, pluggable, metadata):
+    pluggable_class = pluggable_class_for(plugin_class, pluggable)
+
+    if pluggable_class is None:
+        return None
+
+    for name, budget in budgets_for(pluggable_class, pluggable).items():
+        key = (metadata.get("plugin"), "%s.%s" % (plugin_class.__name__, name))
+
+        with _lock:
+            state = _budget_states.setdefault(key, BudgetState(key[0], pluggable, key[1], budget))
+
+        wrap_method(plugin_class, name, "budgets", lambda func, state=state: _budgeted(func, state))
+
+
+def snapshot():
+    budgets = dict()
+
+    with _lock:
+        budget_states = list(_budget_states.items())
+
+    for (plugin, method), state in budget_states:
+        budgets.setdefault(plugin, dict())[method] = state.snapshot()
+
+    return budgets
+
+
+def reset():
+    with _lock:
+        budget_states = list(_budget_states.values())
+
+    for state in budget_states:
+        state.reset()
+
+
+def _budgeted(func, state):
+    def wrapper(*args, **kwargs):
+        if not state.allow():
+            return state.fallback(_unavailable_error(state))
+
+        executor, slots = _executor_for(state.plugin)
+
+        # Every thread of the plugin is busy (or hung): the call fails right away instead of queueing
+        if not slots.acquire(blocking=False):
+            state.rejected()
+            return state.fallback(_saturated_error(state))
+
+        try:
+            future = executor.submit(func, *args, **kwargs)
+        except BaseException:
+            slots.release()
+            raise
+
+        future.add_done_callback(lambda f: slots.release())
+
+        try:
+            result = future.result(timeout=state.budget["timeout"])
+        except concurrent.futures.TimeoutError:
+            state.timed_out()
+            return state.fallback(_timeout_error(state))
+        except Exception:
+            state.failed()
+            raise
+
+        state.succeeded()
+
+        return result
+
+    async def async_wrapper(*args, **kwargs):
+        if not state.allow():
+            return state.fallback(_unavailable_error(state))
+
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), timeout=state.budget["timeout"])
+        except asyncio.TimeoutError:
+            state.timed_out()
+            return state.fallback(_timeout_error(state))
+        except Exception:
+            state.failed()
+            raise
+
+        state.succeeded()
+
+        return result
+
+    return async_wrapper if inspect.iscoroutinefunction(func) else wrapper
+
+
+def _timeout_error(state):
+    return PluginTimeoutError("%s (%s) missed its latency budget of %ss." % (state.method, state.plugin, state.budget["timeout"]))
+
+
+def _unavailable_error(state):
+    return PluginUnavailableError("%s (%s) is skipped after missing its latency budget repeatedly." % (state.method, state.plugin))
+
+
+def _saturated_error(state):
+    return PluginUnavailableError("%s (%s) is skipped: all %s of its threads are busy." % (state.method, state.plugin, max_workers_per_plugin))
+
+
+def _executor_for(plugin):
+    plugin_executor = _plugin_executors.get(plugin)
+
+    if plugin_executor is None:
+        with _lock:
+            plugin_executor = _plugin_executors.get(plugin)
+
+            if plugin_executor is None:
+                plugin_executor = _plugin_executors[plugin] = (
+                    concurrent.futures.ThreadPoolExecutor(max_workers=max_workers_per_plugin, thread_name_prefix="offshoot-budget-%s" % plugin),
+                    threading.BoundedSemaphore(max_workers_per_plugin)
+                )
+
+    return plugin_executor
+
+
+@after_fork_in_child
+def _reset_after_fork():
+    global _lock, _plugin_executors
+
+    _lock = threading.Lock()
+
+    # The executors' threads don't exist in the child: new executors get created on the next call
+    _plugin_executors = dict()
+
+    for state in _budget_states.values():
+        state.lock = threading.Lock()
+
+
+offshoot.plugin_registry.add_class_hook(enforce_class)
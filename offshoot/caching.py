@@ -0,0 +1,187 @@
+import time
+import inspect
+import weakref
+import functools
+import threading
+import collections
+
+import offshoot
+
+from offshoot.forking import after_fork_in_child
+
+
+default_maxsize = 128
+
+_caches = weakref.WeakSet()
+_plugin_identities = weakref.WeakKeyDictionary()
+
+_lock = threading.Lock()
+
+
+class ResultCache:
+
+    def __init__(self, name, maxsize=default_maxsize, ttl=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return True, entry[1]
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+
+            while self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def discard_plugin(self, plugin):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == plugin]:
+                del self._entries[key]
+
+    def info(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl
+            }
+
+
+def cached(func=None, maxsize=default_maxsize, ttl=None):
+    if func is None:
+        return lambda func: cached(func, maxsize=maxsize, ttl=ttl)
+
+    cache = ResultCache("%s.%s" % (func.__module__, func.__qualname__), maxsize=maxsize, ttl=ttl)
+    is_method = next(iter(inspect.signature(func).parameters), None) in ("self", "cls")
+
+    with _lock:
+        _caches.add(cache)
+
+    def key_for(args, kwargs):
+        if is_method and len(args):
+            owner = args[0] if isinstance(args[0], type) else type(args[0])
+            return plugin_identity(owner) + (owner.__qualname__, args[1:], tuple(sorted(kwargs.items())))
+
+        return (None, None, None, args, tuple(sorted(kwargs.items())))
+
+    def lookup(args, kwargs):
+        key = key_for(args, kwargs)
+
+        try:
+            return key, cache.get(key)
+        except TypeError:
+            # Unhashable arguments can't be part of a key: the call goes through uncached
+            return None, (False, None)
+
+    def wrapper(*args, **kwargs):
+        key, (hit, value) = lookup(args, kwargs)
+
+        if hit:
+            return value
+
+        value = func(*args, **kwargs)
+
+        if key is not None:
+            cache.set(key, value)
+
+        return value
+
+    async def async_wrapper(*args, **kwargs):
+        key, (hit, value) = lookup(args, kwargs)
+
+        if hit:
+            return value
+
+        # The awaited result is cached: a coroutine object can only be awaited once
+        value = await func(*args, **kwargs)
+
+        if key is not None:
+            cache.set(key, value)
+
+        return value
+
+    wrapper = functools.wraps(func)(async_wrapper if inspect.iscoroutinefunction(func) else wrapper)
+
+    wrapper.cache = cache
+    wrapper.cache_info = cache.info
+    wrapper.cache_clear = cache.clear
+
+    return wrapper
+
+
+def plugin_identity(plugin_class):
+    generation = offshoot.plugin_registry.generation
+    identity = _plugin_identities.get(plugin_class)
+
+    # The manifest version is looked up again whenever the registry changed, so an upgrade yields new keys
+    if identity is None or identity[0] != generation:
+        metadata = offshoot.plugin_registry.class_metadata(plugin_class) or dict()
+        identity = _plugin_identities[plugin_class] = (generation, (metadata.get("plugin"), metadata.get("version")))
+
+    return identity[1]
+
+
+def snapshot():
+    with _lock:
+        caches = list(_caches)
+
+    return {cache.name: cache.info() for cache in caches}
+
+
+def clear(plugin=None):
+    with _lock:
+        caches = list(_caches)
+
+    for cache in caches:
+        if plugin is None:
+            cache.clear()
+        else:
+            cache.discard_plugin(plugin)
+
+
+@after_fork_in_child
+def _reset_locks_after_fork():
+    global _lock
+
+    _lock = threading.Lock()
+
+    for cache in list(_caches):
+        cache._lock = threading.Lock()
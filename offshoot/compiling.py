@@ -0,0 +1,117 @@
+import os
+import shutil
+import py_compile
+import concurrent.futures
+
+import offshoot
+
+
+invalidation_modes = {
+    "timestamp": py_compile.PycInvalidationMode.TIMESTAMP,
+    "checked_hash": py_compile.PycInvalidationMode.CHECKED_HASH,
+    "unchecked_hash": py_compile.PycInvalidationMode.UNCHECKED_HASH
+}
+
+
+def default_bytecode_configuration():
+    return {
+        "precompile": True,
+        "optimization": -1,
+        "invalidation_mode": "checked_hash",
+        "workers": None
+    }
+
+
+def bytecode_config():
+    return {**default_bytecode_configuration(), **(offshoot.config.get("bytecode") or dict())}
+
+
+def plugin_directory_for(plugin_name):
+    return os.path.join(offshoot.config["file_paths"]["plugins"], plugin_name)
+
+
+def plugin_source_files(plugin_name):
+    return directory_source_files(plugin_directory_for(plugin_name))
+
+
+def directory_source_files(plugin_directory):
+    source_files = list()
+
+    for directory, directory_names, file_names in os.walk(plugin_directory):
+        directory_names[:] = sorted(name for name in directory_names if name != "__pycache__")
+        source_files.extend(os.path.join(directory, name) for name in sorted(file_names) if name.endswith(".py"))
+
+    return source_files
+
+
+def compile_plugins(plugin_names, optimization=None, invalidation_mode=None, workers=None):
+    # Archived plugins keep their code objects in memory, there is nothing on disk to write
+    plugin_directories = [plugin_directory_for(name) for name in plugin_names if offshoot.archives.archive_for(name) is None]
+
+    return compile_directories(plugin_directories, optimization=optimization, invalidation_mode=invalidation_mode, workers=workers)
+
+
+def compile_directories(plugin_directories, optimization=None, invalidation_mode=None, workers=None):
+    config = bytecode_config()
+
+    optimization = config["optimization"] if optimization is None else optimization
+    invalidation_mode = invalidation_modes[invalidation_mode or config["invalidation_mode"]]
+
+    source_files = list()
+
+    for plugin_directory in plugin_directories:
+        remove_stale_bytecode(plugin_directory)
+        source_files.extend(directory_source_files(plugin_directory))
+
+    workers = min(workers or config["workers"] or os.cpu_count() or 1, len(source_files))
+
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            errors = list(executor.map(_compile_file, source_files, [optimization] * len(source_files), [invalidation_mode] * len(source_files)))
+    else:
+        errors = [_compile_file(file_path, optimization, invalidation_mode) for file_path in source_files]
+
+    return {file_path: error for file_path, error in zip(source_files, errors) if error is not None}
+
+
+def compile_plugin(plugin_name, optimization=None, invalidation_mode=None, workers=None):
+    return compile_plugins([plugin_name], optimization=optimization, invalidation_mode=invalidation_mode, workers=workers)
+
+
+def remove_stale_bytecode(plugin_directory):
+    removed_files = list()
+
+    for directory, directory_names, file_names in os.walk(plugin_directory):
+        if os.path.basename(directory) != "__pycache__":
+            continue
+
+        for file_name in file_names:
+            source_file_path = os.path.join(os.path.dirname(directory), file_name.split(".")[0] + ".py")
+
+            if not os.path.isfile(source_file_path):
+                os.remove(os.path.join(directory, file_name))
+                removed_files.append(os.path.join(directory, file_name))
+
+    return removed_files
+
+
+def remove_bytecode(plugin_name):
+    removed_directories = list()
+
+    for directory, directory_names, file_names in os.walk(plugin_directory_for(plugin_name)):
+        if "__pycache__" in directory_names:
+            directory_names.remove("__pycache__")
+
+            shutil.rmtree(os.path.join(directory, "__pycache__"))
+            removed_directories.append(os.path.join(directory, "__pycache__"))
+
+    return removed_directories
+
+
+def _compile_file(file_path, optimization, invalidation_mode):
+    try:
+        py_compile.compile(file_path, optimize=optimization, invalidation_mode=invalidation_mode, doraise=True)
+    except (py_compile.PyCompileError, OSError) as e:
+        return str(e)
+
+    return None
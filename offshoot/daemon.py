@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import socket
+import importlib
+import subprocess
+import socketserver
+
+import offshoot
+
+from offshoot.plugin import PluginError
+
+
+default_socket_path = "offshoot.sock"
+
+client_timeout = 30.0
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        if os.path.exists(socket_path):
+            if _is_listening(socket_path):
+                raise PluginError("Another Offshoot daemon is already listening on '%s'." % socket_path)
+
+            # Left behind by a daemon that didn't shut down cleanly
+            os.remove(socket_path)
+
+        self.socket_path = socket_path
+
+        socketserver.UnixStreamServer.__init__(self, socket_path, DaemonRequestHandler)
+
+    def handle_command(self, command, args):
+        handler = getattr(self, "command_%s" % command, None)
+
+        if handler is None:
+            raise PluginError("'%s' is not a valid Offshoot daemon command." % command)
+
+        return handler(**args)
+
+    def command_ping(self):
+        return os.getpid()
+
+    def command_discover(self, pluggable, selection=None):
+        entry = offshoot.plugin_registry.entry(pluggable, selection=selection)
+
+        return {
+            class_name: {key: entry.metadata[class_name][key] for key in ["module", "plugin", "version"]}
+            for class_name in entry.classes
+        }
+
+    def command_installed(self):
+        return offshoot.Manifest().list_plugins()
+
+    def command_directives(self):
+        return offshoot.map_pluggable_directives(offshoot.config)
+
+    def command_validate(self, file_path, pluggable):
+        directives = offshoot.map_pluggable_directives(offshoot.config).get(pluggable)
+
+        if directives is None:
+            return [False, ["'%s' is not a known pluggable." % pluggable]]
+
+        return offshoot.validate_plugin_file(file_path, pluggable, directives["directives"])
+
+    def command_install(self, plugin, force=False):
+        return self.run_plugin_command(plugin, "install", "--force" if force else None)
+
+    def command_uninstall(self, plugin, cascade=False):
+        return self.run_plugin_command(plugin, "uninstall", "--cascade" if cascade else None)
+
+    def run_plugin_command(self, plugin, *command):
+        # Held for the plugin process too: installs from concurrent clients, the CLI, stage, activate and sync run one at a time
+        with offshoot.Manifest().lock():
+            result = _run_plugin_command(plugin, [argument for argument in command if argument is not None])
+
+            offshoot.invalidate_discovery()
+
+        return result
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode("utf-8"))
+                response = {"result": self.server.handle_command(request["command"], request.get("args") or dict())}
+            except Exception as e:
+                response = {"error": str(e), "error_type": type(e).__name__}
+
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class DaemonClient:
+
+    def __init__(self, socket_path=None, timeout=client_timeout):
+        self.socket_path = socket_path or socket_path_for(offshoot.config)
+        self.timeout = timeout
+
+    def request(self, command, **args):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(self.timeout)
+            connection.connect(self.socket_path)
+
+            connection.sendall((json.dumps({"command": command, "args": args}) + "\n").encode("utf-8"))
+
+            with connection.makefile("rb") as f:
+                response = json.loads(f.readline().decode("utf-8"))
+
+        if "error" in response:
+            raise PluginError("%s: %s" % (response["error_type"], response["error"]))
+
+        return response["result"]
+
+    def is_available(self):
+        try:
+            self.request("ping")
+        except (OSError, ValueError):
+            return False
+
+        return True
+
+
+def serve(socket_path=None):
+    server = DaemonServer(socket_path or socket_path_for(offshoot.config))
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def discover(pluggable, selection=None, socket_path=None):
+    try:
+        classes = DaemonClient(socket_path=socket_path).request("discover", pluggable=pluggable, selection=selection)
+    except OSError:
+        return offshoot.discover(pluggable, selection=selection)
+
+    return {class_name: getattr(importlib.import_module(metadata["module"]), class_name) for class_name, metadata in classes.items()}
+
+
+def installed_plugins(socket_path=None):
+    try:
+        return DaemonClient(socket_path=socket_path).request("installed")
+    except OSError:
+        return offshoot.Manifest().list_plugins()
+
+
+def validate_plugin_file(file_path, pluggable, socket_path=None):
+    try:
+        return DaemonClient(socket_path=socket_path).request("validate", file_path=os.path.abspath(file_path), pluggable=pluggable)
+    except OSError:
+        directives = offshoot.pluggable_directives().get(pluggable)
+
+        if directives is None:
+            return [False, ["'%s' is not a known pluggable." % pluggable]]
+
+        return offshoot.validate_plugin_file(file_path, pluggable, directives["directives"])
+
+
+def socket_path_for(config):
+    return (config.get("file_paths") or dict()).get("socket") or default_socket_path
+
+
+def _is_listening(socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+
+    return True
+
+
+def _run_plugin_command(plugin, arguments):
+    plugin_directory = offshoot.config.get("file_paths").get("plugins")
+    plugin_module_string = "%s.%s.plugin" % (plugin_directory.replace(os.sep, "."), plugin)
+
+    command = [sys.executable] + offshoot.archives.module_runner_arguments(plugin, plugin_module_string) + arguments
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=offshoot.locking.held_lock_environment(offshoot.Manifest().file_path))
+
+    return {"returncode": process.returncode, "output": process.stdout.decode("utf-8", "replace")}
@@ -0,0 +1,63 @@
+import asyncio
+import inspect
+import collections
+import concurrent.futures
+
+import offshoot
+
+
+PluginResult = collections.namedtuple("PluginResult", ["name", "value", "error"])
+
+default_max_workers = 8
+
+
+def map(pluggable, method, *args, **kwargs):
+    return list(imap(pluggable, method, *args, **kwargs))
+
+
+def imap(pluggable, method, *args, ordered=False, max_workers=None, selection=None, init_kwargs=None, method_kwargs=None):
+    plugin_classes = offshoot.discover(pluggable, selection=selection)
+
+    if not len(plugin_classes):
+        return None
+
+    max_workers = min(max_workers or default_max_workers, len(plugin_classes))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="offshoot-map") as executor:
+        futures = collections.OrderedDict()
+
+        for name, plugin_class in plugin_classes.items():
+            future = executor.submit(_invoke, plugin_class, method, args, method_kwargs or dict(), init_kwargs or dict())
+            futures[future] = name
+
+        for future in (futures if ordered else concurrent.futures.as_completed(futures)):
+            yield PluginResult(futures[future], *future.result())
+
+
+async def gather(pluggable, method, *args, timeout=None, selection=None, init_kwargs=None, method_kwargs=None):
+    plugin_classes = offshoot.discover(pluggable, selection=selection)
+
+    results = await asyncio.gather(*[
+        _invoke_async(plugin_class, method, args, method_kwargs or dict(), init_kwargs or dict(), timeout) for plugin_class in plugin_classes.values()
+    ])
+
+    return [PluginResult(name, *result) for name, result in zip(plugin_classes, results)]
+
+
+async def _invoke_async(plugin_class, method, args, method_kwargs, init_kwargs, timeout):
+    try:
+        result = getattr(plugin_class(**init_kwargs), method)(*args, **method_kwargs)
+
+        if inspect.isawaitable(result):
+            result = await asyncio.wait_for(result, timeout=timeout)
+
+        return result, None
+    except Exception as e:
+        return None, e
+
+
+def _invoke(plugin_class, method, args, method_kwargs, init_kwargs):
+    try:
+        return getattr(plugin_class(**init_kwargs), method)(*args, **method_kwargs), None
+    except Exception as e:
+        return None, e
@@ -0,0 +1,39 @@
+import os
+import gc
+
+import offshoot
+
+from offshoot.manifest import Manifest
+
+
+def preload(pluggables=None, freeze_gc=True):
+    if pluggables is None:
+        pluggables = Manifest(file_path=offshoot.plugin_registry.manifest_file_path).pluggables()
+
+    entries = dict()
+
+    for pluggable in pluggables:
+        entries[pluggable] = offshoot.plugin_registry.entry(pluggable)
+
+    offshoot.plugin_registry.freeze()
+
+    # Objects moved to the permanent generation are never traversed by the collector again, so a
+    # forked worker's first collections don't write to (and copy) the pages it shares with the master
+    if freeze_gc and hasattr(gc, "freeze"):
+        gc.collect()
+        gc.freeze()
+
+    return {pluggable: entry.classes for pluggable, entry in entries.items()}
+
+
+def after_fork_in_child(func):
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=func)
+
+    return func
+
+
+@after_fork_in_child
+def _reset_registry_after_fork():
+    # A lock held by another thread at fork time would stay locked forever in the child
+    offshoot.plugin_registry.reset_locks()
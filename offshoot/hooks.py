@@ -0,0 +1,80 @@
+import threading
+import collections
+
+import offshoot
+import offshoot.wrappers
+
+from offshoot.forking import after_fork_in_child
+from offshoot.pluggable import pluggable_class_for
+
+
+HookChain = collections.namedtuple("HookChain", ["generation", "wrappers_generation", "manifest_signature", "entry", "handlers"])
+
+_chains = dict()
+_lock = threading.Lock()
+
+
+def hook_chain(pluggable, method, selection=None):
+    key = (pluggable, method, offshoot.plugin_registry._key(pluggable, selection)[1])
+    chain = _chains.get(key)
+
+    # Hot path: nothing was installed, uninstalled, rediscovered or wrapped since the chain was compiled
+    if chain is not None and chain.generation == offshoot.plugin_registry.generation and chain.wrappers_generation == offshoot.wrappers.generation:
+        # Other processes (the CLI, the daemon, sync) only leave a trace in the manifest file
+        if offshoot.plugin_registry.frozen or chain.manifest_signature == offshoot.plugin_registry.manifest_signature():
+            return chain.handlers
+
+    with _lock:
+        generation = offshoot.plugin_registry.generation
+        wrappers_generation = offshoot.wrappers.generation
+        manifest_signature = offshoot.plugin_registry.manifest_signature()
+
+        entry = offshoot.plugin_registry.entry(pluggable, selection=selection)
+
+        if chain is None or chain.entry is not entry or chain.wrappers_generation != wrappers_generation:
+            chain = HookChain(generation, wrappers_generation, manifest_signature, entry, compile_handlers(entry, pluggable, method))
+        else:
+            chain = chain._replace(generation=generation, manifest_signature=manifest_signature)
+
+        _chains[key] = chain
+
+    return chain.handlers
+
+
+def dispatch(pluggable, method, *args, **kwargs):
+    return [handler(*args, **kwargs) for handler in hook_chain(pluggable, method)]
+
+
+def compile_handlers(entry, pluggable, method):
+    handlers = list()
+
+    for class_name, plugin_class in entry.classes.items():
+        pluggable_class = pluggable_class_for(plugin_class, pluggable)
+
+        # Plugins that leave the method to the pluggable's placeholder implementation are not hooked in
+        if pluggable_class is not None and getattr(plugin_class, method, None) is getattr(pluggable_class, method, None):
+            continue
+
+        if not callable(getattr(plugin_class, method, None)):
+            continue
+
+        handlers.append((hook_priority(entry.metadata.get(class_name)), len(handlers), getattr(plugin_class(), method)))
+
+    # Higher priorities run first, installation order breaks ties
+    return tuple(handler for priority, index, handler in sorted(handlers, key=lambda h: (-h[0], h[1])))
+
+
+def hook_priority(metadata):
+    return ((metadata or dict()).get("file") or dict()).get("priority", 0)
+
+
+def invalidate():
+    with _lock:
+        _chains.clear()
+
+
+@after_fork_in_child
+def _reset_lock_after_fork():
+    global _lock
+
+    _lock = threading.Lock()
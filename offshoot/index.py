@@ -0,0 +1,273 @@
+import os
+import json
+import mmap
+import struct
+import bisect
+import hashlib
+import tempfile
+import threading
+
+import offshoot
+
+from offshoot.forking import after_fork_in_child
+from offshoot.manifest import Manifest
+from offshoot.registry import plugin_module_for, file_signature
+
+
+# Layout: a header, a table of pluggables sorted by name, a table of classes grouped by pluggable, then
+# the strings the tables point to. Offsets are absolute and strings are prefixed with their byte length.
+magic = b"OFDX"
+format_version = 2
+
+header_struct = struct.Struct("<4sHHQqQII")
+pluggable_struct = struct.Struct("<III")
+class_struct = struct.Struct("<IIIIIIIqQ")
+length_struct = struct.Struct("<H")
+
+class_fields = ["module", "class_name", "plugin", "version", "file_path", "sha256", "file"]
+
+_shared_indexes = dict()
+_lock = threading.Lock()
+
+
+class DiscoveryIndex:
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+        with open(file_path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+        index_magic, index_format_version = header_struct.unpack_from(self.buffer, 0)[:2]
+
+        if index_magic != magic or index_format_version != format_version:
+            self.close()
+            raise ValueError("'%s' is not a discovery index offshoot can read." % file_path)
+
+        _, _, _, self.generation, manifest_mtime_ns, manifest_size, self.pluggable_count, self.class_count = header_struct.unpack_from(self.buffer, 0)
+
+        self.manifest_signature = (manifest_mtime_ns, manifest_size)
+
+        self.classes_offset = header_struct.size + self.pluggable_count * pluggable_struct.size
+
+        self._pluggable_names = _LazyNames(self)
+
+    def is_current(self):
+        # The index is only ever replaced, never rewritten in place: a stat tells if this mapping is stale
+        return file_signature(self.file_path) == self.signature
+
+    def matches(self, manifest_file_path):
+        # The index records the stat of the manifest it was built from: any install or uninstall since changes it
+        signature = file_signature(manifest_file_path)
+
+        return signature is not None and signature[:2] == self.manifest_signature
+
+    def lookup(self, pluggable):
+        return [record for record in self.file_entries(pluggable) if record["class_name"]]
+
+    def file_entries(self, pluggable):
+        name = pluggable.encode("utf-8")
+        position = bisect.bisect_left(self._pluggable_names, name)
+
+        if position == self.pluggable_count or self._pluggable_names[position] != name:
+            return list()
+
+        _, first_class, class_count = pluggable_struct.unpack_from(self.buffer, header_struct.size + position * pluggable_struct.size)
+
+        records = list()
+
+        for i in range(first_class, first_class + class_count):
+            fields = class_struct.unpack_from(self.buffer, self.classes_offset + i * class_struct.size)
+
+            record = {field: self._string(offset) for field, offset in zip(class_fields, fields)}
+            record["mtime_ns"], record["size"] = fields[-2:]
+            record["file"] = json.loads(record["file"])
+
+            records.append(record)
+
+        return records
+
+    def pluggables(self):
+        return [self._pluggable_names[i].decode("utf-8") for i in range(self.pluggable_count)]
+
+    def close(self):
+        self.buffer.close()
+
+    def _string(self, offset):
+        return self._string_bytes(offset).decode("utf-8")
+
+    def _string_bytes(self, offset):
+        length, = length_struct.unpack_from(self.buffer, offset)
+        return self.buffer[offset + length_struct.size:offset + length_struct.size + length]
+
+
+class _LazyNames:
+    # Sequence view over the pluggable names so bisect decodes only the names it compares
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.pluggable_count
+
+    def __getitem__(self, position):
+        name_offset, _, _ = pluggable_struct.unpack_from(self.index.buffer, header_struct.size + position * pluggable_struct.size)
+        return self.index._string_bytes(name_offset)
+
+
+def index_file_path_for(manifest_file_path):
+    return os.path.splitext(manifest_file_path)[0] + ".index"
+
+
+def build_index(manifest_file_path):
+    # Stat'ed before being read so that a concurrent write leaves the index unmatched
+    manifest_signature = file_signature(manifest_file_path)
+    manifest = Manifest(file_path=manifest_file_path)
+
+    pluggables = dict()
+
+    for pluggable in manifest.pluggables():
+        records = list()
+
+        for file_entry in manifest.plugin_file_entries_for_pluggable(pluggable):
+            plugin_file_path = file_entry["file_path"]
+            signature = offshoot.archives.plugin_file_signature(plugin_file_path)
+
+            # Every file entry is recorded, so that discovery can list them without parsing the manifest.
+            # Missing and invalid files get an empty class name.
+            if signature is None:
+                valid, plugin_class, sha256 = False, "", ""
+            else:
+                valid, plugin_class = offshoot.file_contains_pluggable(plugin_file_path, pluggable)
+                sha256 = hashlib.sha256(offshoot.archives.read_plugin_file(plugin_file_path)).hexdigest()
+
+            records.append({
+                "module": plugin_module_for(plugin_file_path),
+                "class_name": plugin_class if valid else "",
+                "plugin": file_entry["plugin"],
+                "version": file_entry["version"] or "",
+                "file_path": plugin_file_path,
+                "sha256": sha256,
+                "file": json.dumps(file_entry["file"], sort_keys=True),
+                "mtime_ns": signature[0] if signature is not None else 0,
+                "size": signature[1] if signature is not None else 0
+            })
+
+        pluggables[pluggable] = records
+
+    return manifest.generation(), manifest_signature, pluggables
+
+
+def encode_index(generation, manifest_signature, pluggables):
+    names = sorted(pluggables, key=lambda name: name.encode("utf-8"))
+    class_count = sum(len(records) for records in pluggables.values())
+
+    strings = bytearray()
+    string_offsets = dict()
+
+    strings_offset = header_struct.size + len(names) * pluggable_struct.size + class_count * class_struct.size
+
+    def string_offset(value):
+        if value not in string_offsets:
+            encoded = value.encode("utf-8")
+
+            string_offsets[value] = strings_offset + len(strings)
+            strings.extend(length_struct.pack(len(encoded)) + encoded)
+
+        return string_offsets[value]
+
+    pluggable_table = bytearray()
+    class_table = bytearray()
+
+    first_class = 0
+
+    for name in names:
+        records = pluggables[name]
+        pluggable_table.extend(pluggable_struct.pack(string_offset(name), first_class, len(records)))
+
+        for record in records:
+            class_table.extend(class_struct.pack(*([string_offset(record[field]) for field in class_fields] + [record["mtime_ns"], record["size"]])))
+
+        first_class += len(records)
+
+    manifest_mtime_ns, manifest_size = manifest_signature[:2] if manifest_signature is not None else (0, 0)
+
+    header = header_struct.pack(magic, format_version, 0, generation, manifest_mtime_ns, manifest_size, len(names), class_count)
+
+    return bytes(header + pluggable_table + class_table + strings)
+
+
+def publish_index(manifest_file_path, index_file_path=None):
+    index_file_path = index_file_path or index_file_path_for(manifest_file_path)
+    data = encode_index(*build_index(manifest_file_path))
+
+    # Written next to its final path and swapped in with a rename, so readers see either index in full
+    fd, temporary_file_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(index_file_path)), prefix=".offshoot-index-")
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temporary_file_path, index_file_path)
+    except Exception:
+        if os.path.isfile(temporary_file_path):
+            os.remove(temporary_file_path)
+
+        raise
+
+    return index_file_path
+
+
+def shared_index(manifest_file_path):
+    index_file_path = index_file_path_for(manifest_file_path)
+    index = _shared_indexes.get(index_file_path)
+
+    # The index file was replaced since it was mapped: the new one is mapped in its place
+    if index is None or not index.is_current():
+        with _lock:
+            index = _shared_indexes.get(index_file_path)
+
+            if index is None or not index.is_current():
+                try:
+                    index = DiscoveryIndex(index_file_path)
+                except (FileNotFoundError, ValueError, struct.error):
+                    index = None
+
+                # Stale mappings are left for the garbage collector: another thread may still be reading one
+                _shared_indexes[index_file_path] = index
+
+    # An index that wasn't published since the last manifest change is ignored: discovery reads the manifest
+    if index is None or not index.matches(manifest_file_path):
+        return None
+
+    return index
+
+
+def indexed_classes(pluggable, manifest_file_path):
+    index = shared_index(manifest_file_path)
+
+    if index is None:
+        return None
+
+    return {record["file_path"]: record for record in index.file_entries(pluggable)}
+
+
+def file_entry_for(record):
+    return {
+        "plugin": record["plugin"],
+        "version": record["version"] or None,
+        "file": record["file"],
+        "file_path": record["file_path"]
+    }
+
+
+@after_fork_in_child
+def _reset_lock_after_fork():
+    global _lock
+
+    _lock = threading.Lock()
@@ -0,0 +1,68 @@
+import os
+import fcntl
+import threading
+import contextlib
+
+from offshoot.forking import after_fork_in_child
+
+
+# Set by a process that holds the lock for the plugin commands it runs in child processes
+held_lock_variable = "OFFSHOOT_HELD_MANIFEST_LOCK"
+
+_process_locks = dict()
+_lock = threading.Lock()
+
+
+class _ProcessLock:
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+
+
+def lock_file_path_for(manifest_file_path):
+    return os.path.splitext(manifest_file_path)[0] + ".lock"
+
+
+def held_lock_environment(manifest_file_path):
+    return {**os.environ, held_lock_variable: os.path.abspath(lock_file_path_for(manifest_file_path))}
+
+
+@contextlib.contextmanager
+def manifest_lock(manifest_file_path):
+    lock_file_path = lock_file_path_for(manifest_file_path)
+    process_lock = _process_locks.get(lock_file_path)
+
+    if process_lock is None:
+        with _lock:
+            process_lock = _process_locks.setdefault(lock_file_path, _ProcessLock())
+
+    with process_lock.lock:
+        # Nested blocks of the same thread (a cascade, sync installing a plugin) only take the file lock once
+        if process_lock.depth == 0 and os.environ.get(held_lock_variable) != os.path.abspath(lock_file_path):
+            process_lock.file = open(lock_file_path, "a")
+            fcntl.flock(process_lock.file.fileno(), fcntl.LOCK_EX)
+
+        process_lock.depth += 1
+
+        try:
+            yield
+        finally:
+            process_lock.depth -= 1
+
+            if process_lock.depth == 0 and process_lock.file is not None:
+                fcntl.flock(process_lock.file.fileno(), fcntl.LOCK_UN)
+
+                process_lock.file.close()
+                process_lock.file = None
+
+
+@after_fork_in_child
+def _reset_locks_after_fork():
+    global _lock, _process_locks
+
+    _lock = threading.Lock()
+
+    # Locks held by the parent's threads are not held by the child
+    _process_locks = dict()
@@ -6,7 +6,7 @@ import subprocess
 
 import offshoot
 
-valid_commands = ["init", "install", "uninstall"]
+valid_commands = ["init", "install", "uninstall", "deps", "index", "serve", "pack", "compile", "gc", "stage", "activate", "rollback", "sync"]
 
 
 def execute():
@@ -18,6 +18,14 @@ def execute():
 
         if command == "init":
             init()
+        elif command == "index":
+            index()
+        elif command == "serve":
+            serve()
+        elif command == "compile":
+            compile_plugins(list(offshoot.Manifest().list_plugins()))
+        elif command == "gc":
+            gc()
     elif len(sys.argv) > 2:
         command, args = sys.argv[1], sys.argv[2:]
 
@@ -25,31 +33,142 @@ def execute():
             raise Exception("'%s' is not a valid Offshoot command." % command)
 
         if command == "install":
-            install(args[0])
+            install(args[0], force="--force" in args[1:])
         elif command == "uninstall":
-            uninstall(args[0])
+            uninstall(args[0], cascade="--cascade" in args[1:])
+        elif command == "deps":
+            deps(args[0])
+        elif command == "pack":
+            pack(args[0], remove_directory="--remove" in args[1:])
+        elif command == "compile":
+            compile_plugins(args)
+        elif command == "stage":
+            stage(args[0], args[1])
+        elif command == "activate":
+            activate(args[0], args[1])
+        elif command == "rollback":
+            rollback(args[0])
+        elif command == "sync":
+            sync(args[0], dry_run="--dry-run" in args[1:])
+
+
+def install(plugin, force=False):
+    print("OFFSHOOT: Attempting to install %s..." % plugin)
 
+    if offshoot.daemon.DaemonClient().is_available():
+        result = offshoot.daemon.DaemonClient(timeout=None).request("install", plugin=plugin, force=force)
+        print(result["output"])
 
-def install(plugin):
-    print("OFFSHOOT: Attempting to install %s..." % plugin)
+        sys.exit(result["returncode"])
 
     plugin_directory = offshoot.config.get("file_paths").get("plugins")
     plugin_path = "%s/%s/plugin.py".replace("/", os.sep) % (plugin_directory, plugin)
 
     plugin_module_string = plugin_path.replace(os.sep, ".").replace(".py", "")
 
-    subprocess.call([sys.executable.split(os.sep)[-1], "-m", "%s" % plugin_module_string, "install"])
+    command = [sys.executable.split(os.sep)[-1]] + offshoot.archives.module_runner_arguments(plugin, plugin_module_string) + ["install"]
+
+    if force:
+        command.append("--force")
 
+    sys.exit(subprocess.call(command))
 
-def uninstall(plugin):
+
+def uninstall(plugin, cascade=False):
     print("OFFSHOOT: Attempting to uninstall %s..." % plugin)
 
+    if offshoot.daemon.DaemonClient().is_available():
+        result = offshoot.daemon.DaemonClient(timeout=None).request("uninstall", plugin=plugin, cascade=cascade)
+        print(result["output"])
+
+        sys.exit(result["returncode"])
+
     plugin_directory = offshoot.config.get("file_paths").get("plugins")
     plugin_path = "%s/%s/plugin.py".replace("/", os.sep) % (plugin_directory, plugin)
 
     plugin_module_string = plugin_path.replace(os.sep, ".").replace(".py", "")
 
-    subprocess.call([sys.executable.split(os.sep)[-1], "-m", "%s" % plugin_module_string, "uninstall"])
+    command = [sys.executable.split(os.sep)[-1]] + offshoot.archives.module_runner_arguments(plugin, plugin_module_string) + ["uninstall"]
+
+    if cascade:
+        command.append("--cascade")
+
+    sys.exit(subprocess.call(command))
+
+
+def pack(plugin, remove_directory=False):
+    archive_path = offshoot.archives.pack(plugin, remove_directory=remove_directory)
+    print("OFFSHOOT: Packed %s into %s" % (plugin, archive_path))
+
+
+def compile_plugins(plugins):
+    print("OFFSHOOT: Precompiling %s..." % (", ".join(plugins) or "no plugins"))
+
+    errors = offshoot.compiling.compile_plugins(plugins)
+
+    for file_path, error in errors.items():
+        print("Could not precompile %s: %s" % (file_path, error))
+
+    print("OFFSHOOT: Precompiled %s" % ("with %d error(s)" % len(errors) if len(errors) else "successfully!"))
+
+
+def stage(plugin, source_directory):
+    version = offshoot.versions.stage(plugin, source_directory)
+    print("OFFSHOOT: Staged %s %s. Run 'offshoot activate %s %s' to switch to it" % (plugin, version, plugin, version))
+
+
+def activate(plugin, version):
+    previous_version = offshoot.versions.activate(plugin, version)
+    print("OFFSHOOT: Activated %s %s (previously %s)" % (plugin, version, previous_version or "not installed"))
+
+
+def rollback(plugin):
+    version = offshoot.versions.rollback(plugin)
+    print("OFFSHOOT: Rolled %s back to %s" % (plugin, version))
+
+
+def sync(desired_file_path, dry_run=False):
+    actions = offshoot.sync.plan(offshoot.sync.load_desired(desired_file_path))
+
+    if not len(actions):
+        return print("OFFSHOOT: Installed plugins already match %s" % desired_file_path)
+
+    print("OFFSHOOT: Plan to match %s:" % desired_file_path)
+
+    for action in actions:
+        print("  %s" % offshoot.sync.describe(action))
+
+    if not dry_run:
+        offshoot.sync.apply(actions)
+        print("\nOFFSHOOT: Applied %d change(s)" % len(actions))
+
+
+def gc():
+    removed_blobs, freed_bytes = offshoot.store.collect_garbage()
+    print("OFFSHOOT: Removed %d unreferenced blob(s) from the content store, freeing %d bytes" % (len(removed_blobs), freed_bytes))
+
+
+def deps(plugin):
+    manifest = offshoot.Manifest()
+
+    if not manifest.contains_plugin(plugin):
+        print("OFFSHOOT: %s is not installed." % plugin)
+        return None
+
+    print("Dependencies: %s" % (", ".join(manifest.plugin_dependencies(plugin)) or "None"))
+    print("Dependents: %s" % (", ".join(manifest.plugin_dependents(plugin, transitive=True)) or "None"))
+
+
+def index():
+    index_file_path = offshoot.index.publish_index(offshoot.Manifest().file_path)
+    print("OFFSHOOT: Published the discovery index to %s" % index_file_path)
+
+
+def serve():
+    socket_path = offshoot.daemon.socket_path_for(offshoot.config)
+
+    print("OFFSHOOT: Serving discovery on %s..." % socket_path)
+    offshoot.daemon.serve(socket_path)
 
 
 def init():
@@ -1,4 +1,8 @@
 import json
+import hashlib
+import threading
+import importlib
+import contextlib
 
 import os
 import os.path
@@ -6,14 +10,16 @@ import os.path
 import offshoot
 
 
+_deferred_changes = dict()
+
+
 class Manifest:
 
     def __init__(self, **kwargs):
         self.file_path = kwargs.get("file_path", "offshoot.manifest.json")
 
         if not os.path.isfile(self.file_path):
-            with open(self.file_path, "w") as f:
-                f.write(json.dumps({"plugins": {}}))
+            self._write({"plugins": {}})
 
     def list_plugins(self):
         with open(self.file_path, "r") as f:
@@ -28,50 +34,282 @@ class Manifest:
         return plugin_name in manifest["plugins"]
 
     def add_plugin(self, plugin_name):
-        with open(self.file_path, "a+") as f:
-            f.seek(0)
+        with open(self.file_path, "r") as f:
             manifest = json.loads(f.read())
 
-            exec("from %s.%s.plugin import %s" % (
-                offshoot.config["file_paths"]["plugins"],
-                plugin_name,
-                plugin_name
-            ))
+        plugin_class = load_plugin_class(plugin_name)
 
-            plugin_class = eval(plugin_name)
+        manifest["plugins"][plugin_name] = plugin_entry_for(plugin_class, offshoot.store.plugin_file_hashes(plugin_name))
 
-            manifest["plugins"][plugin_name] = {
-                "name": plugin_name,
-                "version": plugin_class.version,
-                "files": plugin_class.files,
-                "plugins": plugin_class.plugins,
-                "libraries": plugin_class.libraries,
-                "config": plugin_class.config
-            }
+        manifest["dependencies"] = index_dependencies(manifest["plugins"])
+        manifest["generation"] = manifest.get("generation", 0) + 1
 
-            f.truncate(0)
-            f.write(json.dumps(manifest, indent=4))
+        self._write(manifest)
+        self._changed()
 
     def remove_plugin(self, plugin_name):
-        with open(self.file_path, "a+") as f:
-            f.seek(0)
+        with open(self.file_path, "r") as f:
+            manifest = json.loads(f.read())
+
+        if plugin_name not in manifest["plugins"]:
+            return None
+
+        del manifest["plugins"][plugin_name]
+
+        manifest["dependencies"] = index_dependencies(manifest["plugins"])
+        manifest["generation"] = manifest.get("generation", 0) + 1
+
+        self._write(manifest)
+        self._changed()
+
+    def plugin_versions(self, plugin_name):
+        with open(self.file_path, "r") as f:
+            manifest = json.loads(f.read())
+
+        return (manifest.get("versions") or dict()).get(plugin_name) or {"staged": dict(), "previous": None}
+
+    def add_plugin_version(self, plugin_name, version, plugin_entry):
+        with open(self.file_path, "r") as f:
+            manifest = json.loads(f.read())
+
+        versions = manifest.setdefault("versions", dict()).setdefault(plugin_name, {"staged": dict(), "previous": None})
+        versions["staged"][version] = plugin_entry
+
+        self._write(manifest)
+
+    def activate_plugin_version(self, plugin_name, version, installed_phases=None):
+        with open(self.file_path, "r") as f:
+            manifest = json.loads(f.read())
+
+        versions = (manifest.get("versions") or dict()).get(plugin_name) or {"staged": dict(), "previous": None}
+
+        if version not in versions["staged"]:
+            raise offshoot.PluginError("Version '%s' of %s is not staged." % (version, plugin_name))
+
+        active_version = (manifest["plugins"].get(plugin_name) or dict()).get("version")
+
+        if active_version is not None and active_version != version:
+            versions["previous"] = active_version
+
+        if installed_phases is not None:
+            versions["staged"][version]["installed_phases"] = installed_phases
+
+        manifest["plugins"][plugin_name] = versions["staged"][version]
+        manifest["versions"][plugin_name] = versions
+
+        manifest["dependencies"] = index_dependencies(manifest["plugins"])
+        manifest["generation"] = manifest.get("generation", 0) + 1
+
+        self._write(manifest)
+        self._changed()
+
+        return active_version
+
+    def plugin_dependencies(self, plugin_name):
+        with open(self.file_path, "r") as f:
+            manifest = json.loads(f.read())
+
+        return self._dependency_index(manifest)["closure"].get(plugin_name, list())
+
+    def plugin_dependents(self, plugin_name, transitive=False):
+        with open(self.file_path, "r") as f:
+            manifest = json.loads(f.read())
+
+        dependents = self._dependency_index(manifest)["dependents"]
+
+        if not transitive:
+            return dependents.get(plugin_name, list())
+
+        # Post-order walk of the reverse index: every plugin comes after the plugins depending on it
+        ordered_dependents = list()
+        visited = {plugin_name}
+
+        def visit(name):
+            for dependent in dependents.get(name, list()):
+                if dependent in visited:
+                    continue
+
+                visited.add(dependent)
+                visit(dependent)
+
+                ordered_dependents.append(dependent)
+
+        visit(plugin_name)
+
+        return ordered_dependents
+
+    def missing_plugin_dependencies(self, plugin_names):
+        with open(self.file_path, "r") as f:
+            manifest = json.loads(f.read())
+
+        closure = self._dependency_index(manifest)["closure"]
+        required_plugin_names = set(plugin_names)
+
+        for plugin_name in plugin_names:
+            required_plugin_names.update(closure.get(plugin_name, list()))
+
+        return sorted(required_plugin_names - set(manifest["plugins"]))
+
+    def generation(self):
+        with open(self.file_path, "r") as f:
             manifest = json.loads(f.read())
 
-            if plugin_name in manifest["plugins"]:
-                del manifest["plugins"][plugin_name]
+        return manifest.get("generation", 0)
+
+    def pluggables(self):
+        with open(self.file_path, "r") as f:
+            manifest = json.loads(f.read())
 
-                f.truncate(0)
-                f.write(json.dumps(manifest, indent=4))
+        pluggables = set()
+
+        for name, metadata in manifest["plugins"].items():
+            for file in metadata["files"]:
+                if file.get("pluggable") is not None:
+                    pluggables.add(file["pluggable"])
+
+        return sorted(pluggables)
 
     def plugin_files_for_pluggable(self, pluggable):
         files = list()
 
+        for file_entry in self.plugin_file_entries_for_pluggable(pluggable):
+            files.append((file_entry["file_path"], file_entry["file"].get("pluggable")))
+
+        return files
+
+    def plugin_file_entries_for_pluggable(self, pluggable):
+        file_entries = list()
+
         with open(self.file_path, "r") as f:
             manifest = json.loads(f.read())
 
         for name, metadata in manifest["plugins"].items():
             for file in metadata["files"]:
                 if file.get("pluggable") == pluggable:
-                    files.append(("plugins/%s/files/%s".replace("/", os.sep) % (name, file.get("path")), file.get("pluggable")))
+                    file_entries.append({
+                        "plugin": name,
+                        "version": metadata.get("version"),
+                        "file": file,
+                        "file_path": "plugins/%s/files/%s".replace("/", os.sep) % (name, file.get("path"))
+                    })
 
-        return files
+        return file_entries
+
+    def lock(self):
+        # Held by everything that installs, uninstalls, stages or switches plugins, in this process or another one
+        return offshoot.locking.manifest_lock(self.file_path)
+
+    @contextlib.contextmanager
+    def deferred_changes(self):
+        # Changes made inside the block are announced once, when the outermost block exits
+        is_outermost = self.file_path not in _deferred_changes
+        _deferred_changes.setdefault(self.file_path, False)
+
+        try:
+            yield self
+        finally:
+            if is_outermost and _deferred_changes.pop(self.file_path):
+                self._changed()
+
+    def _write(self, manifest):
+        # Swapped in with a rename so that processes reading the manifest without the lock never read half of it
+        temporary_file_path = "%s.%d.%d.tmp" % (self.file_path, os.getpid(), threading.get_ident())
+
+        with open(temporary_file_path, "w") as f:
+            f.write(json.dumps(manifest, indent=4))
+
+        os.replace(temporary_file_path, self.file_path)
+
+    def _changed(self):
+        if self.file_path in _deferred_changes:
+            _deferred_changes[self.file_path] = True
+            return None
+
+        offshoot.invalidate_discovery()
+
+        if offshoot.config.get("discovery_index"):
+            offshoot.index.publish_index(self.file_path)
+
+    def _dependency_index(self, manifest):
+        if "dependencies" not in manifest:
+            manifest["dependencies"] = index_dependencies(manifest["plugins"])
+
+        return manifest["dependencies"]
+
+
+def load_plugin_class(plugin_name):
+    plugin_module = importlib.import_module("%s.%s.plugin" % (
+        offshoot.config["file_paths"]["plugins"].replace(os.sep, "."),
+        plugin_name
+    ))
+
+    return getattr(plugin_module, plugin_name)
+
+
+def plugin_entry_for(plugin_class, file_hashes):
+    return {
+        "name": plugin_class.name,
+        "version": plugin_class.version,
+        "files": plugin_class.files,
+        "file_hashes": file_hashes,
+        "plugins": plugin_class.plugins,
+        "libraries": plugin_class.libraries,
+        "libraries_hash": content_hash(plugin_class.libraries),
+        "config": plugin_class.config,
+        "config_hash": content_hash(plugin_class.config),
+        "installed_phases": [phase for phase in ["files", "config", "libraries"] if offshoot.config["allow"][phase] is True]
+    }
+
+
+def unchanged_phases(installed, plugin_entry):
+    if installed is None:
+        return set()
+
+    installed_phases = installed.get("installed_phases") or list()
+
+    unchanged_phases = set()
+
+    # A phase that was disallowed during the last install has to run, whatever the hashes say
+    if "files" in installed_phases and installed.get("files") == plugin_entry["files"] and installed.get("file_hashes") == plugin_entry["file_hashes"]:
+        unchanged_phases.add("files")
+    if "config" in installed_phases and installed.get("config_hash") == plugin_entry["config_hash"]:
+        unchanged_phases.add("config")
+    if "libraries" in installed_phases and installed.get("libraries_hash") == plugin_entry["libraries_hash"]:
+        unchanged_phases.add("libraries")
+    if installed == plugin_entry:
+        unchanged_phases.add("manifest")
+
+    return unchanged_phases
+
+
+def content_hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def index_dependencies(plugins):
+    reachable = {name: set((metadata or dict()).get("plugins") or list()) for name, metadata in plugins.items()}
+    dependents = dict()
+
+    # Dependencies of dependencies are added until nothing changes: plugins in a cycle end up with the same closure
+    changed = True
+
+    while changed:
+        changed = False
+
+        for name, dependencies in reachable.items():
+            expanded_dependencies = dependencies.union(*[reachable.get(dependency, set()) for dependency in dependencies])
+
+            if expanded_dependencies != dependencies:
+                reachable[name] = expanded_dependencies
+                changed = True
+
+    closure = {name: sorted(dependencies - {name}) for name, dependencies in reachable.items()}
+
+    for name, metadata in plugins.items():
+        for dependency in metadata.get("plugins") or list():
+            dependents.setdefault(dependency, list()).append(name)
+
+    return {
+        "closure": closure,
+        "dependents": {name: sorted(names) for name, names in dependents.items()}
+    }
@@ -0,0 +1,206 @@
+import json
+import time
+import inspect
+import threading
+
+import offshoot
+
+from offshoot.forking import after_fork_in_child
+from offshoot.pluggable import pluggable_class_for
+from offshoot.wrappers import wrap_method, unwrap_method
+
+
+# Histogram upper bounds in seconds: 10µs, 20µs, 40µs... ~5.2s, then an overflow bucket
+histogram_bounds = [0.00001 * (2 ** i) for i in range(20)]
+
+enabled = False
+sample_every = 1
+
+_method_metrics = dict()
+_instrumented_methods = list()
+
+_lock = threading.Lock()
+
+
+class MethodMetrics:
+
+    def __init__(self, plugin, pluggable, method):
+        self.plugin = plugin
+        self.pluggable = pluggable
+        self.method = method
+
+        self.calls = 0
+
+        self.sampled = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * (len(histogram_bounds) + 1)
+
+        self.lock = threading.Lock()
+
+    def count(self):
+        with self.lock:
+            self.calls += 1
+
+            return self.calls
+
+    def record(self, duration):
+        bucket = 0
+
+        while bucket < len(histogram_bounds) and duration > histogram_bounds[bucket]:
+            bucket += 1
+
+        with self.lock:
+            self.sampled += 1
+            self.total_time += duration
+            self.max_time = max(self.max_time, duration)
+            self.histogram[bucket] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "pluggable": self.pluggable,
+                "calls": self.calls,
+                "sampled": self.sampled,
+                "total_time": self.total_time,
+                "mean_time": self.total_time / self.sampled if self.sampled else 0.0,
+                "max_time": self.max_time,
+                "histogram": [[bound, count] for bound, count in zip(histogram_bounds + [None], self.histogram)]
+            }
+
+
+def enable(sample_rate=1.0):
+    global enabled, sample_every
+
+    if not 0 < sample_rate <= 1:
+        raise ValueError("The metrics sample rate should be in the ]0, 1] range.")
+
+    with _lock:
+        sample_every = max(1, int(round(1 / sample_rate)))
+
+        if enabled:
+            return None
+
+        enabled = True
+
+    offshoot.plugin_registry.add_class_hook(instrument_class)
+
+    for pluggable, classes, metadata in _registry_classes():
+        for class_name, plugin_class in classes.items():
+            instrument_class(plugin_class, pluggable, metadata[class_name])
+
+
+def disable():
+    global enabled
+
+    with _lock:
+        if not enabled:
+            return None
+
+        enabled = False
+
+        instrumented_methods = _instrumented_methods[:]
+        del _instrumented_methods[:]
+
+    offshoot.plugin_registry.remove_class_hook(instrument_class)
+
+    for plugin_class, name in instrumented_methods:
+        unwrap_method(plugin_class, name, "metrics")
+
+
+def snapshot():
+    metrics = dict()
+
+    with _lock:
+        method_metrics = list(_method_metrics.items())
+
+    for (plugin, method), metric in method_metrics:
+        metrics.setdefault(plugin, dict())[method] = metric.snapshot()
+
+    return metrics
+
+
+def export(file_path):
+    with open(file_path, "w") as f:
+        f.write(json.dumps(snapshot(), indent=4))
+
+
+def reset():
+    with _lock:
+        _method_metrics.clear()
+
+
+def instrument_class(plugin_class, pluggable, metadata):
+    pluggable_class = pluggable_class_for(plugin_class, pluggable)
+
+    if pluggable_class is None:
+        return None
+
+    directives = pluggable_class.method_directives()
+
+    for name in directives["expected"] + directives["accepted"] + directives["batched"]:
+        key = (metadata.get("plugin"), "%s.%s" % (plugin_class.__name__, name))
+
+        if wrap_method(plugin_class, name, "metrics", lambda func, key=key: _timed(func, key, pluggable)):
+            with _lock:
+                _instrumented_methods.append((plugin_class, name))
+
+
+def forget_class(plugin_class):
+    with _lock:
+        _instrumented_methods[:] = [(cls, name) for cls, name in _instrumented_methods if cls is not plugin_class]
+
+
+def _timed(func, key, pluggable):
+    def metric_for_call():
+        metric = _method_metrics.get(key)
+
+        if metric is None:
+            with _lock:
+                metric = _method_metrics.setdefault(key, MethodMetrics(key[0], pluggable, key[1]))
+
+        # The first call of every sample_every calls is timed
+        return metric if (metric.count() - 1) % sample_every == 0 else None
+
+    def wrapper(*args, **kwargs):
+        metric = metric_for_call()
+
+        if metric is None:
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metric.record(time.perf_counter() - start)
+
+    async def async_wrapper(*args, **kwargs):
+        metric = metric_for_call()
+
+        if metric is None:
+            return await func(*args, **kwargs)
+
+        start = time.perf_counter()
+
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            metric.record(time.perf_counter() - start)
+
+    return async_wrapper if inspect.iscoroutinefunction(func) else wrapper
+
+
+def _registry_classes():
+    for entry_key, entry in offshoot.plugin_registry.snapshot().items():
+        yield entry_key[0], entry.classes, entry.metadata
+
+
+@after_fork_in_child
+def _reset_locks_after_fork():
+    global _lock
+
+    _lock = threading.Lock()
+
+    for metric in _method_metrics.values():
+        metric.lock = threading.Lock()
@@ -1,5 +1,9 @@
 import ast
 import inspect
+import textwrap
+
+
+batch_suffix = "_batch"
 
 
 class Pluggable:
@@ -9,63 +13,101 @@ class Pluggable:
 
     @staticmethod
     def allowed_decorators():
-        return ["accepted", "expected", "forbidden"]
+        return ["accepted", "batched", "expected", "forbidden"]
 
     @classmethod
     def method_directives(cls):
-        directives = {
-            "accepted": cls.methods_with_decorator("accepted"),
-            "expected": cls.methods_with_decorator("expected"),
-            "forbidden": cls.methods_with_decorator("forbidden")
-        }
+        return directives_for_decorators(cls._find_decorators())
 
-        methods = cls._find_decorators()
+    @classmethod
+    def methods_with_decorator(cls, decorator):
+        if decorator not in cls.allowed_decorators():
+            return list()
 
-        for name, decorators in methods.items():
-            if name == "__init__":
-                continue
+        return _methods_with_decorator(cls._find_decorators(), decorator)
 
-            if not len(decorators):
-                directives["forbidden"].append(name)
+    @classmethod
+    def _find_decorators(cls):
+        return find_decorators(compile(textwrap.dedent(inspect.getsource(cls)), '?', 'exec', ast.PyCF_ONLY_AST))
 
-        return directives
+    @classmethod
+    def on_file_install(cls, **kwargs):
+        print("CALLBACK: on_file_install", kwargs)
 
     @classmethod
-    def methods_with_decorator(cls, decorator):
-        methods = list()
+    def on_file_uninstall(cls, **kwargs):
+        print("CALLBACK: on_file_uninstall", kwargs)
 
-        if decorator not in cls.allowed_decorators():
-            return methods
 
-        decorated_methods = cls._find_decorators()
+def pluggable_class_for(plugin_class, pluggable):
+    for base in inspect.getmro(plugin_class)[1:]:
+        if base.__name__ == pluggable and issubclass(base, Pluggable):
+            return base
 
-        for method, decorator_structure in decorated_methods.items():
-            decorator_structure_string = " ".join(decorator_structure) or ""
+    return None
 
-            if "attr='%s'" % decorator in decorator_structure_string:
-                methods.append(method)
 
-        return methods
+def call_batch(target, method, items):
+    batch_method = getattr(target, method + batch_suffix, None)
 
-    @classmethod
-    def _find_decorators(cls):
-        result = dict()
+    if batch_method is not None and not getattr(batch_method, "__offshoot_batched__", False):
+        return batch_method(items)
 
-        def visit_FunctionDef(node):
-            result[node.name] = [ast.dump(e) for e in node.decorator_list]
+    method = getattr(target, method)
 
-        v = ast.NodeVisitor()
+    return [method(item) for item in items]
 
-        v.visit_FunctionDef = visit_FunctionDef
-        v.visit(compile(inspect.getsource(cls), '?', 'exec', ast.PyCF_ONLY_AST))
 
-        return result
+def batched_pairing_errors(directives):
+    errors = list()
 
-    @classmethod
-    def on_file_install(cls, **kwargs):
-        print("CALLBACK: on_file_install", kwargs)
+    for batch_method in directives.get("batched", list()):
+        method = batch_method[:-len(batch_suffix)] if batch_method.endswith(batch_suffix) else None
 
-    @classmethod
-    def on_file_uninstall(cls, **kwargs):
-        print("CALLBACK: on_file_uninstall", kwargs)
+        if method not in directives["expected"] + directives["accepted"]:
+            errors.append("'%s' batched method should be named after an expected or accepted method of the pluggable, followed by '%s'." % (batch_method, batch_suffix))
+
+    return errors
+
+
+def find_decorators(syntax_tree):
+    result = dict()
+
+    def visit_FunctionDef(node):
+        result[node.name] = [ast.dump(e) for e in node.decorator_list]
+
+    v = ast.NodeVisitor()
+
+    v.visit_FunctionDef = visit_FunctionDef
+    v.visit_AsyncFunctionDef = visit_FunctionDef
+    v.visit(syntax_tree)
+
+    return result
+
+
+def directives_for_decorators(decorated_methods):
+    directives = dict()
+
+    for decorator in Pluggable.allowed_decorators():
+        directives[decorator] = _methods_with_decorator(decorated_methods, decorator)
+
+    for name, decorators in decorated_methods.items():
+        if name == "__init__":
+            continue
+
+        if not len(decorators):
+            directives["forbidden"].append(name)
+
+    return directives
+
+
+def _methods_with_decorator(decorated_methods, decorator):
+    methods = list()
+
+    for method, decorator_structure in decorated_methods.items():
+        decorator_structure_string = " ".join(decorator_structure) or ""
+
+        if "attr='%s'" % decorator in decorator_structure_string:
+            methods.append(method)
 
+    return methods
@@ -28,34 +28,54 @@ class Plugin:
         print("\n\n%s was uninstalled successfully!" % cls.__name__)
 
     @classmethod
-    def install(cls):
-        if offshoot.config["allow"]["plugins"] is True:
-            cls.verify_plugin_dependencies()
-        if offshoot.config["allow"]["files"] is True:
-            cls.install_files()
-        if offshoot.config["allow"]["config"] is True:
-            cls.install_configuration()
-        if offshoot.config["allow"]["libraries"] is True:
-            cls.install_libraries()
-        if offshoot.config["allow"]["callbacks"] is True:
-            cls.on_install()
+    def install(cls, force=False):
+        with offshoot.Manifest().lock():
+            unchanged_phases = set() if force else cls.unchanged_phases()
+
+            if offshoot.config["allow"]["plugins"] is True:
+                cls.verify_plugin_dependencies()
+            if offshoot.config["allow"]["files"] is True and not cls._skip_phase("files", unchanged_phases):
+                cls.install_files()
+            if offshoot.config["allow"]["config"] is True and not cls._skip_phase("config", unchanged_phases):
+                cls.install_configuration()
+            if offshoot.config["allow"]["libraries"] is True and not cls._skip_phase("libraries", unchanged_phases):
+                cls.install_libraries()
+
+            if "manifest" in unchanged_phases:
+                print("\n\n%s %s is already installed and unchanged. Install with --force to install it again." % (cls.__name__, cls.version))
+                return None
+
+            if offshoot.config["allow"]["callbacks"] is True:
+                cls.on_install()
 
-        manifest = offshoot.Manifest()
-        manifest.add_plugin(cls.name)
+            manifest = offshoot.Manifest()
+            manifest.add_plugin(cls.name)
 
     @classmethod
-    def uninstall(cls):
-        if offshoot.config["allow"]["files"] is True:
-            cls.uninstall_files()
-        if offshoot.config["allow"]["config"] is True:
-            cls.uninstall_configuration()
-        if offshoot.config["allow"]["libraries"] is True:
-            cls.uninstall_libraries()
-        if offshoot.config["allow"]["callbacks"] is True:
-            cls.on_uninstall()
+    def uninstall(cls, cascade=False):
+        with offshoot.Manifest().lock():
+            if offshoot.config["allow"]["plugins"] is True:
+                cls.verify_plugin_dependents(cascade=cascade)
+            if offshoot.config["allow"]["files"] is True:
+                cls.uninstall_files()
+            if offshoot.config["allow"]["config"] is True:
+                cls.uninstall_configuration()
+            if offshoot.config["allow"]["libraries"] is True:
+                cls.uninstall_libraries()
+            if offshoot.config["allow"]["callbacks"] is True:
+                cls.on_uninstall()
 
-        manifest = offshoot.Manifest()
-        manifest.remove_plugin(cls.name)
+            manifest = offshoot.Manifest()
+            manifest.remove_plugin(cls.name)
+
+    @classmethod
+    def unchanged_phases(cls):
+        installed = offshoot.Manifest().list_plugins().get(cls.name)
+
+        if installed is None or installed.get("version") != cls.version:
+            return set()
+
+        return offshoot.manifest.unchanged_phases(installed, offshoot.manifest.plugin_entry_for(cls, offshoot.store.plugin_file_hashes(cls.name)))
 
     @classmethod
     def verify_plugin_dependencies(cls):
@@ -63,15 +83,29 @@ class Plugin:
 
         manifest = offshoot.Manifest()
 
-        missing_plugin_names = list()
-
-        for plugin_name in cls.plugins:
-            if not manifest.contains_plugin(plugin_name):
-                missing_plugin_names.append(plugin_name)
+        missing_plugin_names = manifest.missing_plugin_dependencies(cls.plugins or list())
 
         if len(missing_plugin_names):
             raise PluginError("One or more plugin dependencies are not met: %s. Please install them before continuing..." % ", ".join(missing_plugin_names))
 
+    @classmethod
+    def verify_plugin_dependents(cls, cascade=False):
+        print("\nOFFSHOOT PLUGIN UNINSTALL: Verifying that no installed plugin depends on this plugin...\n")
+
+        manifest = offshoot.Manifest()
+
+        dependent_plugin_names = manifest.plugin_dependents(cls.name, transitive=True)
+
+        if not len(dependent_plugin_names):
+            return None
+
+        if not cascade:
+            raise PluginError("One or more installed plugins depend on %s: %s. Please uninstall them before continuing or uninstall with cascade..." % (cls.name, ", ".join(dependent_plugin_names)))
+
+        for plugin_name in dependent_plugin_names:
+            print("Cascading uninstall to %s..." % plugin_name)
+            offshoot.load_plugin_class(plugin_name).uninstall()
+
     @classmethod
     def install_files(cls):
         print("\nOFFSHOOT PLUGIN INSTALL: Installing files...\n")
@@ -80,15 +114,21 @@ class Plugin:
         install_messages = list()
 
         installed_files = list()
-        pluggable_classes = offshoot.pluggable_classes()
+
+        pluggables = cls._pluggable_table()
 
         try:
+            install_messages.extend(cls._pluggable_errors(pluggables))
+
+            if len(install_messages):
+                is_success = False
+
             for file_dict in cls.files:
                 plugin_file_path = "%s/%s/files/%s".replace("/", os.sep) % (offshoot.config["file_paths"]["plugins"], cls.name, file_dict["path"])
 
                 # Pluggable Validation
                 if "pluggable" in file_dict:
-                    is_valid, messages = cls._validate_file_for_pluggable(plugin_file_path, file_dict["pluggable"])
+                    is_valid, messages = cls._validate_file_for_pluggable(plugin_file_path, file_dict["pluggable"], pluggables=pluggables)
 
                     if not is_valid:
                         is_success = False
@@ -100,7 +140,7 @@ class Plugin:
 
                 # File Callback
                 if "pluggable" in file_dict:
-                    pluggable_classes[file_dict["pluggable"]].on_file_install(**file_dict)
+                    cls._pluggable_callback(file_dict["pluggable"], "on_file_install", pluggables=pluggables)(**file_dict)
 
             if not is_success:
                 raise PluginError("Offshoot Plugin File Install Errors: %s" % "".join(install_messages))
@@ -110,20 +150,48 @@ class Plugin:
             # Trigger File Uninstall Callback
             for file_dict in installed_files:
                 if "pluggable" in file_dict:
-                    pluggable_classes[file_dict["pluggable"]].on_file_uninstall(**file_dict)
+                    cls._pluggable_callback(file_dict["pluggable"], "on_file_uninstall", pluggables=pluggables)(**file_dict)
 
             manifest = offshoot.Manifest()
             manifest.remove_plugin(cls.name)
 
             raise e
 
+        if offshoot.config.get("content_store") is True:
+            cls.store_files()
+
+        if offshoot.compiling.bytecode_config()["precompile"] is True:
+            cls.compile_files()
+
     @classmethod
     def uninstall_files(cls):
         print("\nOFFSHOOT PLUGIN UNINSTALL: Uninstalling files...\n")
 
+        pluggables = cls._pluggable_table()
+
         for file_dict in cls.files:
             if "pluggable" in file_dict:
-                offshoot.pluggable_classes()[file_dict["pluggable"]].on_file_uninstall(**file_dict)
+                cls._pluggable_callback(file_dict["pluggable"], "on_file_uninstall", pluggables=pluggables)(**file_dict)
+
+        offshoot.compiling.remove_bytecode(cls.name)
+
+        # Files linked to the content store are left behind as regular, writable files
+        offshoot.store.detach_plugin(cls.name)
+
+    @classmethod
+    def store_files(cls):
+        print("\nOFFSHOOT PLUGIN INSTALL: Deduplicating plugin files into the content store (%s)...\n" % offshoot.store.store_path_for(offshoot.config))
+
+        offshoot.store.store_plugin(cls.name)
+
+    @classmethod
+    def compile_files(cls):
+        print("\nOFFSHOOT PLUGIN INSTALL: Precompiling plugin files...\n")
+
+        errors = offshoot.compiling.compile_plugin(cls.name)
+
+        for file_path, error in errors.items():
+            print("Could not precompile %s: %s" % (file_path, error))
 
     @classmethod
     def install_configuration(cls):
@@ -152,6 +220,10 @@ class Plugin:
                 existing_config = yaml.safe_load(f.read()) or dict()
                 config = {**config, **existing_config}
 
+            # Values already in the file are kept, keys a new version of the plugin declares are added
+            if offshoot.config["sandbox_configuration_keys"] and isinstance(existing_config.get(cls.name), dict):
+                config[cls.name] = {**cls.config, **existing_config[cls.name]}
+
             with open(offshoot.config["file_paths"]["config"], "w") as f:
                 f.write(yaml.dump(config, default_flow_style=False))
 
@@ -228,20 +300,72 @@ class Plugin:
         print("\nLibraries updated successfully. Make sure to run 'pip install -r %s' to fulfill the plugin requirements" % offshoot.config["file_paths"]["libraries"])
 
     @classmethod
-    def _validate_file_for_pluggable(cls, file_path, pluggable):
+    def _skip_phase(cls, phase, unchanged_phases):
+        if phase not in unchanged_phases:
+            return False
+
+        print("\nOFFSHOOT PLUGIN INSTALL: Skipping %s, unchanged since the last install...\n" % phase)
+
+        return True
+
+    @classmethod
+    def _pluggable_table(cls, pluggable_names=None):
+        if pluggable_names is None:
+            pluggable_names = {file_dict["pluggable"] for file_dict in cls.files if "pluggable" in file_dict}
+
+        if not len(pluggable_names):
+            return dict()
+
+        # Mapped once per run: every file of the plugin is validated and called back against the same table
+        if offshoot.config.get("static_pluggables") is True:
+            pluggable_directives = offshoot.pluggable_directives()
+
+            return {name: pluggable_directives[name] for name in pluggable_names if name in pluggable_directives}
+
         pluggable_classes = offshoot.pluggable_classes()
 
-        if pluggable not in pluggable_classes:
-            raise PluginError("The Plugin definition specifies an invalid pluggable: %s => %s" % (file_path, pluggable))
+        return {
+            name: cls._pluggable_entry(pluggable_classes[name])
+            for name in pluggable_names if name in pluggable_classes
+        }
+
+    @classmethod
+    def _pluggable_entry(cls, pluggable_class):
+        directives = pluggable_class.method_directives()
+
+        return {"class": pluggable_class, "directives": directives, "errors": offshoot.pluggable.batched_pairing_errors(directives)}
+
+    @classmethod
+    def _pluggable_errors(cls, pluggables):
+        # Errors in a pluggable's own definition are reported once, not once per file validated against it
+        return ["\n%s: %s" % (name, error) for name in sorted(pluggables) for error in pluggables[name]["errors"]]
+
+    @classmethod
+    def _validate_file_for_pluggable(cls, file_path, pluggable, pluggables=None):
+        pluggables = cls._pluggable_table([pluggable]) if pluggables is None else pluggables
 
-        pluggable_class = pluggable_classes[pluggable]
+        if pluggable not in pluggables:
+            raise PluginError("The Plugin definition specifies an invalid pluggable: %s => %s" % (file_path, pluggable))
 
         return offshoot.validate_plugin_file(
             file_path,
             pluggable,
-            pluggable_class.method_directives()
+            pluggables[pluggable]["directives"]
         )
 
+    @classmethod
+    def _pluggable_callback(cls, pluggable, callback, pluggables=None):
+        entry = (cls._pluggable_table([pluggable]) if pluggables is None else pluggables)[pluggable]
+
+        # Static mode only imports application modules when the pluggable overrides the callback
+        if "class" not in entry:
+            if callback not in entry["callbacks"]:
+                return getattr(offshoot.Pluggable, callback)
+
+            entry["class"] = offshoot.pluggable_classes()[pluggable]
+
+        return getattr(entry["class"], callback)
+
     @classmethod
     def _generate_plugin_requirement_block(cls):
         requirement_lines = ["### %s Requirements ###" % cls.name]
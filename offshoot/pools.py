@@ -0,0 +1,264 @@
+import queue
+import threading
+import contextlib
+
+import offshoot
+
+from offshoot.plugin import PluginError
+from offshoot.budgets import PluginTimeoutError
+from offshoot.forking import after_fork_in_child
+
+
+default_pool_size = 2
+default_warmup_threads = 1
+
+# Left in the idle queue after a failed warmup so that waiting callers wake up and raise instead of hanging
+_warmup_failed = object()
+
+_pools = dict()
+_class_loads = dict()
+
+_lock = threading.Lock()
+
+
+class PluginInstancePool:
+
+    def __init__(self, plugin_class, size=None, warmup_threads=None, init_kwargs=None):
+        pool_config = pools_config_for(plugin_class)
+
+        self.plugin_class = plugin_class
+        self.init_kwargs = init_kwargs or dict()
+
+        self.size = size or pool_config.get("size") or default_pool_size
+        self.warmup_threads = min(warmup_threads or pool_config.get("warmup_threads") or default_warmup_threads, self.size)
+
+        self.error = None
+
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._threads = list()
+        self._pending = self.size
+        self._built = 0
+
+        self._lock = threading.Lock()
+
+    @property
+    def idle(self):
+        return self._idle.qsize()
+
+    @property
+    def is_warm(self):
+        return self._built == self.size
+
+    def warm(self, wait=False):
+        with self._lock:
+            if not len(self._threads):
+                for i in range(self.warmup_threads):
+                    thread = threading.Thread(target=self._warm_up, name="offshoot-warmup-%s" % self.plugin_class.__name__, daemon=True)
+                    thread.start()
+
+                    self._threads.append(thread)
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+            self._raise_warmup_error()
+
+    def acquire(self, timeout=None):
+        self.warm()
+
+        try:
+            instance = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            self._raise_warmup_error()
+            raise PluginTimeoutError("No warm %s instance became available within %ss." % (self.plugin_class.__name__, timeout))
+
+        if instance is _warmup_failed:
+            self._idle.put(instance)
+            self._raise_warmup_error()
+
+        return instance
+
+    def release(self, instance):
+        try:
+            self._idle.put_nowait(instance)
+        except queue.Full:
+            pass
+
+    @contextlib.contextmanager
+    def instance(self, timeout=None):
+        instance = self.acquire(timeout=timeout)
+
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+    def drain(self):
+        instances = list()
+
+        while True:
+            try:
+                instance = self._idle.get_nowait()
+            except queue.Empty:
+                return instances
+
+            if instance is not _warmup_failed:
+                instances.append(instance)
+
+    def reset_after_fork(self):
+        idle = queue.LifoQueue(maxsize=self.size)
+        idle.queue.extend(self._idle.queue)
+
+        self._idle = idle
+        self._lock = threading.Lock()
+
+        # Only idle instances exist in the child: those being built or handed out by other threads are
+        # gone along with the threads, so the next warm() builds replacements for them
+        self._threads = list()
+        self._built = idle.qsize()
+        self._pending = self.size - self._built
+
+    def _warm_up(self):
+        try:
+            load_class(self.plugin_class)
+
+            while self._claim():
+                instance = self.plugin_class(**self.init_kwargs)
+
+                if callable(getattr(instance, "on_warmup", None)):
+                    instance.on_warmup()
+
+                self._idle.put(instance)
+
+                with self._lock:
+                    self._built += 1
+        except Exception as e:
+            self.error = e
+
+            try:
+                self._idle.put_nowait(_warmup_failed)
+            except queue.Full:
+                pass
+
+    def _claim(self):
+        with self._lock:
+            if self._pending == 0 or self.error is not None:
+                return False
+
+            self._pending -= 1
+
+            return True
+
+    def _raise_warmup_error(self):
+        if self.error is not None:
+            raise PluginError("%s instances failed to warm up: %s" % (self.plugin_class.__name__, self.error))
+
+
+class _ClassLoad:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+def load_class(plugin_class):
+    with _lock:
+        class_load = _class_loads.get(plugin_class)
+        is_loader = class_load is None
+
+        if is_loader:
+            class_load = _class_loads[plugin_class] = _ClassLoad()
+
+    # Other warmup threads wait for on_load to finish: no instance is built before it ran, or after it failed
+    if not is_loader:
+        class_load.done.wait()
+
+        if class_load.error is not None:
+            raise class_load.error
+
+        return None
+
+    try:
+        if callable(getattr(plugin_class, "on_load", None)):
+            plugin_class.on_load()
+    except Exception as e:
+        class_load.error = e
+
+        # The next warmup loads the class again
+        with _lock:
+            if _class_loads.get(plugin_class) is class_load:
+                del _class_loads[plugin_class]
+
+        raise
+    finally:
+        class_load.done.set()
+
+
+def pool_for(plugin_class, **kwargs):
+    pool = _pools.get(plugin_class)
+
+    if pool is None:
+        with _lock:
+            pool = _pools.get(plugin_class)
+
+            if pool is None:
+                pool = _pools[plugin_class] = PluginInstancePool(plugin_class, **kwargs)
+
+    return pool
+
+
+def instance_pools(pluggable, selection=None, wait=False, **kwargs):
+    pools = dict()
+
+    for class_name, plugin_class in offshoot.discover(pluggable, selection=selection).items():
+        pools[class_name] = pool_for(plugin_class, **kwargs)
+        pools[class_name].warm()
+
+    if wait:
+        for pool in pools.values():
+            pool.warm(wait=True)
+
+    return pools
+
+
+def warm_up(pluggables, wait=False):
+    pools = dict()
+
+    for pluggable in pluggables:
+        pools[pluggable] = instance_pools(pluggable, wait=wait)
+
+    return pools
+
+
+def drop(plugin_class=None):
+    with _lock:
+        plugin_classes = [plugin_class] if plugin_class is not None else list(_pools.keys())
+
+        for plugin_class in plugin_classes:
+            pool = _pools.pop(plugin_class, None)
+
+            if pool is not None:
+                pool.drain()
+
+            _class_loads.pop(plugin_class, None)
+
+
+def pools_config_for(plugin_class):
+    pools_config = offshoot.config.get("pools") or dict()
+    metadata = offshoot.plugin_registry.class_metadata(plugin_class) or dict()
+
+    return pools_config.get(plugin_class.__name__) or pools_config.get(metadata.get("plugin")) or dict()
+
+
+@after_fork_in_child
+def _reset_after_fork():
+    global _lock, _class_loads
+
+    _lock = threading.Lock()
+
+    # A class being loaded by one of the parent's threads never finishes loading in the child
+    _class_loads = {plugin_class: class_load for plugin_class, class_load in _class_loads.items() if class_load.done.is_set()}
+
+    for pool in _pools.values():
+        pool.reset_after_fork()
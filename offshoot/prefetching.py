@@ -0,0 +1,47 @@
+import os
+import importlib
+import concurrent.futures
+
+import offshoot
+
+from offshoot.manifest import Manifest
+from offshoot.registry import plugin_module_for
+
+
+def prefetch(pluggables, max_workers=None):
+    if isinstance(pluggables, str):
+        pluggables = [pluggables]
+
+    manifest = Manifest(file_path=offshoot.plugin_registry.manifest_file_path)
+
+    plugin_modules = dict()
+
+    for pluggable in pluggables:
+        plugin_modules[pluggable] = [plugin_module_for(file_entry["file_path"]) for file_entry in manifest.plugin_file_entries_for_pluggable(pluggable)]
+
+    modules = sorted(set(module for modules in plugin_modules.values() for module in modules))
+
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers or min(len(modules) + len(plugin_modules), os.cpu_count() or 1) or 1,
+        thread_name_prefix="offshoot-prefetch"
+    )
+
+    # Python holds a lock per module being imported: different modules import in parallel and a discover()
+    # reaching a module that is still being imported waits for that import instead of starting it over
+    import_futures = {module: executor.submit(importlib.import_module, module) for module in modules}
+
+    # Imports are queued first so that an entry build never occupies a worker while its imports wait behind it
+    entry_futures = dict()
+
+    for pluggable, modules in plugin_modules.items():
+        entry_futures[pluggable] = executor.submit(_build_entry, pluggable, [import_futures[module] for module in modules])
+
+    executor.shutdown(wait=False)
+
+    return entry_futures
+
+
+def _build_entry(pluggable, import_futures):
+    concurrent.futures.wait(import_futures)
+
+    return offshoot.plugin_registry.entry(pluggable)
@@ -0,0 +1,100 @@
+import os
+import inspect
+import importlib
+import functools
+import concurrent.futures
+
+import offshoot
+
+from offshoot.pluggable import Pluggable, pluggable_class_for
+
+
+_worker_instance = None
+
+
+class PluginProcessProxy:
+
+    def __init__(self, plugin_class, pluggable=None, pool_size=None, limits=None, init_kwargs=None):
+        process_config = processes_config_for(plugin_class)
+
+        self.plugin_class = plugin_class
+        self.pluggable = pluggable or _nearest_pluggable(plugin_class)
+
+        self.pool_size = pool_size or process_config.get("pool_size") or os.cpu_count() or 1
+        self.limits = limits if limits is not None else (process_config.get("limits") or dict())
+
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            initializer=_initialize_worker,
+            initargs=(plugin_class.__module__, plugin_class.__qualname__, init_kwargs or dict(), self.limits)
+        )
+
+        pluggable_class = pluggable_class_for(plugin_class, self.pluggable)
+        self.methods = pluggable_class.method_directives()["expected"] if pluggable_class is not None else list()
+
+        for method in self.methods:
+            setattr(self, method, functools.partial(self.call, method))
+
+    def call(self, method, *args, **kwargs):
+        return self.submit(method, *args, **kwargs).result()
+
+    def submit(self, method, *args, **kwargs):
+        if method not in self.methods:
+            raise AttributeError("'%s' is not an expected method of the '%s' pluggable." % (method, self.pluggable))
+
+        return self.executor.submit(_call_worker, method, args, kwargs)
+
+    def warm(self):
+        futures = [self.executor.submit(os.getpid) for i in range(self.pool_size)]
+        concurrent.futures.wait(futures)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+
+def process_proxies(pluggable, selection=None, **kwargs):
+    proxies = dict()
+
+    for class_name, plugin_class in offshoot.discover(pluggable, selection=selection).items():
+        proxies[class_name] = PluginProcessProxy(plugin_class, pluggable=pluggable, **kwargs)
+
+    return proxies
+
+
+def processes_config_for(plugin_class):
+    processes_config = offshoot.config.get("processes") or dict()
+    metadata = offshoot.plugin_registry.class_metadata(plugin_class) or dict()
+
+    return processes_config.get(plugin_class.__name__) or processes_config.get(metadata.get("plugin")) or dict()
+
+
+def _initialize_worker(module, qualname, init_kwargs, limits):
+    global _worker_instance
+
+    if len(limits):
+        import resource
+
+        for name, limit in limits.items():
+            limit = tuple(limit) if isinstance(limit, (list, tuple)) else (limit, limit)
+            resource.setrlimit(getattr(resource, name), limit)
+
+    plugin_class = functools.reduce(getattr, qualname.split("."), importlib.import_module(module))
+    _worker_instance = plugin_class(**init_kwargs)
+
+
+def _call_worker(method, args, kwargs):
+    return getattr(_worker_instance, method)(*args, **kwargs)
+
+
+def _nearest_pluggable(plugin_class):
+    for base in inspect.getmro(plugin_class)[1:]:
+        if issubclass(base, Pluggable) and base is not Pluggable:
+            return base.__name__
+
+    return None
@@ -0,0 +1,265 @@
+import os
+import time
+import importlib
+import threading
+import collections
+
+import offshoot
+
+from offshoot.manifest import Manifest
+
+
+RegistryEntry = collections.namedtuple("RegistryEntry", ["signature", "classes", "metadata", "file_paths"])
+
+default_check_interval = 1.0
+
+
+class PluginRegistry:
+    # Readers only ever dereference self._snapshot, a dict that is never mutated once published.
+    # Writers build a copy under self._lock and swap it in with a single attribute assignment.
+
+    def __init__(self, **kwargs):
+        self.manifest_file_path = kwargs.get("manifest_file_path", "offshoot.manifest.json")
+
+        self.generation = 0
+        self.class_hooks = tuple()
+
+        self.frozen = False
+
+        self._snapshot = dict()
+        self._lock = threading.Lock()
+        self._key_locks = dict()
+
+        self._plugin_versions = dict()
+        self._module_signatures = dict()
+        self._checked_at = dict()
+
+    def discover(self, pluggable, selection=None, fresh=False):
+        return self.entry(pluggable, selection=selection, fresh=fresh).classes
+
+    def entry(self, pluggable, selection=None, fresh=False):
+        key = self._key(pluggable, selection)
+        seen_entry = self._snapshot.get(key)
+
+        # Frozen entries were built before forking: they are served as is, without any file system check
+        if not fresh and seen_entry is not None and (self.frozen or self._is_current(seen_entry, key)):
+            return seen_entry
+
+        with self._key_lock(key):
+            entry = self._snapshot.get(key)
+
+            # Another thread built this entry while we were waiting: join its result
+            if entry is not None and entry is not seen_entry and self._is_current(entry, key):
+                return entry
+
+            entry = self._build(pluggable, key[1])
+            self._publish({key: entry})
+            self._record_check(key, entry)
+
+            return entry
+
+    def lookup(self, pluggable, class_name=None, selection=None):
+        entry = self._snapshot.get(self._key(pluggable, selection))
+
+        if entry is None:
+            return None if class_name is not None else dict()
+
+        if class_name is not None:
+            return entry.classes.get(class_name)
+
+        return entry.classes
+
+    def metadata(self, pluggable, class_name, selection=None):
+        entry = self._snapshot.get(self._key(pluggable, selection))
+
+        if entry is None:
+            return None
+
+        return entry.metadata.get(class_name)
+
+    def class_metadata(self, plugin_class):
+        for entry in self._snapshot.values():
+            for class_name, entry_class in entry.classes.items():
+                if entry_class is plugin_class:
+                    return entry.metadata[class_name]
+
+        return None
+
+    def snapshot(self):
+        return self._snapshot
+
+    def add_class_hook(self, hook):
+        with self._lock:
+            if hook not in self.class_hooks:
+                self.class_hooks = self.class_hooks + (hook,)
+
+    def remove_class_hook(self, hook):
+        with self._lock:
+            self.class_hooks = tuple(h for h in self.class_hooks if h is not hook)
+
+    def freeze(self):
+        self.frozen = True
+
+    def invalidate(self, pluggable=None):
+        with self._lock:
+            self.frozen = False
+
+            snapshot = {key: entry for key, entry in self._snapshot.items() if pluggable is not None and key[0] != pluggable}
+
+            self._snapshot = snapshot
+            self._checked_at = {key: checked_at for key, checked_at in self._checked_at.items() if key in snapshot}
+
+            self.generation += 1
+
+    def manifest_signature(self):
+        return file_signature(self.manifest_file_path)
+
+    def signature(self, file_paths):
+        return [file_signature(self.manifest_file_path)] + [offshoot.archives.plugin_file_signature(file_path) for file_path in file_paths]
+
+    def _build(self, pluggable, selection):
+        # Files are stat'ed before being read so that a concurrent write is caught by the next freshness check
+        signature = [file_signature(self.manifest_file_path)]
+
+        file_paths = list()
+        classes = dict()
+        metadata = dict()
+
+        indexed = self._indexed_classes(pluggable)
+
+        # An index published from the current manifest lists the plugin files itself: the manifest isn't parsed
+        if indexed is not None:
+            file_entries = [offshoot.index.file_entry_for(record) for record in indexed.values()]
+        else:
+            file_entries = Manifest(file_path=self.manifest_file_path).plugin_file_entries_for_pluggable(pluggable)
+            indexed = dict()
+
+        for file_entry in file_entries:
+            plugin_file_path = file_entry["file_path"]
+
+            file_paths.append(plugin_file_path)
+            signature.append(offshoot.archives.plugin_file_signature(plugin_file_path))
+
+            record = indexed.get(plugin_file_path)
+
+            # The index is only trusted for files that haven't changed since it was published
+            if record is not None and signature[-1] is not None and (record["mtime_ns"], record["size"]) == signature[-1][:2]:
+                valid, plugin_class = record["class_name"] != "", record["class_name"]
+            else:
+                valid, plugin_class = offshoot.file_contains_pluggable(plugin_file_path, pluggable)
+
+            if not valid:
+                continue
+
+            if selection and plugin_class not in selection:
+                continue
+
+            plugin_module = plugin_module_for(plugin_file_path)
+
+            self._import_version(file_entry["plugin"], file_entry["version"])
+
+            classes[plugin_class] = getattr(self._import_module(plugin_module, signature[-1]), plugin_class)
+            metadata[plugin_class] = dict(module=plugin_module, **file_entry)
+
+            for class_hook in self.class_hooks:
+                class_hook(classes[plugin_class], pluggable, metadata[plugin_class])
+
+        return RegistryEntry(signature, classes, metadata, file_paths)
+
+    def _import_version(self, plugin_name, version):
+        if self._plugin_versions.setdefault(plugin_name, version) == version:
+            return None
+
+        # Another version was activated since the plugin's modules were imported: they get imported again
+        with self._lock:
+            if self._plugin_versions[plugin_name] != version:
+                offshoot.versions.reload_plugin_modules(plugin_name)
+                self._plugin_versions[plugin_name] = version
+
+    def _import_module(self, module_name, signature):
+        if self._module_signatures.setdefault(module_name, signature) != signature:
+            # The file changed since it was imported: the module in sys.modules describes its previous contents
+            with self._lock:
+                if self._module_signatures[module_name] != signature:
+                    offshoot.unloading._drop_module(module_name)
+                    self._module_signatures[module_name] = signature
+
+        return importlib.import_module(module_name)
+
+    def _indexed_classes(self, pluggable):
+        if not offshoot.config.get("discovery_index"):
+            return None
+
+        return offshoot.index.indexed_classes(pluggable, self.manifest_file_path)
+
+    def _publish(self, entries):
+        with self._lock:
+            snapshot = dict(self._snapshot)
+            snapshot.update(entries)
+
+            self._snapshot = snapshot
+            self.generation += 1
+
+    def _is_current(self, entry, key=None):
+        # The manifest is stat'ed on every check, installs and uninstalls are never missed
+        if entry.signature[:1] != [self.manifest_signature()]:
+            return False
+
+        checked_at = self._checked_at.get(key)
+        check_interval = offshoot.config.get("discovery_check_interval", default_check_interval)
+
+        # Plugin files are only stat'ed again once the check interval elapsed
+        if checked_at is not None and checked_at[0] is entry and time.monotonic() - checked_at[1] < (check_interval or 0):
+            return True
+
+        if entry.signature != self.signature(entry.file_paths):
+            return False
+
+        if key is not None:
+            self._record_check(key, entry)
+
+        return True
+
+    def _record_check(self, key, entry):
+        # Copied on write like the snapshot: invalidate() iterates the published dict while checks are recorded
+        with self._lock:
+            if self._snapshot.get(key) is not entry:
+                return None
+
+            checked_at = dict(self._checked_at)
+            checked_at[key] = (entry, time.monotonic())
+
+            self._checked_at = checked_at
+
+    def reset_locks(self):
+        self._lock = threading.Lock()
+        self._key_locks = dict()
+
+    def _key_lock(self, key):
+        key_lock = self._key_locks.get(key)
+
+        if key_lock is None:
+            with self._lock:
+                key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        return key_lock
+
+    @staticmethod
+    def _key(pluggable, selection):
+        if isinstance(selection, str):
+            selection = [selection]
+
+        return pluggable, tuple(sorted(selection)) if selection else None
+
+
+def plugin_module_for(file_path):
+    return file_path.replace(os.sep, ".").replace(".py", "")
+
+
+def file_signature(file_path):
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
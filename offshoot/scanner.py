@@ -0,0 +1,174 @@
+import ast
+import bisect
+import re
+
+
+_string_or_comment_pattern = re.compile(
+    r"#[^\n]*"
+    r"|[rRbBuUfF]{0,2}(?:\"\"\"(?:\\.|[^\\])*?\"\"\"|'''(?:\\.|[^\\])*?''')"
+    r"|[rRbBuUfF]{0,2}(?:\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*')",
+    re.DOTALL
+)
+
+_top_level_class_pattern = re.compile(r"^class\b", re.MULTILINE)
+_nested_class_pattern = re.compile(r"^[ \t]+class\b", re.MULTILINE)
+_class_header_pattern = re.compile(r"class[ \t]+(\w+)[ \t]*(?:\(([^()#'\"]*)\))?[ \t]*:[ \t]*(#[^\n]*)?(\n|$)")
+_top_level_code_pattern = re.compile(r"^[^\s#]", re.MULTILINE)
+_indented_code_pattern = re.compile(r"^([ \t]+)[^\s#]", re.MULTILINE)
+_method_pattern = re.compile(r"^([ \t]+)(?:async[ \t]+)?def[ \t]+(\w+)", re.MULTILINE)
+_base_pattern = re.compile(r"^[A-Za-z_][\w.]*$")
+_line_continuation_pattern = re.compile(r"\\\r?\n")
+
+
+def class_headers(source):
+    headers = scan_class_headers(source)
+
+    if headers is None:
+        headers = ast_class_headers(source)
+
+    return headers
+
+
+def scan_class_headers(source):
+    # Line-oriented pass over top-level class headers and their method names. Returns None when the
+    # result could differ from the AST (nested classes, complex bases, ...) so callers can fall back.
+    # A backslash-newline continues a single-quoted string onto the next line, where the lexer isn't looking
+    if _line_continuation_pattern.search(source):
+        return None
+
+    string_spans = _multiline_string_spans(source)
+
+    if any(not _in_spans(string_spans, m.start()) for m in _nested_class_pattern.finditer(source)):
+        return None
+
+    header_positions = [m.start() for m in _top_level_class_pattern.finditer(source) if not _in_spans(string_spans, m.start())]
+    headers = list()
+
+    for index, position in enumerate(header_positions):
+        header_match = _class_header_pattern.match(source, position)
+
+        if header_match is None:
+            return None
+
+        bases = _parse_bases(header_match.group(2) or "")
+
+        if bases is None:
+            return None
+
+        region_end = header_positions[index + 1] if index + 1 < len(header_positions) else len(source)
+        methods = _scan_methods(source, string_spans, header_match.end(), region_end)
+
+        if methods is None:
+            return None
+
+        headers.append((header_match.group(1), bases, methods))
+
+    return headers
+
+
+def ast_class_headers(source):
+    headers = list()
+
+    for statement in ast.walk(ast.parse(source)):
+        if isinstance(statement, ast.ClassDef):
+            bases = [b.id if isinstance(b, ast.Name) else b.attr for b in statement.bases if isinstance(b, (ast.Name, ast.Attribute))]
+            methods = [body_item.name for body_item in statement.body if isinstance(body_item, (ast.FunctionDef, ast.AsyncFunctionDef))]
+
+            headers.append((statement.name, bases, methods))
+
+    return headers
+
+
+def _scan_methods(source, string_spans, body_start, region_end):
+    body_end = region_end
+
+    for m in _top_level_code_pattern.finditer(source, body_start, region_end):
+        if not _in_spans(string_spans, m.start()):
+            body_end = m.start()
+            break
+
+    body_indentation = None
+
+    for m in _indented_code_pattern.finditer(source, body_start, body_end):
+        body_indentation = m.group(1)
+        break
+
+    if body_indentation is None:
+        return list()
+
+    methods = list()
+
+    for m in _method_pattern.finditer(source, body_start, region_end):
+        if m.group(1) != body_indentation or _in_spans(string_spans, m.start()):
+            continue
+
+        # A method-looking line after the class body ended belongs to something we can't place without parsing
+        if m.start() >= body_end:
+            return None
+
+        methods.append(m.group(2))
+
+    return methods
+
+
+def _parse_bases(bases_string):
+    bases = list()
+
+    for base in bases_string.split(","):
+        base = base.strip()
+
+        if not len(base):
+            continue
+
+        if "=" in base:
+            continue
+
+        if not _base_pattern.match(base):
+            return None
+
+        bases.append(base.split(".")[-1])
+
+    return bases
+
+
+def _multiline_string_spans(source):
+    # Strings and comments can only hide a triple quote on their own line, so only lines holding one get lexed
+    starts = list()
+    ends = list()
+
+    position = _next_triple_quote(source, 0)
+
+    while position != -1:
+        end = position + 3
+        lex_start = max(source.rfind("\n", 0, position) + 1, ends[-1] if len(ends) else 0)
+
+        for m in _string_or_comment_pattern.finditer(source, lex_start):
+            if m.end() <= position:
+                continue
+
+            if m.start() <= position:
+                end = m.end()
+
+                if not m.group(0).startswith("#") and "\n" in m.group(0):
+                    starts.append(m.start())
+                    ends.append(m.end())
+
+            break
+
+        position = _next_triple_quote(source, end)
+
+    return [starts, ends]
+
+
+def _next_triple_quote(source, start):
+    positions = [p for p in [source.find('"""', start), source.find("'''", start)] if p != -1]
+
+    return min(positions) if len(positions) else -1
+
+
+def _in_spans(string_spans, position):
+    starts, ends = string_spans
+
+    index = bisect.bisect_right(starts, position) - 1
+
+    return index >= 0 and position < ends[index]
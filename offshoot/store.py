@@ -0,0 +1,227 @@
+import os
+import stat
+import shutil
+import hashlib
+import threading
+
+import offshoot
+
+from offshoot.forking import after_fork_in_child
+from offshoot.registry import file_signature
+
+
+default_store_path = "offshoot.store"
+
+chunk_size = 1024 * 1024
+
+_file_hashes = dict()
+_lock = threading.Lock()
+
+
+def store_path_for(config):
+    return (config.get("file_paths") or dict()).get("store") or default_store_path
+
+
+def blob_path_for(digest):
+    return os.path.join(store_path_for(offshoot.config), digest[:2], digest[2:])
+
+
+def file_hash(file_path):
+    signature = file_signature(file_path)
+    cached = _file_hashes.get(file_path)
+
+    # Files are only hashed again once their stat changed
+    if cached is not None and signature is not None and cached[0] == signature:
+        return cached[1]
+
+    sha256 = hashlib.sha256()
+
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+
+    with _lock:
+        _file_hashes[file_path] = (signature, sha256.hexdigest())
+
+    return sha256.hexdigest()
+
+
+def directory_files(files_directory):
+    files = list()
+
+    for directory, directory_names, file_names in os.walk(files_directory):
+        directory_names[:] = sorted(name for name in directory_names if name != "__pycache__")
+
+        for file_name in sorted(file_names):
+            if file_name.endswith(".pyc") or file_name.startswith(".offshoot-"):
+                continue
+
+            file_path = os.path.join(directory, file_name)
+            files.append((os.path.relpath(file_path, files_directory).replace(os.sep, "/"), file_path))
+
+    return files
+
+
+def plugin_file_hashes(plugin_name):
+    archive = offshoot.archives.archive_for(plugin_name)
+
+    if archive is not None:
+        prefix = "%s/files/" % plugin_name
+
+        return {
+            member[len(prefix):]: hashlib.sha256(archive.read(member)).hexdigest()
+            for member in sorted(archive.members) if member.startswith(prefix) and not member.endswith(("/", ".pyc"))
+        }
+
+    return directory_file_hashes(os.path.join(offshoot.config["file_paths"]["plugins"], plugin_name, "files"))
+
+
+def directory_file_hashes(files_directory):
+    return {relative_path: file_hash(file_path) for relative_path, file_path in directory_files(files_directory)}
+
+
+def add_blob(file_path, digest):
+    blob_path = blob_path_for(digest)
+
+    if os.path.isfile(blob_path):
+        return False
+
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    temporary_blob_path = "%s.%d.tmp" % (blob_path, os.getpid())
+
+    try:
+        os.link(file_path, temporary_blob_path)
+    except OSError:
+        shutil.copyfile(file_path, temporary_blob_path)
+
+    # Every plugin linking a blob shares its inode: an edit in place would show up in all of them
+    mode = os.stat(temporary_blob_path).st_mode
+    os.chmod(temporary_blob_path, stat.S_IMODE(mode) & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+    os.replace(temporary_blob_path, blob_path)
+
+    return True
+
+
+def materialize(digest, file_path):
+    blob_path = blob_path_for(digest)
+
+    if os.path.isfile(file_path) and os.path.samefile(blob_path, file_path):
+        return False
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    temporary_file_path = os.path.join(os.path.dirname(file_path), ".offshoot-%s.tmp" % digest[:16])
+
+    try:
+        os.link(blob_path, temporary_file_path)
+    except OSError:
+        # No hardlinks across file systems: the bytes are only copied when they differ
+        if os.path.isfile(file_path) and file_hash(file_path) == digest:
+            return False
+
+        shutil.copyfile(blob_path, temporary_file_path)
+
+    os.replace(temporary_file_path, file_path)
+
+    return True
+
+
+def store_plugin(plugin_name):
+    if offshoot.archives.archive_for(plugin_name) is not None:
+        return dict()
+
+    return store_directory(os.path.join(offshoot.config["file_paths"]["plugins"], plugin_name, "files"))
+
+
+def store_directory(files_directory):
+    file_hashes = dict()
+
+    for relative_path, file_path in directory_files(files_directory):
+        digest = file_hashes[relative_path] = file_hash(file_path)
+
+        add_blob(file_path, digest)
+        materialize(digest, file_path)
+
+        with _lock:
+            _file_hashes[file_path] = (file_signature(file_path), digest)
+
+    return file_hashes
+
+
+def detach_plugin(plugin_name):
+    if offshoot.archives.archive_for(plugin_name) is not None:
+        return list()
+
+    return detach_directory(os.path.join(offshoot.config["file_paths"]["plugins"], plugin_name, "files"))
+
+
+def detach_directory(files_directory):
+    detached_files = list()
+
+    for relative_path, file_path in directory_files(files_directory):
+        file_stat = os.stat(file_path)
+
+        if file_stat.st_nlink == 1:
+            continue
+
+        # A private, writable copy takes the place of the link: editing it leaves the blob and the other plugins alone
+        temporary_file_path = os.path.join(os.path.dirname(file_path), ".offshoot-%s.tmp" % os.path.basename(file_path))
+
+        shutil.copyfile(file_path, temporary_file_path)
+        os.chmod(temporary_file_path, stat.S_IMODE(file_stat.st_mode) | stat.S_IWUSR)
+
+        os.replace(temporary_file_path, file_path)
+
+        detached_files.append(file_path)
+
+    return detached_files
+
+
+def referenced_digests(manifest=None):
+    manifest = manifest or offshoot.Manifest()
+    digests = set()
+
+    for name, metadata in manifest.list_plugins().items():
+        digests.update((metadata.get("file_hashes") or dict()).values())
+
+    return digests
+
+
+def collect_garbage(manifest=None):
+    store_path = store_path_for(offshoot.config)
+    digests = referenced_digests(manifest=manifest)
+
+    removed_blobs = list()
+    freed_bytes = 0
+
+    if not os.path.isdir(store_path):
+        return removed_blobs, freed_bytes
+
+    for prefix in sorted(os.listdir(store_path)):
+        prefix_path = os.path.join(store_path, prefix)
+
+        for blob_name in sorted(os.listdir(prefix_path)):
+            if blob_name.endswith(".tmp"):
+                continue
+
+            blob_path = os.path.join(prefix_path, blob_name)
+            blob_stat = os.stat(blob_path)
+
+            # A blob still linked from a plugin directory frees nothing when removed, so it is kept
+            if prefix + blob_name not in digests and blob_stat.st_nlink == 1:
+                os.remove(blob_path)
+
+                removed_blobs.append(prefix + blob_name)
+                freed_bytes += blob_stat.st_size
+
+        if not len(os.listdir(prefix_path)):
+            os.rmdir(prefix_path)
+
+    return removed_blobs, freed_bytes
+
+
+@after_fork_in_child
+def _reset_lock_after_fork():
+    global _lock
+
+    _lock = threading.Lock()
@@ -0,0 +1,184 @@
+import os
+import collections
+
+import yaml
+
+import offshoot
+
+from offshoot.plugin import PluginError
+from offshoot.manifest import Manifest
+
+
+SyncAction = collections.namedtuple("SyncAction", ["action", "plugin", "from_version", "to_version", "source"])
+
+
+def load_desired(file_path):
+    with open(file_path, "r") as f:
+        desired = yaml.safe_load(f) or dict()
+
+    plugins = desired.get("plugins") or dict()
+
+    if isinstance(plugins, list):
+        plugins = {plugin_name: None for plugin_name in plugins}
+
+    desired_plugins = dict()
+
+    for plugin_name, spec in plugins.items():
+        if not isinstance(spec, dict):
+            spec = {"version": spec}
+
+        desired_plugins[plugin_name] = {
+            "version": str(spec["version"]) if spec.get("version") is not None else None,
+            "source": spec.get("source")
+        }
+
+    return desired_plugins
+
+
+def plan(desired_plugins, manifest=None):
+    manifest = manifest or Manifest()
+    installed_plugins = manifest.list_plugins()
+
+    removals = [name for name in installed_plugins if name not in desired_plugins]
+
+    # Plugins are removed after everything depending on them
+    removal_order = list()
+
+    for plugin_name in removals:
+        for dependent in manifest.plugin_dependents(plugin_name, transitive=True) + [plugin_name]:
+            if dependent in removals and dependent not in removal_order:
+                removal_order.append(dependent)
+
+    actions = [SyncAction("remove", name, installed_plugins[name].get("version"), None, None) for name in removal_order]
+
+    changes = dict()
+
+    for plugin_name, spec in desired_plugins.items():
+        installed = installed_plugins.get(plugin_name)
+        version = spec["version"]
+
+        if installed is None:
+            changes[plugin_name] = SyncAction("install", plugin_name, None, version, spec["source"])
+        elif version is not None and version != installed.get("version"):
+            changes[plugin_name] = SyncAction("upgrade", plugin_name, installed.get("version"), version, spec["source"])
+        elif (installed.get("file_hashes") or dict()) != offshoot.store.plugin_file_hashes(plugin_name):
+            # Same version, different files: the plugin was modified in place since it was installed
+            changes[plugin_name] = SyncAction("reinstall", plugin_name, installed.get("version"), installed.get("version"), spec["source"])
+
+    return actions + _in_dependency_order(changes, manifest)
+
+
+def apply(actions, manifest=None):
+    manifest = manifest or Manifest()
+    applied = list()
+
+    with manifest.lock(), manifest.deferred_changes():
+        for action in actions:
+            print("\nOFFSHOOT SYNC: %s" % describe(action))
+
+            if action.action == "remove":
+                offshoot.load_plugin_class(action.plugin).uninstall()
+            elif action.action == "upgrade" and _is_staged(action.plugin, action.to_version, action.source, manifest):
+                offshoot.versions.activate(action.plugin, action.to_version)
+            else:
+                _install(action, manifest)
+
+            applied.append(action)
+
+    return applied
+
+
+def sync(file_path, dry_run=False):
+    actions = plan(load_desired(file_path))
+
+    if dry_run:
+        return actions
+
+    return apply(actions)
+
+
+def describe(action):
+    if action.action == "install":
+        return "install %s %s" % (action.plugin, action.to_version or "")
+    elif action.action == "remove":
+        return "remove %s %s" % (action.plugin, action.from_version or "")
+    elif action.action == "upgrade":
+        return "upgrade %s %s -> %s" % (action.plugin, action.from_version, action.to_version)
+
+    return "reinstall %s %s (files changed)" % (action.plugin, action.from_version)
+
+
+def _install(action, manifest):
+    if action.to_version is not None and _available_version(action.plugin) != action.to_version:
+        if not _is_staged(action.plugin, action.to_version, action.source, manifest):
+            raise PluginError("Version '%s' of %s is neither in '%s' nor staged." % (
+                action.to_version, action.plugin, os.path.join(offshoot.config["file_paths"]["plugins"], action.plugin)
+            ))
+
+        offshoot.versions.activate(action.plugin, action.to_version)
+
+    # The plugin's modules may describe files that changed on disk since they were imported
+    if action.action != "install":
+        offshoot.versions.reload_plugin_modules(action.plugin)
+
+    offshoot.load_plugin_class(action.plugin).install()
+
+
+def _is_staged(plugin_name, version, source, manifest):
+    if version in manifest.plugin_versions(plugin_name)["staged"]:
+        return True
+
+    if source is None:
+        return False
+
+    if offshoot.versions.load_staged_plugin_class(plugin_name, source).version != version:
+        raise PluginError("'%s' contains a version of %s other than '%s'." % (source, plugin_name, version))
+
+    offshoot.versions.stage(plugin_name, source)
+
+    return True
+
+
+def _available_version(plugin_name):
+    plugin_directory = os.path.join(offshoot.config["file_paths"]["plugins"], plugin_name)
+
+    if not os.path.isfile(os.path.join(plugin_directory, "plugin.py")):
+        return None
+
+    return offshoot.versions.load_staged_plugin_class(plugin_name, plugin_directory).version
+
+
+def _in_dependency_order(changes, manifest):
+    installed_plugins = manifest.list_plugins()
+    ordered_changes = list()
+
+    def dependencies_of(plugin_name):
+        action = changes[plugin_name]
+        staged = manifest.plugin_versions(plugin_name)["staged"]
+
+        if action.action == "reinstall":
+            return installed_plugins[plugin_name].get("plugins") or list()
+        elif action.to_version in staged:
+            return staged[action.to_version].get("plugins") or list()
+
+        plugin_directory = action.source or os.path.join(offshoot.config["file_paths"]["plugins"], plugin_name)
+
+        if not os.path.isfile(os.path.join(plugin_directory, "plugin.py")):
+            return list()
+
+        return offshoot.versions.load_staged_plugin_class(plugin_name, plugin_directory).plugins or list()
+
+    def visit(plugin_name, ancestors):
+        if plugin_name in ordered_changes or plugin_name in ancestors:
+            return None
+
+        for dependency in dependencies_of(plugin_name):
+            if dependency in changes:
+                visit(dependency, ancestors | {plugin_name})
+
+        ordered_changes.append(plugin_name)
+
+    for plugin_name in sorted(changes):
+        visit(plugin_name, set())
+
+    return [changes[plugin_name] for plugin_name in ordered_changes]
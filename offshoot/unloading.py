@@ -0,0 +1,113 @@
+import gc
+import os
+import sys
+import inspect
+import weakref
+import collections
+
+import offshoot
+import offshoot.hooks
+import offshoot.pools
+import offshoot.caching
+import offshoot.metrics
+
+
+UnloadReport = collections.namedtuple("UnloadReport", ["modules", "classes", "leaks"])
+
+
+def unload(plugin_name, scopes=None):
+    plugin_package = "%s.%s" % (offshoot.config["file_paths"]["plugins"].replace(os.sep, "."), plugin_name)
+    module_names = sorted(name for name in list(sys.modules) if name == plugin_package or name.startswith(plugin_package + "."))
+
+    class_references = _release_plugin(plugin_name, module_names, scopes or list())
+
+    gc.collect()
+
+    leaks = dict()
+
+    for class_name, class_reference in class_references.items():
+        if class_reference() is not None:
+            leaks[class_name] = describe_referrers(class_reference())
+
+    return UnloadReport(module_names, sorted(class_references), leaks)
+
+
+def describe_referrers(obj):
+    descriptions = list()
+    module_dicts = {id(module.__dict__): name for name, module in list(sys.modules.items()) if hasattr(module, "__dict__")}
+
+    for referrer in gc.get_referrers(obj):
+        if inspect.isframe(referrer):
+            continue
+
+        if isinstance(referrer, dict) and id(referrer) in module_dicts:
+            names = [name for name, value in referrer.items() if value is obj]
+            descriptions.append("module %s (%s)" % (module_dicts[id(referrer)], ", ".join(names)))
+        elif isinstance(referrer, dict):
+            names = [str(name) for name, value in referrer.items() if value is obj]
+            descriptions.append("dict (%s)" % ", ".join(names) if len(names) else "dict")
+        elif inspect.isfunction(referrer) or inspect.ismethod(referrer):
+            descriptions.append("function %s" % referrer.__qualname__)
+        else:
+            descriptions.append(type(referrer).__name__)
+
+    return descriptions
+
+
+def _release_plugin(plugin_name, module_names, scopes):
+    # Kept in its own frame so that no local variable of unload() holds on to a plugin class
+    plugin_classes = _plugin_classes(plugin_name, module_names)
+
+    _drop_from_registry(plugin_classes)
+    _drop_from_scopes(plugin_classes, scopes)
+
+    offshoot.hooks.invalidate()
+    offshoot.caching.clear(plugin=plugin_name)
+
+    for plugin_class in plugin_classes:
+        offshoot.pools.drop(plugin_class)
+        offshoot.metrics.forget_class(plugin_class)
+
+    for module_name in module_names:
+        _drop_module(module_name)
+
+    return {"%s.%s" % (cls.__module__, cls.__qualname__): weakref.ref(cls) for cls in plugin_classes}
+
+
+def _plugin_classes(plugin_name, module_names):
+    plugin_classes = list()
+
+    for entry in offshoot.plugin_registry.snapshot().values():
+        for class_name, plugin_class in entry.classes.items():
+            if entry.metadata[class_name].get("plugin") == plugin_name and plugin_class not in plugin_classes:
+                plugin_classes.append(plugin_class)
+
+    for module_name in module_names:
+        for value in list(vars(sys.modules[module_name]).values()):
+            if inspect.isclass(value) and value.__module__ == module_name and value not in plugin_classes:
+                plugin_classes.append(value)
+
+    return plugin_classes
+
+
+def _drop_from_registry(plugin_classes):
+    for (pluggable, selection), entry in list(offshoot.plugin_registry.snapshot().items()):
+        if any(plugin_class in plugin_classes for plugin_class in entry.classes.values()):
+            offshoot.plugin_registry.invalidate(pluggable)
+
+
+def _drop_from_scopes(plugin_classes, scopes):
+    for scope in scopes:
+        for name, value in list(scope.items()):
+            if value in plugin_classes:
+                del scope[name]
+
+
+def _drop_module(module_name):
+    sys.modules.pop(module_name, None)
+
+    parent_name, _, attribute = module_name.rpartition(".")
+    parent = sys.modules.get(parent_name)
+
+    if parent is not None and hasattr(parent, attribute):
+        delattr(parent, attribute)
@@ -0,0 +1,167 @@
+import os
+import sys
+import shutil
+import importlib
+import importlib.util
+
+import offshoot
+
+from offshoot.plugin import PluginError
+from offshoot.manifest import Manifest, plugin_entry_for
+
+
+versions_directory_name = ".versions"
+
+
+def versions_directory_for(plugin_name):
+    return os.path.join(offshoot.config["file_paths"]["plugins"], versions_directory_name, plugin_name)
+
+
+def version_directory_for(plugin_name, version):
+    return os.path.join(versions_directory_for(plugin_name), version)
+
+
+def load_staged_plugin_class(plugin_name, plugin_directory):
+    module_name = "_offshoot_staged_%s" % plugin_name
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(plugin_directory, "plugin.py"))
+
+    plugin_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(plugin_module)
+
+    plugin_class = getattr(plugin_module, plugin_name, None)
+
+    if plugin_class is None:
+        raise PluginError("'%s' doesn't define a %s plugin class." % (plugin_directory, plugin_name))
+
+    return plugin_class
+
+
+def stage(plugin_name, source_directory):
+    with Manifest().lock():
+        plugin_class = load_staged_plugin_class(plugin_name, source_directory)
+        version_directory = version_directory_for(plugin_name, plugin_class.version)
+
+        if os.path.exists(version_directory):
+            raise PluginError("Version '%s' of %s is already staged." % (plugin_class.version, plugin_name))
+
+        adopt(plugin_name)
+
+        shutil.copytree(source_directory, version_directory, ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+
+        try:
+            pluggables = plugin_class._pluggable_table()
+            messages = plugin_class._pluggable_errors(pluggables)
+
+            for file_dict in plugin_class.files:
+                if "pluggable" in file_dict:
+                    is_valid, file_messages = plugin_class._validate_file_for_pluggable(os.path.join(version_directory, "files", file_dict["path"]), file_dict["pluggable"], pluggables=pluggables)
+
+                    if not is_valid:
+                        messages.extend("\n%s: %s" % (file_dict["path"], message) for message in file_messages)
+
+            if len(messages):
+                raise PluginError("Offshoot Plugin Version Staging Errors: %s" % "".join(messages))
+        except PluginError:
+            shutil.rmtree(version_directory)
+            raise
+
+        if offshoot.config.get("content_store") is True:
+            file_hashes = offshoot.store.store_directory(os.path.join(version_directory, "files"))
+        else:
+            file_hashes = offshoot.store.directory_file_hashes(os.path.join(version_directory, "files"))
+
+        if offshoot.compiling.bytecode_config()["precompile"] is True:
+            offshoot.compiling.compile_directories([version_directory])
+
+        Manifest().add_plugin_version(plugin_name, plugin_class.version, plugin_entry_for(plugin_class, file_hashes))
+
+        return plugin_class.version
+
+
+def adopt(plugin_name):
+    plugin_directory = os.path.join(offshoot.config["file_paths"]["plugins"], plugin_name)
+
+    if os.path.islink(plugin_directory) or not os.path.isdir(plugin_directory):
+        return None
+
+    manifest = Manifest()
+    plugin_class = load_staged_plugin_class(plugin_name, plugin_directory)
+
+    os.makedirs(versions_directory_for(plugin_name), exist_ok=True)
+
+    # The only moment the plugin is missing from disk: the directory is moved under .versions and a link takes its place
+    os.rename(plugin_directory, version_directory_for(plugin_name, plugin_class.version))
+    os.symlink(os.path.join(versions_directory_name, plugin_name, plugin_class.version), plugin_directory)
+
+    manifest.add_plugin_version(plugin_name, plugin_class.version, plugin_entry_for(plugin_class, offshoot.store.plugin_file_hashes(plugin_name)))
+
+    return plugin_class.version
+
+
+def activate(plugin_name, version):
+    with Manifest().lock():
+        manifest = Manifest()
+        staged_versions = manifest.plugin_versions(plugin_name)["staged"]
+
+        if version not in staged_versions or not os.path.isdir(version_directory_for(plugin_name, version)):
+            raise PluginError("Version '%s' of %s is not staged." % (version, plugin_name))
+
+        plugin_directory = os.path.join(offshoot.config["file_paths"]["plugins"], plugin_name)
+
+        if os.path.isdir(plugin_directory) and not os.path.islink(plugin_directory):
+            raise PluginError("%s is a plain directory. Stage a version with 'offshoot stage' first." % plugin_directory)
+
+        plugin_class = load_staged_plugin_class(plugin_name, version_directory_for(plugin_name, version))
+        unchanged_phases = offshoot.manifest.unchanged_phases(manifest.list_plugins().get(plugin_name), staged_versions[version])
+
+        # Checked before anything changes: a version depending on a plugin that isn't installed is never switched to
+        if offshoot.config["allow"]["plugins"] is True:
+            plugin_class.verify_plugin_dependencies()
+
+        # Configuration keys and libraries are in place before any process can discover the version
+        if offshoot.config["allow"]["config"] is True and not plugin_class._skip_phase("config", unchanged_phases):
+            plugin_class.install_configuration()
+        if offshoot.config["allow"]["libraries"] is True and not plugin_class._skip_phase("libraries", unchanged_phases):
+            plugin_class.install_libraries()
+
+        temporary_link_path = "%s.%d.tmp" % (plugin_directory, os.getpid())
+
+        os.symlink(os.path.join(versions_directory_name, plugin_name, version), temporary_link_path)
+        os.replace(temporary_link_path, plugin_directory)
+
+        # Staging validated, stored and compiled the files: only their callbacks are left to run
+        if offshoot.config["allow"]["files"] is True and not plugin_class._skip_phase("files", unchanged_phases):
+            pluggables = plugin_class._pluggable_table()
+
+            for file_dict in plugin_class.files:
+                if "pluggable" in file_dict:
+                    plugin_class._pluggable_callback(file_dict["pluggable"], "on_file_install", pluggables=pluggables)(**file_dict)
+
+        if offshoot.config["allow"]["callbacks"] is True and "manifest" not in unchanged_phases:
+            plugin_class.on_install()
+
+        installed_phases = [phase for phase in ["files", "config", "libraries"] if offshoot.config["allow"][phase] is True or phase in unchanged_phases]
+
+        return manifest.activate_plugin_version(plugin_name, version, installed_phases=installed_phases)
+
+
+def rollback(plugin_name):
+    with Manifest().lock():
+        previous_version = Manifest().plugin_versions(plugin_name)["previous"]
+
+        if previous_version is None:
+            raise PluginError("%s has no previous version to roll back to." % plugin_name)
+
+        activate(plugin_name, previous_version)
+
+        return previous_version
+
+
+def reload_plugin_modules(plugin_name):
+    plugin_package = "%s.%s" % (offshoot.config["file_paths"]["plugins"].replace(os.sep, "."), plugin_name)
+
+    for module_name in [name for name in list(sys.modules) if name == plugin_package or name.startswith(plugin_package + ".")]:
+        offshoot.unloading._drop_module(module_name)
+
+    # Directory listings cached by the path finders may still describe the previous version
+    importlib.invalidate_caches()
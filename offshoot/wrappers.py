@@ -0,0 +1,88 @@
+import functools
+
+
+# Bumped on every wrap and unwrap so that anything holding on to resolved methods knows to resolve them again
+generation = 0
+
+
+# Plugin class methods get wrapped in place by features like metrics. Each wrapper layer remembers
+# what it wrapped and how it was built so any layer can be peeled off without disturbing the others.
+
+class WrapperLayer:
+
+    def __init__(self, tag, inner, factory):
+        self.tag = tag
+        self.inner = inner
+        self.factory = factory
+
+
+def wrap_method(cls, name, tag, factory):
+    global generation
+
+    attribute = cls.__dict__.get(name)
+
+    if attribute is None or isinstance(attribute, property):
+        return False
+
+    if tag in wrapper_tags(attribute):
+        return False
+
+    setattr(cls, name, _apply_layer(attribute, tag, factory))
+    generation += 1
+
+    return True
+
+
+def unwrap_method(cls, name, tag):
+    global generation
+
+    attribute = cls.__dict__.get(name)
+
+    if attribute is None or tag not in wrapper_tags(attribute):
+        return False
+
+    outer_layers = list()
+
+    while _layer(attribute).tag != tag:
+        outer_layers.append(_layer(attribute))
+        attribute = _layer(attribute).inner
+
+    attribute = _layer(attribute).inner
+
+    for layer in reversed(outer_layers):
+        attribute = _apply_layer(attribute, layer.tag, layer.factory)
+
+    setattr(cls, name, attribute)
+    generation += 1
+
+    return True
+
+
+def wrapper_tags(attribute):
+    tags = list()
+
+    while _layer(attribute) is not None:
+        tags.append(_layer(attribute).tag)
+        attribute = _layer(attribute).inner
+
+    return tags
+
+
+def _apply_layer(attribute, tag, factory):
+    if isinstance(attribute, (staticmethod, classmethod)):
+        wrapped = functools.wraps(attribute.__func__)(factory(attribute.__func__))
+        wrapped.__offshoot_layer__ = WrapperLayer(tag, attribute, factory)
+
+        return type(attribute)(wrapped)
+
+    wrapped = functools.wraps(attribute)(factory(attribute))
+    wrapped.__offshoot_layer__ = WrapperLayer(tag, attribute, factory)
+
+    return wrapped
+
+
+def _layer(attribute):
+    if isinstance(attribute, (staticmethod, classmethod)):
+        attribute = attribute.__func__
+
+    return getattr(attribute, "__offshoot_layer__", None)
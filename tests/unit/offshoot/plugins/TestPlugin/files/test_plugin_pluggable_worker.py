@@ -0,0 +1,9 @@
+import os
+import resource
+
+import pluggable
+
+
+class TestPluginPluggableWorker(pluggable.TestPluggable):
+    def expected_function(self):
+        return os.getpid(), resource.getrlimit(resource.RLIMIT_NOFILE)
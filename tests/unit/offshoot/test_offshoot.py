@@ -17,6 +17,18 @@ import os
 import os.path
 import inspect
 import json
+import collections
+import resource
+import sys
+import threading
+import time
+import signal
+import tempfile
+import zipfile
+import concurrent.futures
+import asyncio
+import ast
+import importlib.util
 
 
 # Tests
@@ -124,6 +136,82 @@ def test_base_should_be_able_to_extract_pluggable_classes_according_to_the_confi
     assert inspect.isclass(pluggable_classes["TestPluggable"])
 
 
+def test_base_should_be_able_to_extract_pluggable_directives_statically_according_to_the_configuration():
+    config = offshoot.default_configuration()
+
+    assert isinstance(offshoot.map_pluggable_directives(config), dict)
+    assert len(offshoot.map_pluggable_directives(config)) == 0
+
+    config["modules"].append("pluggable")
+
+    pluggable_directives = offshoot.map_pluggable_directives(config)
+
+    assert "TestPluggable" in pluggable_directives
+    assert "TestPluggableInvalid" not in pluggable_directives
+
+    assert pluggable_directives["TestPluggable"]["module"] == "pluggable"
+    assert pluggable_directives["TestPluggable"]["directives"] == TestPluggable.method_directives()
+    assert pluggable_directives["TestPluggable"]["callbacks"] == []
+    assert pluggable_directives["TestPluggable"]["errors"] == []
+
+
+def test_base_should_not_import_the_configured_modules_when_extracting_pluggable_directives_statically(tmpdir, monkeypatch):
+    tmpdir.join("heavy_pluggable.py").write(
+        "import offshoot\n\n"
+        "raise RuntimeError('Should not be imported!')\n\n\n"
+        "class HeavyPluggable(offshoot.Pluggable):\n\n"
+        "    @offshoot.expected\n"
+        "    def expected_function(self):\n"
+        "        raise NotImplementedError()\n\n"
+        "    @classmethod\n"
+        "    def on_file_install(cls, **kwargs):\n"
+        "        pass\n\n\n"
+        "class HeavierPluggable(HeavyPluggable):\n"
+        "    pass\n"
+    )
+
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    config = offshoot.default_configuration()
+    config["modules"].append("heavy_pluggable")
+
+    pluggable_directives = offshoot.map_pluggable_directives(config)
+
+    assert "heavy_pluggable" not in sys.modules
+
+    assert pluggable_directives["HeavyPluggable"]["directives"]["expected"] == ["expected_function"]
+    assert pluggable_directives["HeavyPluggable"]["callbacks"] == ["on_file_install"]
+
+    assert "HeavierPluggable" in pluggable_directives
+    assert pluggable_directives["HeavierPluggable"]["callbacks"] == ["on_file_install"]
+
+
+def test_base_should_inherit_pluggable_callbacks_from_every_pluggable_ancestor_when_extracting_directives_statically(tmpdir, monkeypatch):
+    tmpdir.join("deep_pluggable.py").write(
+        "import offshoot\n\n\n"
+        "class GrandparentPluggable(offshoot.Pluggable):\n\n"
+        "    @classmethod\n"
+        "    def on_file_uninstall(cls, **kwargs):\n"
+        "        pass\n\n\n"
+        "class ParentPluggable(GrandparentPluggable):\n"
+        "    pass\n\n\n"
+        "class ChildPluggable(ParentPluggable):\n\n"
+        "    @classmethod\n"
+        "    def on_file_install(cls, **kwargs):\n"
+        "        pass\n"
+    )
+
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    config = offshoot.default_configuration()
+    config["modules"].append("deep_pluggable")
+
+    pluggable_directives = offshoot.map_pluggable_directives(config)
+
+    assert pluggable_directives["ParentPluggable"]["callbacks"] == ["on_file_uninstall"]
+    assert pluggable_directives["ChildPluggable"]["callbacks"] == ["on_file_install", "on_file_uninstall"]
+
+
 def test_base_should_be_able_to_validate_a_plugin_file_according_to_its_pluggable():
     config = offshoot.default_configuration()
     config["modules"].append("pluggable")
@@ -163,152 +251,2002 @@ def test_base_should_be_able_to_validate_a_plugin_file_according_to_its_pluggabl
         pluggable_classes["TestPluggable"].method_directives()
     )
 
-    assert validation_result[0] is False
+    assert validation_result[0] is False
+
+    expected_messages = {
+        "expected methods are missing",
+        "method should not appear in the class"
+    }
+
+    for validation_message in validation_result[1]:
+        for expected_message in list(expected_messages):
+            if expected_message in validation_message:
+                expected_messages.remove(expected_message)
+
+    assert len(expected_messages) == 0
+
+
+def test_base_should_be_able_to_return_a_list_of_installed_plugins():
+    offshoot.config["allow"]["files"] = False
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.uninstall()
+
+    assert len(offshoot.installed_plugins()) == 0
+
+    TestPlugin.install()
+
+    assert len(offshoot.installed_plugins()) == 1
+    assert "TestPlugin - 0.1.0" in offshoot.installed_plugins()
+
+    TestPlugin.uninstall()
+
+    assert len(offshoot.installed_plugins()) == 0
+
+    offshoot.config["allow"]["files"] = True
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_base_should_be_able_to_discover_installed_plugins_for_a_specified_pluggable():
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    offshoot.config["modules"].append("pluggable")
+
+    TestPlugin.install()
+
+    class_mapping = offshoot.discover("TestPluggable", globals())
+
+    assert isinstance(class_mapping, dict)
+    assert len(class_mapping) == 0
+
+    assert inspect.isclass(TestPluginPluggableExpected)
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_base_should_be_able_to_discover_installed_plugins_for_a_specified_pluggable_with_no_scope_passed_along():
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    offshoot.config["modules"].append("pluggable")
+
+    TestPlugin.install()
+
+    class_mapping = offshoot.discover("TestPluggable")
+
+    assert isinstance(class_mapping, dict)
+
+    assert len(class_mapping) == 1
+    assert "TestPluginPluggableExpected" in class_mapping
+    assert inspect.isclass(class_mapping["TestPluginPluggableExpected"])
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_base_should_be_able_to_discover_installed_plugins_for_a_specified_pluggable_with_selection_passed_along():
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    offshoot.config["modules"].append("pluggable")
+
+    TestPlugin.install()
+
+    class_mapping = offshoot.discover("TestPluggable", selection="123")
+
+    assert isinstance(class_mapping, dict)
+    assert len(class_mapping) == 0
+
+    class_mapping = offshoot.discover("TestPluggable", selection=["123"])
+
+    assert isinstance(class_mapping, dict)
+    assert len(class_mapping) == 0
+
+    class_mapping = offshoot.discover("TestPluggable", selection=["TestPluginPluggableExpected"])
+
+    assert isinstance(class_mapping, dict)
+    assert len(class_mapping) == 1
+    assert "TestPluginPluggableExpected" in class_mapping
+    assert inspect.isclass(class_mapping["TestPluginPluggableExpected"])
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_base_should_return_the_cached_class_mapping_on_repeated_discovery_until_something_changes(mocker):
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+
+    mocker.spy(offshoot.plugin_registry, "_build")
+
+    class_mapping = offshoot.discover("TestPluggable")
+    assert offshoot.plugin_registry._build.call_count == 1
+
+    assert offshoot.discover("TestPluggable") == class_mapping
+    assert offshoot.plugin_registry._build.call_count == 1
+
+    scope = dict()
+    offshoot.discover("TestPluggable", scope)
+
+    assert scope["TestPluginPluggableExpected"] is class_mapping["TestPluginPluggableExpected"]
+    assert offshoot.plugin_registry._build.call_count == 1
+
+    offshoot.discover("TestPluggable", fresh=True)
+    assert offshoot.plugin_registry._build.call_count == 2
+
+    offshoot.invalidate_discovery("TestPluggable")
+
+    offshoot.discover("TestPluggable")
+    assert offshoot.plugin_registry._build.call_count == 3
+
+    TestPlugin.uninstall()
+
+    assert offshoot.discover("TestPluggable") == dict()
+    assert offshoot.plugin_registry._build.call_count == 4
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_base_should_detect_plugin_file_changes_between_discoveries(mocker):
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+
+    mocker.spy(offshoot.plugin_registry, "_build")
+
+    offshoot.discover("TestPluggable")
+    offshoot.discover("TestPluggable")
+
+    assert offshoot.plugin_registry._build.call_count == 1
+
+    plugin_file_path = "plugins/TestPlugin/files/test_plugin_pluggable_expected.py"
+    plugin_file_stat = os.stat(plugin_file_path)
+
+    os.utime(plugin_file_path, ns=(plugin_file_stat.st_atime_ns, plugin_file_stat.st_mtime_ns + 1000000000))
+
+    # Plugin files are stat'ed at most once per check interval
+    offshoot.config["discovery_check_interval"] = 3600
+
+    offshoot.discover("TestPluggable")
+
+    assert offshoot.plugin_registry._build.call_count == 1
+
+    offshoot.config["discovery_check_interval"] = 0
+
+    offshoot.discover("TestPluggable")
+
+    assert offshoot.plugin_registry._build.call_count == 2
+
+    offshoot.config["discovery_check_interval"] = offshoot.registry.default_check_interval
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_base_should_import_a_plugin_module_again_once_its_file_changed():
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+    offshoot.config["discovery_check_interval"] = 0
+
+    TestPlugin.install()
+
+    plugin_class = offshoot.discover("TestPluggable")["TestPluginPluggableExpected"]
+
+    plugin_file_path = "plugins/TestPlugin/files/test_plugin_pluggable_expected.py"
+
+    with open(plugin_file_path, "r") as f:
+        plugin_file_contents = f.read()
+
+    with open(plugin_file_path, "a") as f:
+        f.write("\nRELOADED = True\n")
+
+    reloaded_class = offshoot.discover("TestPluggable")["TestPluginPluggableExpected"]
+
+    assert reloaded_class is not plugin_class
+    assert sys.modules[reloaded_class.__module__].RELOADED is True
+
+    with open(plugin_file_path, "w") as f:
+        f.write(plugin_file_contents)
+
+    TestPlugin.uninstall()
+
+    offshoot.config["discovery_check_interval"] = offshoot.registry.default_check_interval
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_base_should_be_able_to_determine_if_a_file_implements_a_specified_pluggable():
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    offshoot.config["modules"].append("pluggable")
+
+    TestPlugin.install()
+
+    manifest = offshoot.Manifest()
+    files = manifest.plugin_files_for_pluggable("TestPluggable")
+
+    valid, plugin_class = offshoot.file_contains_pluggable(files[0][0], "TestPluggable")
+
+    assert valid is True
+    assert plugin_class == "TestPluginPluggableExpected"
+
+    valid, plugin_class = offshoot.file_contains_pluggable("INVALID.txt", "TestPluggable")
+
+    assert valid is False
+    assert plugin_class is None
+
+    valid, plugin_class = offshoot.file_contains_pluggable(files[0][0], "InvalidPluggable")
+
+    assert valid is False
+    assert plugin_class is None
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_scanner_should_find_top_level_class_headers_and_method_names_without_parsing():
+    source = (
+        "import offshoot\n"
+        "\n"
+        "HELP = \"\"\"\n"
+        "class FakeShape(Shape):\n"
+        "    def area(self):\n"
+        "\"\"\"\n"
+        "\n"
+        "\n"
+        "class RealShape(offshoot.Shape, metaclass=ShapeMeta):\n"
+        "    \"\"\"Docstring\n"
+        "class DocstringShape(Shape):\n"
+        "\"\"\"\n"
+        "    TABLE = [\n"
+        "        (1, 2)\n"
+        "    ]\n"
+        "\n"
+        "    @property\n"
+        "    def area(self):\n"
+        "        def helper():\n"
+        "            pass\n"
+        "\n"
+        "    def draw(self):  # '''\n"
+        "        pass\n"
+        "\n"
+        "\n"
+        "def function():\n"
+        "    pass\n"
+        "\n"
+        "\n"
+        "class OtherShape(\n"
+        "    Shape\n"
+        "):\n"
+        "    pass\n"
+    )
+
+    expected_headers = [("RealShape", ["Shape"], ["area", "draw"]), ("OtherShape", ["Shape"], [])]
+
+    assert offshoot.scanner.scan_class_headers(source) == expected_headers
+    assert offshoot.scanner.ast_class_headers(source) == expected_headers
+
+
+def test_scanner_should_report_ambiguous_sources_so_the_ast_can_be_used_instead():
+    nested_class_source = "class Shape(Base):\n    class Meta:\n        pass\n"
+    complex_base_source = "class Shape(base_for('Shape')):\n    pass\n"
+    nested_function_source = "class Shape(Base):\n    pass\n\n\ndef function():\n    def inner():\n        pass\n"
+    continued_string_source = "text = 'a \\\n\"\"\" b'\n\n\nclass Shape(Base):\n    def area(self):\n        pass\n\n\nclass Other(Base):\n    \"\"\"Docs.\"\"\"\n"
+
+    for source in [nested_class_source, complex_base_source, nested_function_source, continued_string_source]:
+        assert offshoot.scanner.scan_class_headers(source) is None
+
+    assert offshoot.scanner.class_headers(nested_class_source) == [("Shape", ["Base"], []), ("Meta", [], [])]
+    assert offshoot.scanner.class_headers(continued_string_source) == [("Shape", ["Base"], ["area"]), ("Other", ["Base"], [])]
+
+
+def test_base_should_only_parse_plugin_files_with_the_ast_if_the_scanner_result_is_ambiguous(mocker):
+    mocker.spy(offshoot.scanner, "ast_class_headers")
+
+    valid, plugin_class = offshoot.file_contains_pluggable("tests/unit/offshoot/plugins/TestPlugin/files/test_plugin_pluggable_expected.py", "TestPluggable")
+
+    assert valid is True
+    assert plugin_class == "TestPluginPluggableExpected"
+
+    assert offshoot.scanner.ast_class_headers.call_count == 0
+
+
+def test_registry_should_build_an_entry_once_when_discovered_concurrently(mocker):
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+
+    registry = offshoot.PluginRegistry()
+    mocker.spy(registry, "_build")
+
+    results = list()
+    barrier = threading.Barrier(16)
+
+    def discover():
+        barrier.wait()
+        results.append(registry.discover("TestPluggable"))
+
+    threads = [threading.Thread(target=discover) for i in range(16)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert registry._build.call_count == 1
+    assert len(results) == 16
+    assert all(result is results[0] for result in results)
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_registry_should_invalidate_while_other_threads_build_and_check_entries(mocker):
+    registry = offshoot.PluginRegistry()
+    mocker.patch.object(registry, "_build", side_effect=lambda pluggable, selection: offshoot.registry.RegistryEntry([registry.manifest_signature()], dict(), dict(), list()))
+
+    # Every check records its time and threads switch as often as possible
+    offshoot.config["discovery_check_interval"] = 0
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+    errors = list()
+    barrier = threading.Barrier(8)
+
+    def discover(thread_index):
+        barrier.wait()
+
+        try:
+            for i in range(1000):
+                registry.entry("TestPluggable%d-%d" % (thread_index, i))
+                registry.entry("TestPluggable%d-%d" % (thread_index, i // 2))
+        except Exception as e:
+            errors.append(e)
+
+    def invalidate():
+        barrier.wait()
+
+        try:
+            for i in range(1000):
+                registry.invalidate("TestPluggable")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=discover, args=(i,)) for i in range(6)] + [threading.Thread(target=invalidate) for i in range(2)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    sys.setswitchinterval(switch_interval)
+    offshoot.config["discovery_check_interval"] = offshoot.registry.default_check_interval
+
+    assert errors == []
+
+
+def test_registry_should_publish_new_snapshots_without_mutating_the_previous_ones():
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+
+    registry = offshoot.PluginRegistry()
+
+    assert registry.lookup("TestPluggable") == dict()
+    assert registry.lookup("TestPluggable", "TestPluginPluggableExpected") is None
+
+    snapshot = registry.snapshot()
+    generation = registry.generation
+
+    registry.discover("TestPluggable")
+
+    assert len(snapshot) == 0
+    assert registry.generation == generation + 1
+
+    assert inspect.isclass(registry.lookup("TestPluggable", "TestPluginPluggableExpected"))
+    assert registry.metadata("TestPluggable", "TestPluginPluggableExpected")["plugin"] == "TestPlugin"
+    assert registry.metadata("TestPluggable", "TestPluginPluggableExpected")["version"] == "0.1.0"
+
+    registry.invalidate("TestPluggable")
+
+    assert registry.lookup("TestPluggable") == dict()
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_metrics_should_count_every_call_made_from_concurrent_threads():
+    metric = offshoot.metrics.MethodMetrics("TestPlugin", "TestPluggable", "TestPluginPluggableExpected.expected_function")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        calls = list(executor.map(lambda i: metric.count(), range(8000)))
+
+    assert metric.calls == 8000
+    assert sorted(calls) == list(range(1, 8001))
+    assert metric.snapshot()["calls"] == 8000
+
+
+def test_metrics_should_record_sampled_call_counts_and_latencies_per_plugin_when_enabled():
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+
+    plugin_class = offshoot.discover("TestPluggable")["TestPluginPluggableExpected"]
+    original_method = plugin_class.__dict__["expected_function"]
+
+    offshoot.metrics.enable(sample_rate=0.5)
+
+    assert plugin_class.__dict__["expected_function"] is not original_method
+
+    for i in range(4):
+        with pytest.raises(NotImplementedError):
+            plugin_class().expected_function()
+
+    metrics = offshoot.metrics.snapshot()
+    method_metrics = metrics["TestPlugin"]["TestPluginPluggableExpected.expected_function"]
+
+    assert method_metrics["pluggable"] == "TestPluggable"
+    assert method_metrics["calls"] == 4
+    assert method_metrics["sampled"] == 2
+    assert sum(count for bound, count in method_metrics["histogram"]) == 2
+
+    offshoot.metrics.disable()
+
+    assert plugin_class.__dict__["expected_function"] is original_method
+
+    with pytest.raises(NotImplementedError):
+        plugin_class().expected_function()
+
+    assert offshoot.metrics.snapshot()["TestPlugin"]["TestPluginPluggableExpected.expected_function"]["calls"] == 4
+
+    offshoot.metrics.reset()
+
+    assert offshoot.metrics.snapshot() == dict()
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_wrappers_should_be_able_to_peel_off_any_wrapper_layer():
+    class Wrapped:
+        @staticmethod
+        def method(value):
+            return [value]
+
+    original_method = Wrapped.__dict__["method"]
+
+    offshoot.wrappers.wrap_method(Wrapped, "method", "inner", lambda func: lambda *args: func(*args) + ["inner"])
+    offshoot.wrappers.wrap_method(Wrapped, "method", "outer", lambda func: lambda *args: func(*args) + ["outer"])
+
+    assert Wrapped.method(0) == [0, "inner", "outer"]
+    assert offshoot.wrappers.wrapper_tags(Wrapped.__dict__["method"]) == ["outer", "inner"]
+
+    assert offshoot.wrappers.unwrap_method(Wrapped, "method", "inner") is True
+    assert offshoot.wrappers.unwrap_method(Wrapped, "method", "inner") is False
+
+    assert Wrapped.method(0) == [0, "outer"]
+
+    offshoot.wrappers.unwrap_method(Wrapped, "method", "outer")
+
+    assert Wrapped.__dict__["method"] is original_method
+
+
+def test_budgets_should_enforce_pluggable_method_timeouts_with_fallbacks_and_a_circuit_breaker():
+    invocations = list()
+    release = threading.Event()
+
+    class SlowTestPlugin(TestPluggable):
+        def expected_function(self, block):
+            invocations.append(block)
+
+            if block:
+                release.wait(5)
+
+            return "result"
+
+    offshoot.config["budgets"] = {
+        "TestPluggable": {
+            "expected_function": {"timeout": 0.2, "fallback": "fallback", "failure_threshold": 2, "cooldown": 60}
+        }
+    }
+
+    offshoot.budgets.enforce_class(SlowTestPlugin, "TestPluggable", {"plugin": "SlowTestPlugin"})
+
+    plugin = SlowTestPlugin()
+
+    assert plugin.expected_function(False) == "result"
+    assert plugin.expected_function(True) == "fallback"
+    assert plugin.expected_function(True) == "fallback"
+
+    budget = offshoot.budgets.snapshot()["SlowTestPlugin"]["SlowTestPlugin.expected_function"]
+
+    assert budget["timeouts"] == 2
+    assert budget["open"] is True
+
+    # An open circuit answers with the fallback without running the method at all
+    assert plugin.expected_function(True) == "fallback"
+    assert len(invocations) == 3
+
+    release.set()
+
+    budget = offshoot.budgets.snapshot()["SlowTestPlugin"]["SlowTestPlugin.expected_function"]
+
+    assert budget["calls"] == 4
+    assert budget["short_circuits"] == 1
+    assert budget["fallbacks"] == 3
+
+    del offshoot.config["budgets"]
+
+
+def test_budgets_should_raise_a_timeout_error_if_no_fallback_is_declared():
+    class BudgetedTestPluggable(TestPluggable):
+        budgets = {"expected_function": {"timeout": 0.05}}
+
+    class SlowTestPlugin(BudgetedTestPluggable):
+        def expected_function(self, duration):
+            time.sleep(duration)
+            return "result"
+
+    offshoot.budgets.enforce_class(SlowTestPlugin, "BudgetedTestPluggable", {"plugin": "SlowTestPlugin2"})
+
+    assert offshoot.budgets.budgets_for(BudgetedTestPluggable, "BudgetedTestPluggable") == {"expected_function": {"timeout": 0.05}}
+    assert offshoot.budgets.budgets_for(TestPluggable, "TestPluggable") == dict()
+
+    with pytest.raises(offshoot.PluginTimeoutError):
+        SlowTestPlugin().expected_function(0.2)
+
+
+def test_budgets_should_reject_calls_to_a_saturated_plugin_and_admit_a_single_probe_when_half_open(monkeypatch):
+    hanging = threading.Event()
+
+    class HangingTestPlugin(TestPluggable):
+        def expected_function(self, hang):
+            if hang:
+                hanging.wait()
+
+            return "result"
+
+    probing = threading.Event()
+    probed = threading.Event()
+
+    class ProbedTestPlugin(TestPluggable):
+        def expected_function(self, hang):
+            if hang:
+                probing.set()
+                probed.wait()
+
+            return "result"
+
+    monkeypatch.setattr(offshoot.budgets, "max_workers_per_plugin", 2)
+
+    offshoot.config["budgets"] = {"TestPluggable": {"expected_function": {"timeout": 0.01, "fallback": "fallback", "failure_threshold": 100}}}
+    offshoot.budgets.enforce_class(HangingTestPlugin, "TestPluggable", {"plugin": "HangingTestPlugin"})
+
+    offshoot.config["budgets"] = {"TestPluggable": {"expected_function": {"timeout": 60, "fallback": "fallback", "failure_threshold": 1, "cooldown": 0}}}
+    offshoot.budgets.enforce_class(ProbedTestPlugin, "TestPluggable", {"plugin": "ProbedTestPlugin"})
+
+    plugin = HangingTestPlugin()
+
+    assert plugin.expected_function(True) == "fallback"
+    assert plugin.expected_function(True) == "fallback"
+
+    # Both threads of the plugin are stuck: the next call is rejected instead of queueing behind them
+    assert plugin.expected_function(False) == "fallback"
+
+    # Other plugins run on their own threads
+    assert ProbedTestPlugin().expected_function(False) == "result"
+
+    budget = offshoot.budgets.snapshot()["HangingTestPlugin"]["HangingTestPlugin.expected_function"]
+
+    assert budget["timeouts"] == 2
+    assert budget["rejections"] == 1
+
+    hanging.set()
+
+    executor, slots = offshoot.budgets._executor_for("HangingTestPlugin")
+
+    for i in range(2):
+        assert slots.acquire(timeout=10)
+
+    for i in range(2):
+        slots.release()
+
+    assert plugin.expected_function(False) == "result"
+
+    state = offshoot.budgets._budget_states[("ProbedTestPlugin", "ProbedTestPlugin.expected_function")]
+    state.timed_out()
+
+    assert state.is_open is True
+
+    plugin = ProbedTestPlugin()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        probe = executor.submit(plugin.expected_function, True)
+
+        assert probing.wait(timeout=10)
+
+        # The cooldown is over but a probe is already in flight
+        assert plugin.expected_function(False) == "fallback"
+
+        probed.set()
+
+        assert probe.result() == "result"
+
+    assert state.is_open is False
+    assert plugin.expected_function(False) == "result"
+
+    budget = offshoot.budgets.snapshot()["ProbedTestPlugin"]["ProbedTestPlugin.expected_function"]
+
+    assert budget["short_circuits"] == 1
+
+    offshoot.budgets.reset()
+
+    budget = offshoot.budgets.snapshot()["ProbedTestPlugin"]["ProbedTestPlugin.expected_function"]
+
+    assert budget["calls"] == 0
+    assert budget["short_circuits"] == 0
+    assert budget["open"] is False
+
+    del offshoot.config["budgets"]
+
+
+def test_processes_should_dispatch_expected_methods_to_warm_worker_processes():
+    from plugins.TestPlugin.files.test_plugin_pluggable_worker import TestPluginPluggableWorker
+
+    soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    limit = min(soft_limit, 256)
+
+    with offshoot.PluginProcessProxy(TestPluginPluggableWorker, pool_size=2, limits={"RLIMIT_NOFILE": [limit, hard_limit]}) as proxy:
+        assert proxy.pluggable == "TestPluggable"
+        assert proxy.methods == ["expected_function"]
+
+        proxy.warm()
+
+        pid, limits = proxy.expected_function()
+
+        assert pid != os.getpid()
+        assert limits == (limit, hard_limit)
+
+        pids = {proxy.submit("expected_function").result()[0] for i in range(20)}
+
+        assert len(pids) <= 2
+
+        with pytest.raises(AttributeError):
+            proxy.submit("forbidden_function")
+
+
+def test_fanout_should_invoke_a_method_across_all_discovered_plugins_and_capture_errors():
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+
+    results = offshoot.map("TestPluggable", "expected_function")
+
+    assert len(results) == 1
+    assert results[0].name == "TestPluginPluggableExpected"
+    assert results[0].value is None
+    assert isinstance(results[0].error, NotImplementedError)
+
+    results = offshoot.map("TestPluggable", "allowed_decorators")
+
+    assert results[0].value == ["accepted", "batched", "expected", "forbidden"]
+    assert results[0].error is None
+
+    assert offshoot.map("InvalidPluggable", "expected_function") == list()
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_fanout_should_return_results_in_completion_or_declared_order(monkeypatch):
+    release = threading.Event()
+    running = threading.Barrier(2, timeout=5)
+
+    class SlowTestPlugin(TestPluggable):
+        def expected_function(self, wait):
+            if wait == "barrier":
+                running.wait()
+            else:
+                release.wait(5)
+
+            return "slow"
+
+    class FastTestPlugin(TestPluggable):
+        def expected_function(self, wait):
+            if wait == "release":
+                release.set()
+            elif wait == "barrier":
+                running.wait()
+
+            return "fast"
+
+    plugin_classes = collections.OrderedDict([("SlowTestPlugin", SlowTestPlugin), ("FastTestPlugin", FastTestPlugin)])
+    monkeypatch.setattr(offshoot, "discover", lambda pluggable, selection=None: plugin_classes)
+
+    results = offshoot.imap("TestPluggable", "expected_function", "consumer")
+
+    # The slow plugin cannot finish before the first result is consumed
+    assert next(results).name == "FastTestPlugin"
+
+    release.set()
+
+    assert next(results).name == "SlowTestPlugin"
+
+    release.clear()
+
+    results = offshoot.map("TestPluggable", "expected_function", "release", ordered=True)
+
+    assert [result.value for result in results] == ["slow", "fast"]
+
+    # Both plugins have to run at the same time to get past the barrier
+    results = offshoot.map("TestPluggable", "expected_function", method_kwargs={"wait": "barrier"}, ordered=True)
+
+    assert [result.value for result in results] == ["slow", "fast"]
+    assert [result.error for result in results] == [None, None]
+
+
+def test_base_should_validate_coroutine_methods_like_regular_methods(tmpdir):
+    config = offshoot.default_configuration()
+    config["modules"].append("pluggable")
+
+    directives = offshoot.map_pluggable_classes(config)["TestPluggable"].method_directives()
+
+    plugin_file = tmpdir.join("async_plugin.py")
+    plugin_file.write("class AsyncTestPlugin(TestPluggable):\n    async def expected_function(self):\n        pass\n")
+
+    assert offshoot.validate_plugin_file(str(plugin_file), "TestPluggable", directives) == [True, []]
+
+    plugin_file.write(
+        "class AsyncTestPlugin(TestPluggable):\n"
+        "    async def expected_function(self):\n"
+        "        pass\n"
+        "\n"
+        "    async def forbidden_function(self):\n"
+        "        pass\n"
+    )
+
+    validation_result = offshoot.validate_plugin_file(str(plugin_file), "TestPluggable", directives)
+
+    assert validation_result[0] is False
+    assert "method should not appear in the class" in validation_result[1][0]
+
+    syntax_tree = ast.parse(
+        "class AsyncPluggable(offshoot.Pluggable):\n"
+        "    @offshoot.expected\n"
+        "    async def expected_function(self):\n"
+        "        pass\n"
+    )
+
+    assert offshoot.pluggable.directives_for_decorators(offshoot.pluggable.find_decorators(syntax_tree))["expected"] == ["expected_function"]
+
+
+def test_fanout_should_gather_coroutine_methods_concurrently_with_a_per_plugin_timeout(monkeypatch):
+    events = list()
+
+    class AsyncTestPlugin(TestPluggable):
+        async def expected_function(self, hanging):
+            # Only returns once the hanging plugin runs alongside it
+            await hanging.wait()
+            return "async"
+
+    class SyncTestPlugin(TestPluggable):
+        def expected_function(self, hanging):
+            return "sync"
+
+    class HangingTestPlugin(TestPluggable):
+        async def expected_function(self, hanging):
+            hanging.set()
+
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                events.append("cancelled")
+                raise
+
+    plugin_classes = collections.OrderedDict([
+        ("AsyncTestPlugin", AsyncTestPlugin),
+        ("SyncTestPlugin", SyncTestPlugin),
+        ("HangingTestPlugin", HangingTestPlugin)
+    ])
+
+    monkeypatch.setattr(offshoot, "discover", lambda pluggable, selection=None: plugin_classes)
+
+    async def gather():
+        return await offshoot.gather("TestPluggable", "expected_function", asyncio.Event(), timeout=0.5)
+
+    results = asyncio.run(gather())
+
+    assert [result.name for result in results] == ["AsyncTestPlugin", "SyncTestPlugin", "HangingTestPlugin"]
+    assert [result.value for result in results] == ["async", "sync", None]
+    assert isinstance(results[2].error, asyncio.TimeoutError)
+    assert events == ["cancelled"]
+
+
+def test_hooks_should_dispatch_to_a_precompiled_chain_ordered_by_priority(monkeypatch, mocker):
+    calls = list()
+
+    class FirstTestPlugin(TestPluggable):
+        def accepted_function(self, event):
+            calls.append(("first", event))
+            return "first"
+
+    class SecondTestPlugin(TestPluggable):
+        def accepted_function(self, event):
+            calls.append(("second", event))
+            return "second"
+
+    class SilentTestPlugin(TestPluggable):
+        pass
+
+    entry = offshoot.registry.RegistryEntry(
+        list(),
+        collections.OrderedDict([("FirstTestPlugin", FirstTestPlugin), ("SilentTestPlugin", SilentTestPlugin), ("SecondTestPlugin", SecondTestPlugin)]),
+        {
+            "FirstTestPlugin": {"file": {"pluggable": "TestPluggable"}},
+            "SilentTestPlugin": {"file": {"pluggable": "TestPluggable"}},
+            "SecondTestPlugin": {"file": {"pluggable": "TestPluggable", "priority": 10}}
+        },
+        list()
+    )
+
+    monkeypatch.setattr(offshoot.plugin_registry, "entry", mocker.Mock(return_value=entry))
+    offshoot.hooks.invalidate()
+
+    assert offshoot.dispatch("TestPluggable", "accepted_function", "event") == ["second", "first"]
+    assert calls == [("second", "event"), ("first", "event")]
+
+    handlers = offshoot.hook_chain("TestPluggable", "accepted_function")
+
+    assert isinstance(handlers, tuple)
+    assert len(handlers) == 2
+
+    for i in range(10):
+        offshoot.dispatch("TestPluggable", "accepted_function", "event")
+
+    assert offshoot.plugin_registry.entry.call_count == 1
+
+    offshoot.plugin_registry.invalidate()
+
+    assert offshoot.hook_chain("TestPluggable", "accepted_function") is handlers
+    assert offshoot.plugin_registry.entry.call_count == 2
+
+    offshoot.hooks.invalidate()
+
+
+def test_hooks_should_recompile_a_chain_when_the_manifest_is_changed_by_another_process():
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+    offshoot.hooks.invalidate()
+
+    handlers = offshoot.hook_chain("TestPluggable", "expected_function")
+
+    assert len(handlers) > 0
+    assert offshoot.hook_chain("TestPluggable", "expected_function") is handlers
+
+    generation = offshoot.plugin_registry.generation
+
+    subprocess.check_call([sys.executable, "-c", "import offshoot; offshoot.Manifest().remove_plugin('TestPlugin')"])
+
+    # Nothing happened in this process: only the manifest file tells the chain apart
+    assert offshoot.plugin_registry.generation == generation
+    assert offshoot.hook_chain("TestPluggable", "expected_function") == tuple()
+
+    TestPlugin.uninstall()
+    offshoot.hooks.invalidate()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_pools_should_warm_instances_in_the_background_and_hand_them_out_within_bounds():
+    events = list()
+
+    class WarmingTestPlugin(TestPluggable):
+        @classmethod
+        def on_load(cls):
+            events.append("load")
+
+        def __init__(self, **kwargs):
+            events.append("init")
+
+        def on_warmup(self):
+            events.append("warmup")
+
+        def expected_function(self):
+            return "expected"
+
+    pool = offshoot.PluginInstancePool(WarmingTestPlugin, size=2)
+
+    assert pool.idle == 0
+
+    pool.warm(wait=True)
+
+    assert pool.is_warm is True
+    assert pool.idle == 2
+    assert events == ["load", "init", "warmup", "init", "warmup"]
+
+    with pool.instance() as instance:
+        assert instance.expected_function() == "expected"
+        assert pool.idle == 1
+
+    # Warm instances are handed out as they are: nothing is constructed or warmed up on acquire
+    assert events == ["load", "init", "warmup", "init", "warmup"]
+    assert pool.idle == 2
+
+    first = pool.acquire()
+    second = pool.acquire()
+
+    with pytest.raises(offshoot.PluginTimeoutError):
+        pool.acquire(timeout=0.01)
+
+    pool.release(first)
+    pool.release(second)
+    pool.release(WarmingTestPlugin())
+
+    assert pool.idle == 2
+
+
+def test_pools_should_raise_on_acquire_if_the_warmup_failed():
+    class BrokenTestPlugin(TestPluggable):
+        def __init__(self, **kwargs):
+            raise ValueError("No model file")
+
+    pool = offshoot.PluginInstancePool(BrokenTestPlugin, size=2)
+
+    with pytest.raises(offshoot.PluginError, match="No model file"):
+        pool.acquire(timeout=1)
+
+    with pytest.raises(offshoot.PluginError):
+        pool.acquire(timeout=1)
+
+
+def test_pools_should_build_no_instance_before_on_load_finished_when_warming_up_on_several_threads():
+    events = list()
+    initialized = threading.Event()
+
+    class HeavyTestPlugin(TestPluggable):
+        @classmethod
+        def on_load(cls):
+            events.append("load-start")
+
+            # Only returns early if an instance gets built while the class is still loading
+            initialized.wait(0.2)
+            events.append("load-end")
+
+        def __init__(self, **kwargs):
+            events.append("init")
+            initialized.set()
+
+    pool = offshoot.PluginInstancePool(HeavyTestPlugin, size=2, warmup_threads=2)
+    pool.warm(wait=True)
+
+    assert events == ["load-start", "load-end", "init", "init"]
+    assert pool.idle == 2
+
+    events.clear()
+
+    class BrokenLoadTestPlugin(TestPluggable):
+        @classmethod
+        def on_load(cls):
+            events.append("load")
+
+            raise ValueError("No model file")
+
+        def __init__(self, **kwargs):
+            events.append("init")
+
+    pool = offshoot.PluginInstancePool(BrokenLoadTestPlugin, size=2, warmup_threads=2)
+
+    with pytest.raises(offshoot.PluginError, match="No model file"):
+        pool.warm(wait=True)
+
+    # Neither thread built an instance of a class that failed to load
+    assert "init" not in events
+    assert pool.drain() == list()
+
+    offshoot.pools.drop(HeavyTestPlugin)
+
+
+def test_caching_should_memoize_plugin_methods_per_plugin_version(monkeypatch):
+    calls = list()
+    metadata = {"plugin": "TestPlugin", "version": "0.1.0"}
+
+    class CachedTestPlugin(TestPluggable):
+        @offshoot.cached(maxsize=2)
+        def expected_function(self, value):
+            calls.append(value)
+            return value * 2
+
+    monkeypatch.setattr(offshoot.plugin_registry, "class_metadata", lambda plugin_class: metadata)
+
+    plugin = CachedTestPlugin()
+
+    assert plugin.expected_function(1) == 2
+    assert CachedTestPlugin().expected_function(1) == 2
+    assert plugin.expected_function(value=1) == 2
+
+    assert calls == [1, 1]
+
+    cache_info = CachedTestPlugin.expected_function.cache_info()
+
+    assert cache_info["hits"] == 1
+    assert cache_info["misses"] == 2
+    assert cache_info["size"] == 2
+
+    plugin.expected_function(2)
+
+    assert CachedTestPlugin.expected_function.cache_info()["evictions"] == 1
+
+    metadata["version"] = "0.2.0"
+    offshoot.plugin_registry.invalidate()
+
+    plugin.expected_function(2)
+
+    assert calls == [1, 1, 2, 2]
+
+    assert plugin.expected_function([1]) == [1, 1]
+    assert plugin.expected_function([1]) == [1, 1]
+
+    assert CachedTestPlugin.expected_function.cache_info()["hits"] == 1
+
+
+def test_caching_should_expire_entries_after_their_ttl():
+    calls = list()
+
+    @offshoot.cached(ttl=0.05)
+    def cached_function(value):
+        calls.append(value)
+        return value
+
+    cached_function(1)
+    cached_function(1)
+
+    time.sleep(0.06)
+
+    cached_function(1)
+
+    assert calls == [1, 1]
+    assert cached_function.cache_info()["expirations"] == 1
+
+    cached_function.cache_clear()
+
+    assert cached_function.cache_info()["size"] == 0
+
+
+def test_caching_should_memoize_the_awaited_results_of_coroutine_methods():
+    calls = list()
+
+    class AsyncCachedTestPlugin(TestPluggable):
+        @offshoot.cached
+        async def expected_function(self, value):
+            calls.append(value)
+            await asyncio.sleep(0)
+            return value * 2
+
+    async def call_twice():
+        plugin = AsyncCachedTestPlugin()
+        return [await plugin.expected_function(2), await plugin.expected_function(2), await plugin.expected_function([1])]
+
+    assert inspect.iscoroutinefunction(AsyncCachedTestPlugin.expected_function)
+    assert asyncio.run(call_twice()) == [4, 4, [1, 1]]
+
+    assert calls == [2, [1]]
+    assert AsyncCachedTestPlugin.expected_function.cache_info()["hits"] == 1
+
+
+def test_prefetching_should_import_plugin_modules_in_the_background_and_let_discovery_join(mocker):
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+
+    plugin_module = "plugins.TestPlugin.files.test_plugin_pluggable_expected"
+    sys.modules.pop(plugin_module, None)
+
+    mocker.spy(offshoot.plugin_registry, "_build")
+
+    futures = offshoot.prefetch(["TestPluggable"])
+
+    plugin_classes = offshoot.discover("TestPluggable")
+
+    assert list(plugin_classes.keys()) == ["TestPluginPluggableExpected"]
+    assert futures["TestPluggable"].result(timeout=5).classes == plugin_classes
+
+    assert plugin_module in sys.modules
+    assert offshoot.plugin_registry._build.call_count == 1
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_forking_should_preload_and_freeze_discovery_for_forked_workers(mocker):
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+
+    plugin_classes = offshoot.preload(freeze_gc=False)
+
+    assert list(plugin_classes.keys()) == ["TestPluggable"]
+    assert list(plugin_classes["TestPluggable"].keys()) == ["TestPluginPluggableExpected"]
+
+    assert offshoot.plugin_registry.frozen is True
+
+    mocker.spy(offshoot.plugin_registry, "signature")
+    mocker.spy(offshoot.plugin_registry, "_build")
+
+    offshoot.plugin_registry._lock.acquire()
+
+    pid = os.fork()
+
+    if pid == 0:
+        # The registry lock held by the parent at fork time must not deadlock the child
+        signal.alarm(5)
+
+        offshoot.plugin_registry.add_class_hook(print)
+        offshoot.plugin_registry.remove_class_hook(print)
+
+        is_served_from_preload = offshoot.discover("TestPluggable") == plugin_classes["TestPluggable"]
+        os._exit(0 if is_served_from_preload and offshoot.plugin_registry._build.call_count == 0 else 1)
+
+    offshoot.plugin_registry._lock.release()
+
+    assert os.waitpid(pid, 0)[1] == 0
+
+    assert offshoot.discover("TestPluggable") == plugin_classes["TestPluggable"]
+    assert offshoot.plugin_registry.signature.call_count == 0
+
+    TestPlugin.uninstall()
+
+    assert offshoot.plugin_registry.frozen is False
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_index_should_publish_a_memory_mapped_discovery_index_on_install_and_uninstall(mocker):
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    offshoot.config["discovery_index"] = True
+
+    TestPlugin.install()
+
+    index = offshoot.index.shared_index("offshoot.manifest.json")
+
+    assert os.path.isfile("offshoot.manifest.index")
+    assert index.generation == offshoot.Manifest().generation()
+    assert index.pluggables() == ["TestPluggable"]
+
+    records = index.lookup("TestPluggable")
+
+    assert len(records) == 1
+    assert records[0]["module"] == "plugins.TestPlugin.files.test_plugin_pluggable_expected"
+    assert records[0]["class_name"] == "TestPluginPluggableExpected"
+    assert records[0]["plugin"] == "TestPlugin"
+    assert records[0]["version"] == "0.1.0"
+    assert len(records[0]["sha256"]) == 64
+
+    assert index.lookup("InvalidPluggable") == list()
+
+    mocker.spy(offshoot, "file_contains_pluggable")
+
+    assert list(offshoot.discover("TestPluggable").keys()) == ["TestPluginPluggableExpected"]
+    assert offshoot.file_contains_pluggable.call_count == 0
+
+    TestPlugin.uninstall()
+
+    assert index.is_current() is False
+
+    index = offshoot.index.shared_index("offshoot.manifest.json")
+
+    assert index.generation == offshoot.Manifest().generation()
+    assert index.lookup("TestPluggable") == list()
+
+    os.remove("offshoot.manifest.index")
+
+    offshoot.config["discovery_index"] = False
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_index_should_remap_a_replaced_index_and_ignore_one_published_before_the_last_manifest_change(mocker):
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    offshoot.config["discovery_index"] = True
+
+    TestPlugin.install()
+
+    index = offshoot.index.shared_index("offshoot.manifest.json")
+    records = index.lookup("TestPluggable")
+
+    assert index.matches("offshoot.manifest.json") is True
+
+    mocker.spy(offshoot.Manifest, "plugin_file_entries_for_pluggable")
+
+    assert list(offshoot.discover("TestPluggable", fresh=True).keys()) == ["TestPluginPluggableExpected"]
+    assert offshoot.Manifest.plugin_file_entries_for_pluggable.call_count == 0
+
+    offshoot.index.publish_index("offshoot.manifest.json")
+
+    # The open reader keeps its mapping of the replaced file while new lookups map the new one
+    assert index.is_current() is False
+    assert index.lookup("TestPluggable") == records
+
+    replacing_index = offshoot.index.shared_index("offshoot.manifest.json")
+
+    assert replacing_index is not index
+    assert replacing_index.lookup("TestPluggable") == records
+
+    # The manifest changed without the index being published again
+    offshoot.config["discovery_index"] = False
+    offshoot.Manifest().remove_plugin("TestPlugin")
+    offshoot.config["discovery_index"] = True
+
+    assert replacing_index.matches("offshoot.manifest.json") is False
+    assert offshoot.index.shared_index("offshoot.manifest.json") is None
+
+    assert offshoot.discover("TestPluggable") == dict()
+    assert offshoot.Manifest.plugin_file_entries_for_pluggable.call_count > 0
+
+    TestPlugin.uninstall()
+
+    os.remove("offshoot.manifest.index")
+
+    offshoot.config["discovery_index"] = False
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_daemon_should_answer_queries_over_a_unix_socket_and_clients_should_fall_back_without_it(mocker):
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "offshoot.sock")
+
+    server = offshoot.daemon.DaemonServer(socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = offshoot.daemon.DaemonClient(socket_path=socket_path)
+
+    assert client.is_available() is True
+    assert client.request("ping") == os.getpid()
+
+    assert client.request("discover", pluggable="TestPluggable")["TestPluginPluggableExpected"]["plugin"] == "TestPlugin"
+    assert "TestPlugin" in offshoot.daemon.installed_plugins(socket_path=socket_path)
+
+    plugin_classes = offshoot.daemon.discover("TestPluggable", socket_path=socket_path)
+
+    assert plugin_classes == offshoot.discover("TestPluggable")
+
+    validation_result = offshoot.daemon.validate_plugin_file(
+        "tests/unit/offshoot/plugins/TestPlugin/files/test_plugin_pluggable_forbidden.py",
+        "TestPluggable",
+        socket_path=socket_path
+    )
+
+    assert validation_result[0] is False
+
+    with pytest.raises(offshoot.PluginError):
+        client.request("invalid")
+
+    running = list()
+
+    def run_plugin_command(plugin, arguments):
+        running.append(plugin)
+        assert len(running) == 1
+        time.sleep(0.05)
+        running.remove(plugin)
+
+        return {"returncode": 0, "output": "%s %s" % (plugin, " ".join(arguments))}
+
+    mocker.patch("offshoot.daemon._run_plugin_command", side_effect=run_plugin_command)
+
+    results = concurrent.futures.ThreadPoolExecutor(max_workers=3).map(
+        lambda plugin: client.request("uninstall", plugin=plugin, cascade=True),
+        ["TestPlugin", "TestPlugin2", "TestPlugin3"]
+    )
+
+    assert [result["output"] for result in results] == ["TestPlugin uninstall --cascade", "TestPlugin2 uninstall --cascade", "TestPlugin3 uninstall --cascade"]
+
+    server.shutdown()
+    server.server_close()
+
+    assert client.is_available() is False
+    assert offshoot.daemon.discover("TestPluggable", socket_path=socket_path) == offshoot.discover("TestPluggable")
+    assert offshoot.daemon.validate_plugin_file(
+        "tests/unit/offshoot/plugins/TestPlugin/files/test_plugin_pluggable_forbidden.py",
+        "TestPluggable",
+        socket_path=socket_path
+    )[0] is False
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_daemon_should_refuse_a_socket_another_daemon_listens_on_and_replace_a_stale_one(mocker):
+    import offshoot.main
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "offshoot.sock")
+
+    server = offshoot.daemon.DaemonServer(socket_path)
+
+    with pytest.raises(offshoot.PluginError):
+        offshoot.daemon.DaemonServer(socket_path)
+
+    server.socket.close()
+
+    # The socket file is left behind but nothing listens on it anymore
+    assert os.path.exists(socket_path)
+
+    server = offshoot.daemon.DaemonServer(socket_path)
+    server.server_close()
+
+    mocker.patch("offshoot.daemon.DaemonClient.is_available", return_value=True)
+    mocker.patch("offshoot.daemon.DaemonClient.request", return_value={"returncode": 3, "output": "failed"})
+
+    with pytest.raises(SystemExit) as e:
+        offshoot.main.install("TestPlugin")
+
+    assert e.value.code == 3
+
+
+def test_manifest_should_serialize_changes_across_processes_with_a_reentrant_file_lock():
+    manifest = offshoot.Manifest()
+    try_lock = "import fcntl\nf = open('offshoot.manifest.lock', 'a')\nfcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)"
+
+    with manifest.lock():
+        with manifest.lock():
+            assert subprocess.call([sys.executable, "-c", try_lock], stderr=subprocess.DEVNULL) == 1
+
+        assert subprocess.call([sys.executable, "-c", try_lock], stderr=subprocess.DEVNULL) == 1
+
+        # Plugin commands run by a process holding the lock don't wait for it
+        assert subprocess.call(
+            [sys.executable, "-c", "import offshoot\nwith offshoot.Manifest().lock(): pass"],
+            env=offshoot.locking.held_lock_environment(manifest.file_path),
+            timeout=30
+        ) == 0
+
+    assert subprocess.call([sys.executable, "-c", try_lock]) == 0
+
+    os.remove("offshoot.manifest.json")
+
+
+def test_unloading_should_drop_plugin_modules_and_classes_and_report_leaks():
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+
+    scope = dict()
+    offshoot.discover("TestPluggable", scope=scope)
+
+    assert "TestPluginPluggableExpected" in scope
+
+    report = offshoot.unload("TestPlugin", scopes=[scope])
+
+    assert "plugins.TestPlugin.files.test_plugin_pluggable_expected" in report.modules
+    assert "plugins.TestPlugin.plugin" in report.modules
+    assert "plugins.TestPlugin.files.test_plugin_pluggable_expected.TestPluginPluggableExpected" in report.classes
+
+    assert "plugins.TestPlugin.files.test_plugin_pluggable_expected" not in sys.modules
+    assert len(scope) == 0
+    assert offshoot.plugin_registry.lookup("TestPluggable") == dict()
+
+    # This test module still holds the TestPlugin definition class: it has to be reported
+    assert list(report.leaks.keys()) == ["plugins.TestPlugin.plugin.TestPlugin"]
+    assert any("(TestPlugin)" in referrer for referrer in report.leaks["plugins.TestPlugin.plugin.TestPlugin"])
+
+    assert list(offshoot.discover("TestPluggable").keys()) == ["TestPluginPluggableExpected"]
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_archives_should_install_discover_and_validate_plugins_from_a_zip_archive(mocker):
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    archive_path = os.path.join("plugins", "ArchivedTestPlugin.zip")
+
+    with zipfile.ZipFile(archive_path, "w") as zip_file:
+        zip_file.writestr("ArchivedTestPlugin/__init__.py", "")
+        zip_file.writestr("ArchivedTestPlugin/plugin.py", (
+            "import offshoot\n"
+            "\n"
+            "\n"
+            "class ArchivedTestPlugin(offshoot.Plugin):\n"
+            "    name = \"ArchivedTestPlugin\"\n"
+            "    version = \"0.3.0\"\n"
+            "\n"
+            "    files = [\n"
+            "        {\"path\": \"archived_test_plugin_pluggable.py\", \"pluggable\": \"TestPluggable\"}\n"
+            "    ]\n"
+        ))
+        zip_file.writestr("ArchivedTestPlugin/files/archived_test_plugin_pluggable.py", (
+            "import pluggable\n"
+            "\n"
+            "\n"
+            "class ArchivedTestPluginPluggable(pluggable.TestPluggable):\n"
+            "    def expected_function(self):\n"
+            "        return \"archived\"\n"
+        ))
+
+    offshoot.invalidate_discovery()
+
+    offshoot.load_plugin_class("ArchivedTestPlugin").install()
+
+    plugin_class = offshoot.discover("TestPluggable")["ArchivedTestPluginPluggable"]
+
+    # The archive is indexed once: rediscovery and validation are served from it
+    mocker.spy(offshoot.archives.PluginArchive, "__init__")
+
+    assert offshoot.discover("TestPluggable", fresh=True)["ArchivedTestPluginPluggable"] is plugin_class
+
+    assert plugin_class().expected_function() == "archived"
+    assert sys.modules[plugin_class.__module__].__file__.startswith(archive_path)
+    assert "return \"archived\"" in inspect.getsource(plugin_class)
+
+    assert offshoot.archives.PluginArchive.__init__.call_count == 0
+
+    validation_result = offshoot.validate_plugin_file(
+        os.path.join("plugins", "ArchivedTestPlugin", "files", "archived_test_plugin_pluggable.py"),
+        "TestPluggable",
+        TestPluggable.method_directives()
+    )
+
+    assert validation_result == [True, []]
+
+    assert offshoot.archives.module_runner_arguments("ArchivedTestPlugin", "plugins.ArchivedTestPlugin.plugin")[0] == "-c"
+    assert offshoot.archives.module_runner_arguments("TestPlugin", "plugins.TestPlugin.plugin") == ["-m", "plugins.TestPlugin.plugin"]
+
+    offshoot.load_plugin_class("ArchivedTestPlugin").uninstall()
+    offshoot.unload("ArchivedTestPlugin")
+
+    os.remove(archive_path)
+    offshoot.invalidate_discovery()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_archives_should_keep_serving_loaders_of_an_archive_that_was_invalidated_or_replaced():
+    archive_path = os.path.join("plugins", "ReplacedTestPlugin.zip")
+
+    for version in ["1", "2"]:
+        with zipfile.ZipFile(archive_path + ".tmp", "w") as zip_file:
+            zip_file.writestr("ReplacedTestPlugin/__init__.py", "")
+            zip_file.writestr("ReplacedTestPlugin/replaced.py", "VERSION = %r\n" % version)
+
+        os.replace(archive_path + ".tmp", archive_path)
+
+        if version == "1":
+            loader = offshoot.archives.ArchiveFinder().find_spec("plugins.ReplacedTestPlugin.replaced", None).loader
+
+            offshoot.archives.invalidate()
+
+            assert loader.get_source("plugins.ReplacedTestPlugin.replaced") == "VERSION = '1'\n"
+
+    offshoot.archives.invalidate()
+
+    replacing_loader = offshoot.archives.ArchiveFinder().find_spec("plugins.ReplacedTestPlugin.replaced", None).loader
+
+    assert replacing_loader.get_source("plugins.ReplacedTestPlugin.replaced") == "VERSION = '2'\n"
+    assert loader.archive.read("ReplacedTestPlugin/__init__.py") == b""
+
+    os.remove(archive_path)
+    offshoot.archives.invalidate()
+
+
+def test_archives_should_pack_a_plugin_directory_and_prefer_the_directory_while_it_exists():
+    archive_path = offshoot.archives.pack("TestPlugin2")
+
+    with zipfile.ZipFile(archive_path) as zip_file:
+        names = zip_file.namelist()
+
+    assert "TestPlugin2/plugin.py" in names
+    assert "TestPlugin2/files/test_plugin_pluggable.py" in names
+    assert not any(name.endswith(".pyc") for name in names)
+
+    assert offshoot.archives.archive_for("TestPlugin2") is None
+
+    os.remove(archive_path)
+
+
+def test_compiling_should_precompile_plugin_files_with_checked_hashes_on_install_and_remove_them_on_uninstall():
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    offshoot.compiling.remove_bytecode("TestPlugin")
+
+    TestPlugin.install()
+
+    for file_path in offshoot.compiling.plugin_source_files("TestPlugin"):
+        with open(importlib.util.cache_from_source(file_path), "rb") as f:
+            header = f.read(8)
+
+        # Bit 0 marks a hash-based pyc and bit 1 asks for the hash to be checked against the source
+        assert int.from_bytes(header[4:8], "little") == 0b11
+
+    TestPlugin.uninstall()
+
+    assert not os.path.isdir("plugins/TestPlugin/__pycache__")
+    assert not os.path.isdir("plugins/TestPlugin/files/__pycache__")
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_compiling_should_compile_in_parallel_and_remove_bytecode_left_by_deleted_sources(mocker):
+    stale_file_path = "plugins/TestPlugin2/files/__pycache__/removed_module.cpython-00.pyc"
+
+    os.makedirs(os.path.dirname(stale_file_path), exist_ok=True)
+
+    with open(stale_file_path, "wb") as f:
+        f.write(b"")
+
+    executor_spy = mocker.spy(concurrent.futures, "ProcessPoolExecutor")
+
+    errors = offshoot.compiling.compile_plugins(["TestPlugin2"], optimization=2, workers=2)
+
+    assert errors == dict()
+    assert executor_spy.call_args[1]["max_workers"] == 2
+
+    assert not os.path.isfile(stale_file_path)
+
+    for file_path in offshoot.compiling.plugin_source_files("TestPlugin2"):
+        assert os.path.isfile(importlib.util.cache_from_source(file_path, optimization=2))
+
+    offshoot.compiling.remove_bytecode("TestPlugin2")
+
+
+def test_store_should_hardlink_identical_plugin_files_to_a_single_blob_and_collect_unreferenced_blobs():
+    for plugin_name, variant in [("TestStoreA", "a"), ("TestStoreB", "b")]:
+        os.makedirs("plugins/%s/files" % plugin_name)
+
+        with open("plugins/%s/files/shared.py" % plugin_name, "w") as f:
+            f.write("SHARED = True\n")
+
+        with open("plugins/%s/files/variant.py" % plugin_name, "w") as f:
+            f.write("VARIANT = %r\n" % variant)
+
+    file_hashes = offshoot.store.store_plugin("TestStoreA")
+    assert offshoot.store.store_plugin("TestStoreB")["shared.py"] == file_hashes["shared.py"]
+
+    assert sorted(file_hashes) == ["shared.py", "variant.py"]
+
+    shared_blob_path = offshoot.store.blob_path_for(file_hashes["shared.py"])
+
+    assert os.path.samefile("plugins/TestStoreA/files/shared.py", "plugins/TestStoreB/files/shared.py")
+    assert os.path.samefile("plugins/TestStoreA/files/shared.py", shared_blob_path)
+    assert os.stat(shared_blob_path).st_nlink == 3
+
+    assert not os.path.samefile("plugins/TestStoreA/files/variant.py", "plugins/TestStoreB/files/variant.py")
+
+    assert offshoot.store.collect_garbage() == (list(), 0)
+
+    subprocess.call(["rm", "-rf", "plugins/TestStoreA", "plugins/TestStoreB"])
+
+    removed_blobs, freed_bytes = offshoot.store.collect_garbage()
+
+    assert set(file_hashes.values()) < set(removed_blobs)
+    assert len(removed_blobs) == 3
+    assert freed_bytes == len("SHARED = True\n") + 2 * len("VARIANT = 'a'\n")
+
+    assert os.listdir("offshoot.store") == list()
+    os.rmdir("offshoot.store")
+
+
+def test_store_should_detach_linked_files_so_that_editing_an_installed_plugin_leaves_the_other_plugins_alone():
+    class TestStoreCPlugin(offshoot.Plugin):
+        name = "TestStoreC"
+
+    for plugin_name in ["TestStoreC", "TestStoreD"]:
+        os.makedirs("plugins/%s/files" % plugin_name)
+
+        with open("plugins/%s/files/shared.py" % plugin_name, "w") as f:
+            f.write("SHARED = True\n")
+
+    digest = offshoot.store.store_plugin("TestStoreC")["shared.py"]
+    offshoot.store.store_plugin("TestStoreD")
+
+    # Linked files are read-only: an edit in place would show up in every plugin sharing the blob
+    assert os.stat("plugins/TestStoreC/files/shared.py").st_mode & 0o222 == 0
+
+    assert offshoot.store.detach_plugin("TestStoreC") == ["plugins/TestStoreC/files/shared.py"]
+    assert offshoot.store.detach_plugin("TestStoreC") == list()
+
+    assert not os.path.samefile("plugins/TestStoreC/files/shared.py", offshoot.store.blob_path_for(digest))
+    assert os.stat("plugins/TestStoreC/files/shared.py").st_mode & 0o200
+
+    with open("plugins/TestStoreC/files/shared.py", "a") as f:
+        f.write("EDITED = True\n")
+
+    with open("plugins/TestStoreD/files/shared.py", "r") as f:
+        assert f.read() == "SHARED = True\n"
+
+    assert offshoot.store.file_hash(offshoot.store.blob_path_for(digest)) == digest
+
+    edited_digest = offshoot.store.store_plugin("TestStoreC")["shared.py"]
+
+    assert edited_digest != digest
+    assert os.path.samefile("plugins/TestStoreC/files/shared.py", offshoot.store.blob_path_for(edited_digest))
+
+    # Uninstalling leaves regular files behind
+    TestStoreCPlugin.uninstall_files()
+
+    assert os.stat("plugins/TestStoreC/files/shared.py").st_nlink == 1
+    assert os.stat("plugins/TestStoreC/files/shared.py").st_mode & 0o200
+
+    subprocess.call(["rm", "-rf", "plugins/TestStoreC", "plugins/TestStoreD"])
+
+    offshoot.store.collect_garbage()
+
+    assert os.listdir("offshoot.store") == list()
+    os.rmdir("offshoot.store")
+
+
+def test_store_should_record_file_hashes_in_the_manifest_and_link_files_on_install_if_enabled(mocker):
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    store_spy = mocker.patch("offshoot.store.store_plugin")
+
+    TestPlugin.install()
+
+    assert store_spy.call_count == 0
+
+    file_hashes = offshoot.Manifest().list_plugins()["TestPlugin"]["file_hashes"]
+
+    assert "test_plugin_pluggable.py" in file_hashes
+    assert file_hashes["test_plugin_pluggable.py"] == offshoot.store.file_hash("plugins/TestPlugin/files/test_plugin_pluggable.py")
+
+    offshoot.config["content_store"] = True
+
+    TestPlugin.install(force=True)
+
+    store_spy.assert_called_once_with("TestPlugin")
+
+    offshoot.config["content_store"] = False
+
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_versions_should_switch_between_staged_plugin_versions_and_roll_back_without_reinstalling():
+    source_directory = tempfile.mkdtemp()
+
+    for version in ["1.0.0", "2.0.0"]:
+        os.makedirs(os.path.join(source_directory, version, "files"))
+
+        with open(os.path.join(source_directory, version, "__init__.py"), "w") as f:
+            f.write("")
+
+        with open(os.path.join(source_directory, version, "files", "__init__.py"), "w") as f:
+            f.write("")
+
+        with open(os.path.join(source_directory, version, "plugin.py"), "w") as f:
+            f.write("import offshoot\n\n\nclass TestVersionedPlugin(offshoot.Plugin):\n    name = \"TestVersionedPlugin\"\n    version = %r\n\n    files = [{\"path\": \"versioned.py\", \"pluggable\": \"TestPluggable\"}]\n" % version)
+
+        with open(os.path.join(source_directory, version, "files", "versioned.py"), "w") as f:
+            f.write("import pluggable\n\n\nclass TestVersionedPluggable(pluggable.TestPluggable):\n    version = %r\n\n    def expected_function(self):\n        pass\n" % version)
+
+    assert offshoot.versions.stage("TestVersionedPlugin", os.path.join(source_directory, "1.0.0")) == "1.0.0"
+    assert offshoot.versions.activate("TestVersionedPlugin", "1.0.0") is None
+
+    assert os.path.islink("plugins/TestVersionedPlugin")
+    assert offshoot.discover("TestPluggable")["TestVersionedPluggable"].version == "1.0.0"
+
+    assert offshoot.versions.stage("TestVersionedPlugin", os.path.join(source_directory, "2.0.0")) == "2.0.0"
+
+    # Staging alone changes nothing that is discoverable
+    assert offshoot.discover("TestPluggable")["TestVersionedPluggable"].version == "1.0.0"
+
+    generation = offshoot.Manifest().generation()
+
+    assert offshoot.versions.activate("TestVersionedPlugin", "2.0.0") == "1.0.0"
+
+    assert offshoot.Manifest().generation() == generation + 1
+    assert offshoot.Manifest().list_plugins()["TestVersionedPlugin"]["version"] == "2.0.0"
+    assert offshoot.discover("TestPluggable")["TestVersionedPluggable"].version == "2.0.0"
+
+    assert offshoot.versions.rollback("TestVersionedPlugin") == "1.0.0"
+    assert offshoot.discover("TestPluggable")["TestVersionedPluggable"].version == "1.0.0"
+
+    with pytest.raises(offshoot.PluginError):
+        offshoot.versions.activate("TestVersionedPlugin", "3.0.0")
+
+    offshoot.Manifest().remove_plugin("TestVersionedPlugin")
+    offshoot.versions.reload_plugin_modules("TestVersionedPlugin")
+
+    subprocess.call(["rm", "-rf", "plugins/TestVersionedPlugin", "plugins/.versions", source_directory])
+
+
+def test_versions_should_not_activate_a_version_whose_plugin_dependencies_are_missing():
+    source_directory = tempfile.mkdtemp()
+
+    for version, plugins in [("1.0.0", []), ("2.0.0", ["TestMissingPlugin"])]:
+        os.makedirs(os.path.join(source_directory, version, "files"))
+
+        with open(os.path.join(source_directory, version, "__init__.py"), "w") as f:
+            f.write("")
+
+        with open(os.path.join(source_directory, version, "plugin.py"), "w") as f:
+            f.write("import offshoot\n\n\nclass TestVersionedPlugin(offshoot.Plugin):\n    name = \"TestVersionedPlugin\"\n    version = %r\n\n    plugins = %r\n" % (version, plugins))
+
+    offshoot.versions.stage("TestVersionedPlugin", os.path.join(source_directory, "1.0.0"))
+    offshoot.versions.activate("TestVersionedPlugin", "1.0.0")
+
+    offshoot.versions.stage("TestVersionedPlugin", os.path.join(source_directory, "2.0.0"))
 
-    expected_messages = {
-        "expected methods are missing",
-        "method should not appear in the class"
-    }
+    with pytest.raises(offshoot.PluginError, match="TestMissingPlugin"):
+        offshoot.versions.activate("TestVersionedPlugin", "2.0.0")
 
-    for validation_message in validation_result[1]:
-        for expected_message in list(expected_messages):
-            if expected_message in validation_message:
-                expected_messages.remove(expected_message)
+    assert os.readlink("plugins/TestVersionedPlugin") == os.path.join(".versions", "TestVersionedPlugin", "1.0.0")
+    assert offshoot.Manifest().list_plugins()["TestVersionedPlugin"]["version"] == "1.0.0"
 
-    assert len(expected_messages) == 0
+    offshoot.config["allow"]["plugins"] = False
 
+    assert offshoot.versions.activate("TestVersionedPlugin", "2.0.0") == "1.0.0"
 
-def test_base_should_be_able_to_return_a_list_of_installed_plugins():
-    offshoot.config["allow"]["files"] = False
-    offshoot.config["allow"]["config"] = False
-    offshoot.config["allow"]["libraries"] = False
-    offshoot.config["allow"]["callbacks"] = False
+    offshoot.config["allow"]["plugins"] = True
 
-    TestPlugin.uninstall()
+    offshoot.Manifest().remove_plugin("TestVersionedPlugin")
+    offshoot.versions.reload_plugin_modules("TestVersionedPlugin")
 
-    assert len(offshoot.installed_plugins()) == 0
+    subprocess.call(["rm", "-rf", "plugins/TestVersionedPlugin", "plugins/.versions", source_directory])
 
-    TestPlugin.install()
 
-    assert len(offshoot.installed_plugins()) == 1
-    assert "TestPlugin - 0.1.0" in offshoot.installed_plugins()
+def test_versions_should_run_the_install_phases_that_differ_when_activating_a_version(capsys):
+    source_directory = tempfile.mkdtemp()
 
-    TestPlugin.uninstall()
+    for version in ["1.0.0", "2.0.0"]:
+        os.makedirs(os.path.join(source_directory, version, "files"))
 
-    assert len(offshoot.installed_plugins()) == 0
+        with open(os.path.join(source_directory, version, "__init__.py"), "w") as f:
+            f.write("")
 
-    offshoot.config["allow"]["files"] = True
-    offshoot.config["allow"]["config"] = True
-    offshoot.config["allow"]["libraries"] = True
-    offshoot.config["allow"]["callbacks"] = True
+        with open(os.path.join(source_directory, version, "files", "__init__.py"), "w") as f:
+            f.write("")
 
+        config = {"setting": version} if version == "1.0.0" else {"setting": version, "added": True}
 
-def test_base_should_be_able_to_discover_installed_plugins_for_a_specified_pluggable():
-    offshoot.config["allow"]["config"] = False
-    offshoot.config["allow"]["libraries"] = False
-    offshoot.config["allow"]["callbacks"] = False
+        with open(os.path.join(source_directory, version, "plugin.py"), "w") as f:
+            f.write("import offshoot\n\n\nclass TestVersionedPlugin(offshoot.Plugin):\n    name = \"TestVersionedPlugin\"\n    version = %r\n\n    libraries = [\"requests\"]\n    config = %r\n\n    files = [{\"path\": \"versioned.py\", \"pluggable\": \"TestPluggable\"}]\n" % (version, config))
 
-    offshoot.config["modules"].append("pluggable")
+        with open(os.path.join(source_directory, version, "files", "versioned.py"), "w") as f:
+            f.write("import pluggable\n\n\nclass TestVersionedPluggable(pluggable.TestPluggable):\n    def expected_function(self):\n        pass\n")
 
-    TestPlugin.install()
+    offshoot.config["file_paths"]["config"] = os.path.join(source_directory, "config.plugins.yml")
+    offshoot.config["file_paths"]["libraries"] = os.path.join(source_directory, "requirements.plugins.txt")
 
-    class_mapping = offshoot.discover("TestPluggable", globals())
+    offshoot.versions.stage("TestVersionedPlugin", os.path.join(source_directory, "1.0.0"))
+    offshoot.versions.activate("TestVersionedPlugin", "1.0.0")
 
-    assert isinstance(class_mapping, dict)
-    assert len(class_mapping) == 0
+    output = capsys.readouterr().out
 
-    assert inspect.isclass(TestPluginPluggableExpected)
+    assert "Updating configuration file" in output
+    assert "Updating libraries" in output
+    assert "TestVersionedPlugin was installed successfully!" in output
 
-    TestPlugin.uninstall()
+    with open(offshoot.config["file_paths"]["libraries"], "r") as f:
+        assert "requests" in f.read()
 
-    offshoot.config["allow"]["config"] = True
-    offshoot.config["allow"]["libraries"] = True
-    offshoot.config["allow"]["callbacks"] = True
+    with open(offshoot.config["file_paths"]["config"], "r") as f:
+        assert yaml.safe_load(f.read())["TestVersionedPlugin"] == {"setting": "1.0.0"}
 
+    offshoot.versions.stage("TestVersionedPlugin", os.path.join(source_directory, "2.0.0"))
+    offshoot.versions.activate("TestVersionedPlugin", "2.0.0")
 
-def test_base_should_be_able_to_discover_installed_plugins_for_a_specified_pluggable_with_no_scope_passed_along():
-    offshoot.config["allow"]["config"] = False
-    offshoot.config["allow"]["libraries"] = False
-    offshoot.config["allow"]["callbacks"] = False
+    output = capsys.readouterr().out
 
-    offshoot.config["modules"].append("pluggable")
+    # The libraries didn't change between the versions
+    assert "Updating configuration file" in output
+    assert "Skipping libraries, unchanged" in output
+    assert "TestVersionedPlugin was installed successfully!" in output
 
-    TestPlugin.install()
+    with open(offshoot.config["file_paths"]["config"], "r") as f:
+        assert yaml.safe_load(f.read())["TestVersionedPlugin"] == {"setting": "1.0.0", "added": True}
 
-    class_mapping = offshoot.discover("TestPluggable")
+    offshoot.versions.activate("TestVersionedPlugin", "2.0.0")
 
-    assert isinstance(class_mapping, dict)
+    output = capsys.readouterr().out
 
-    assert len(class_mapping) == 1
-    assert "TestPluginPluggableExpected" in class_mapping
-    assert inspect.isclass(class_mapping["TestPluginPluggableExpected"])
+    assert "Skipping config, unchanged" in output
+    assert "TestVersionedPlugin was installed successfully!" not in output
 
-    TestPlugin.uninstall()
+    offshoot.Manifest().remove_plugin("TestVersionedPlugin")
+    offshoot.versions.reload_plugin_modules("TestVersionedPlugin")
 
-    offshoot.config["allow"]["config"] = True
-    offshoot.config["allow"]["libraries"] = True
-    offshoot.config["allow"]["callbacks"] = True
+    offshoot.config["file_paths"]["config"] = "config/config.plugins.yml"
+    offshoot.config["file_paths"]["libraries"] = "requirements.plugins.txt"
 
+    subprocess.call(["rm", "-rf", "plugins/TestVersionedPlugin", "plugins/.versions", source_directory])
 
-def test_base_should_be_able_to_discover_installed_plugins_for_a_specified_pluggable_with_selection_passed_along():
+
+def test_sync_should_plan_and_apply_only_the_difference_between_the_desired_and_installed_plugins(mocker):
+    offshoot.config["allow"]["files"] = False
     offshoot.config["allow"]["config"] = False
     offshoot.config["allow"]["libraries"] = False
     offshoot.config["allow"]["callbacks"] = False
 
-    offshoot.config["modules"].append("pluggable")
+    with open("offshoot.desired.yml", "w") as f:
+        yaml.dump({"plugins": {"TestPlugin2": None, "TestPlugin": {"version": "0.1.0"}}}, f)
 
-    TestPlugin.install()
+    desired_plugins = offshoot.sync.load_desired("offshoot.desired.yml")
 
-    class_mapping = offshoot.discover("TestPluggable", selection="123")
+    actions = offshoot.sync.sync("offshoot.desired.yml", dry_run=True)
 
-    assert isinstance(class_mapping, dict)
-    assert len(class_mapping) == 0
+    assert [(action.action, action.plugin) for action in actions] == [("install", "TestPlugin"), ("install", "TestPlugin2")]
+    assert "TestPlugin" not in offshoot.Manifest().list_plugins()
 
-    class_mapping = offshoot.discover("TestPluggable", selection=["123"])
+    invalidate_spy = mocker.spy(offshoot, "invalidate_discovery")
 
-    assert isinstance(class_mapping, dict)
-    assert len(class_mapping) == 0
+    offshoot.sync.apply(actions)
 
-    class_mapping = offshoot.discover("TestPluggable", selection=["TestPluginPluggableExpected"])
+    assert invalidate_spy.call_count == 1
+    assert sorted(offshoot.Manifest().list_plugins()) == ["TestPlugin", "TestPlugin2"]
 
-    assert isinstance(class_mapping, dict)
-    assert len(class_mapping) == 1
-    assert "TestPluginPluggableExpected" in class_mapping
-    assert inspect.isclass(class_mapping["TestPluginPluggableExpected"])
+    install_spy = mocker.spy(offshoot.Plugin, "install")
 
-    TestPlugin.uninstall()
+    assert offshoot.sync.plan(desired_plugins) == list()
+    assert offshoot.sync.apply(offshoot.sync.plan(desired_plugins)) == list()
+    assert install_spy.call_count == 0
+
+    assert [(action.action, action.plugin) for action in offshoot.sync.plan({"TestPlugin": desired_plugins["TestPlugin"]})] == [("remove", "TestPlugin2")]
+    assert offshoot.sync.plan({"TestPlugin": {"version": "0.2.0", "source": None}, "TestPlugin2": desired_plugins["TestPlugin2"]}) == [
+        offshoot.sync.SyncAction("upgrade", "TestPlugin", "0.1.0", "0.2.0", None)
+    ]
+
+    mocker.patch("offshoot.store.plugin_file_hashes", return_value={"test_plugin_pluggable.py": "0" * 64})
+
+    assert [(action.action, action.plugin) for action in offshoot.sync.plan(desired_plugins)] == [("reinstall", "TestPlugin"), ("reinstall", "TestPlugin2")]
+
+    offshoot.sync.apply(offshoot.sync.plan(dict()))
+
+    assert offshoot.Manifest().list_plugins() == dict()
 
+    os.remove("offshoot.desired.yml")
+
+    offshoot.config["allow"]["files"] = True
     offshoot.config["allow"]["config"] = True
     offshoot.config["allow"]["libraries"] = True
     offshoot.config["allow"]["callbacks"] = True
 
 
-def test_base_should_be_able_to_determine_if_a_file_implements_a_specified_pluggable():
+def test_plugin_should_skip_install_phases_that_are_unchanged_since_the_last_install_unless_forced(mocker):
     offshoot.config["allow"]["config"] = False
     offshoot.config["allow"]["libraries"] = False
     offshoot.config["allow"]["callbacks"] = False
 
-    offshoot.config["modules"].append("pluggable")
+    install_files_spy = mocker.spy(TestPlugin, "install_files")
+    add_plugin_spy = mocker.spy(offshoot.Manifest, "add_plugin")
 
     TestPlugin.install()
 
-    manifest = offshoot.Manifest()
-    files = manifest.plugin_files_for_pluggable("TestPluggable")
+    assert install_files_spy.call_count == 1
+    assert add_plugin_spy.call_count == 1
 
-    valid, plugin_class = offshoot.file_contains_pluggable(files[0][0], "TestPluggable")
+    assert TestPlugin.unchanged_phases() == {"files", "manifest"}
 
-    assert valid is True
-    assert plugin_class == "TestPluginPluggableExpected"
+    TestPlugin.install()
 
-    valid, plugin_class = offshoot.file_contains_pluggable("INVALID.txt", "TestPluggable")
+    assert install_files_spy.call_count == 1
+    assert add_plugin_spy.call_count == 1
 
-    assert valid is False
-    assert plugin_class is None
+    TestPlugin.install(force=True)
 
-    valid, plugin_class = offshoot.file_contains_pluggable(files[0][0], "InvalidPluggable")
+    assert install_files_spy.call_count == 2
+    assert add_plugin_spy.call_count == 2
 
-    assert valid is False
-    assert plugin_class is None
+    # Phases that were disallowed during the last install are never considered done
+    offshoot.config["allow"]["libraries"] = True
+
+    assert TestPlugin.unchanged_phases() == {"files"}
+
+    offshoot.config["allow"]["libraries"] = False
+
+    mocker.patch.object(TestPlugin, "libraries", ["requests", "pyyaml"])
+
+    assert TestPlugin.unchanged_phases() == {"files"}
+
+    mocker.patch("offshoot.store.plugin_file_hashes", return_value={"test_plugin_pluggable.py": "0" * 64})
+
+    assert TestPlugin.unchanged_phases() == set()
 
     TestPlugin.uninstall()
 
@@ -420,6 +2358,31 @@ def test_manifest_should_be_able_to_remove_a_plugin_and_its_metadata():
     os.remove("offshoot.manifest.json")
 
 
+def test_manifest_should_replace_the_file_on_every_change_so_that_readers_never_see_a_partial_write():
+    manifest = offshoot.Manifest()
+
+    changes = [
+        lambda: manifest.add_plugin("TestPlugin"),
+        lambda: manifest.add_plugin_version("TestPlugin", "0.1.0", manifest.list_plugins()["TestPlugin"]),
+        lambda: manifest.remove_plugin("TestPlugin")
+    ]
+
+    for change in changes:
+        # A reader that opened the manifest before the change keeps reading the complete previous version
+        with open("offshoot.manifest.json", "r") as f:
+            previous_content = open("offshoot.manifest.json", "r").read()
+
+            change()
+
+            assert f.read() == previous_content
+
+        json.loads(open("offshoot.manifest.json", "r").read())
+
+    assert not any(file_name.startswith("offshoot.manifest.json.") for file_name in os.listdir("."))
+
+    os.remove("offshoot.manifest.json")
+
+
 def test_manifest_should_be_able_to_return_all_file_names_containing_a_specific_pluggable():
     offshoot.config["allow"]["files"] = False
     offshoot.config["allow"]["config"] = False
@@ -444,6 +2407,92 @@ def test_manifest_should_be_able_to_return_all_file_names_containing_a_specific_
     offshoot.config["allow"]["callbacks"] = True
 
 
+def test_manifest_should_be_able_to_return_the_dependencies_and_dependents_of_a_plugin():
+    offshoot.config["allow"]["files"] = False
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+    TestPlugin2.install()
+
+    manifest = offshoot.Manifest()
+
+    assert manifest.plugin_dependencies("TestPlugin2") == ["TestPlugin"]
+    assert manifest.plugin_dependencies("TestPlugin") == []
+
+    assert manifest.plugin_dependents("TestPlugin") == ["TestPlugin2"]
+    assert manifest.plugin_dependents("TestPlugin2") == []
+
+    assert manifest.missing_plugin_dependencies(["TestPlugin2"]) == []
+    assert manifest.missing_plugin_dependencies(["TestPlugin2", "TestPlugin3"]) == ["TestPlugin3"]
+
+    with open("offshoot.manifest.json", "r") as f:
+        assert "dependencies" in json.loads(f.read())
+
+    TestPlugin2.uninstall()
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["files"] = True
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_manifest_should_index_transitive_plugin_dependencies_and_dependents():
+    plugins = {
+        "A": {"plugins": []},
+        "B": {"plugins": ["A"]},
+        "C": {"plugins": ["B"]},
+        "D": {"plugins": ["A", "C"]}
+    }
+
+    dependencies = offshoot.manifest.index_dependencies(plugins)
+
+    assert dependencies["closure"]["A"] == []
+    assert dependencies["closure"]["C"] == ["A", "B"]
+    assert dependencies["closure"]["D"] == ["A", "B", "C"]
+
+    assert dependencies["dependents"]["A"] == ["B", "D"]
+    assert dependencies["dependents"]["C"] == ["D"]
+
+    with open("offshoot.manifest.json", "w") as f:
+        f.write(json.dumps({"plugins": plugins}))
+
+    dependents = offshoot.Manifest().plugin_dependents("A", transitive=True)
+
+    assert sorted(dependents) == ["B", "C", "D"]
+    assert dependents.index("D") < dependents.index("C") < dependents.index("B")
+
+    os.remove("offshoot.manifest.json")
+
+
+def test_manifest_should_index_the_same_transitive_dependencies_for_every_plugin_in_a_cycle():
+    plugins = {
+        "A": {"plugins": ["B"]},
+        "B": {"plugins": ["C"]},
+        "C": {"plugins": ["A"]},
+        "D": {"plugins": ["B"]}
+    }
+
+    dependencies = offshoot.manifest.index_dependencies(plugins)
+
+    assert dependencies["closure"]["A"] == ["B", "C"]
+    assert dependencies["closure"]["B"] == ["A", "C"]
+    assert dependencies["closure"]["C"] == ["A", "B"]
+    assert dependencies["closure"]["D"] == ["A", "B", "C"]
+
+    assert dependencies["dependents"]["A"] == ["C"]
+    assert dependencies["dependents"]["B"] == ["A", "D"]
+
+    with open("offshoot.manifest.json", "w") as f:
+        f.write(json.dumps({"plugins": plugins}))
+
+    assert sorted(offshoot.Manifest().plugin_dependents("A", transitive=True)) == ["B", "C", "D"]
+
+    os.remove("offshoot.manifest.json")
+
+
 def test_pluggable_should_be_able_to_return_its_method_directives():
     method_directives = TestPluggable.method_directives()
 
@@ -470,6 +2519,65 @@ def test_pluggable_should_be_able_to_determine_the_methods_tagged_with_a_specifi
     assert "forbidden_function" in TestPluggable.methods_with_decorator("forbidden")
 
 
+def test_pluggable_should_route_bulk_calls_to_batched_companions_and_fall_back_to_a_per_item_loop():
+    class ShapePluggable(offshoot.Pluggable):
+        @offshoot.expected
+        def area(self, side):
+            raise NotImplementedError()
+
+        @offshoot.batched
+        def area_batch(self, sides):
+            raise NotImplementedError()
+
+    class SquarePlugin(ShapePluggable):
+        def area(self, side):
+            return side * side
+
+    class BatchedSquarePlugin(SquarePlugin):
+        def area_batch(self, sides):
+            return ["batched-%d" % (side * side) for side in sides]
+
+    method_directives = ShapePluggable.method_directives()
+
+    assert method_directives["batched"] == ["area_batch"]
+    assert "area_batch" not in method_directives["forbidden"]
+
+    assert offshoot.call_batch(SquarePlugin(), "area", [1, 2, 3]) == [1, 4, 9]
+    assert offshoot.call_batch(BatchedSquarePlugin(), "area", [1, 2, 3]) == ["batched-1", "batched-4", "batched-9"]
+
+
+def test_pluggable_should_validate_batched_methods_against_their_per_item_companions():
+    assert offshoot.pluggable.batched_pairing_errors({"expected": ["area"], "accepted": [], "batched": ["area_batch"], "forbidden": []}) == []
+
+    errors = offshoot.pluggable.batched_pairing_errors({"expected": ["area"], "accepted": [], "batched": ["perimeter_batch"], "forbidden": []})
+
+    assert len(errors) == 1
+    assert "'perimeter_batch' batched method should be named after an expected or accepted method" in errors[0]
+
+
+def test_plugin_should_report_an_unpaired_batched_method_once_for_its_pluggable(tmpdir, mocker):
+    directives = {"expected": ["area"], "accepted": [], "batched": ["perimeter_batch"], "forbidden": []}
+
+    plugin_file = tmpdir.join("batched_plugin.py")
+    plugin_file.write("class SquarePlugin(Shape):\n    def area(self, side):\n        pass\n")
+
+    # The plugin's own methods are still checked per file, the pluggable's definition is not
+    assert offshoot.validate_plugin_file(str(plugin_file), "Shape", directives) == [True, []]
+
+    mocker.patch.object(TestPlugin, "files", [
+        {"path": "test_plugin_pluggable_expected.py", "pluggable": "TestPluggable"},
+        {"path": "test_plugin_pluggable_expected.py", "pluggable": "TestPluggable"}
+    ])
+
+    mocker.patch.object(TestPluggable, "method_directives", return_value={**TestPluggable.method_directives(), "batched": ["perimeter_batch"]})
+
+    with pytest.raises(offshoot.PluginError) as e:
+        TestPlugin.install_files()
+
+    assert str(e.value).count("'perimeter_batch' batched method") == 1
+    assert "TestPluggable: 'perimeter_batch' batched method" in str(e.value)
+
+
 def test_pluggable_should_trigger_a_callback_on_file_install(mocker):
     offshoot.config["allow"]["config"] = False
     offshoot.config["allow"]["libraries"] = False
@@ -620,6 +2728,9 @@ def test_plugin_removes_a_manifest_entry_on_uninstall(monkeypatch):
 
     assert remove_plugin_called
 
+    monkeypatch.undo()
+    offshoot.Manifest().remove_plugin("TestPlugin")
+
     offshoot.config["allow"]["files"] = True
     offshoot.config["allow"]["config"] = True
     offshoot.config["allow"]["libraries"] = True
@@ -637,7 +2748,8 @@ def test_plugin_files_are_validated_against_the_pluggable_specification_on_file_
 
     TestPlugin._validate_file_for_pluggable.assert_called_once_with(
         "plugins/TestPlugin/files/test_plugin_pluggable_expected.py",
-        "TestPluggable"
+        "TestPluggable",
+        pluggables={"TestPluggable": {"class": TestPluggable, "directives": TestPluggable.method_directives(), "errors": []}}
     )
 
     TestPlugin.uninstall()
@@ -1053,6 +3165,25 @@ def test_plugin_should_remove_a_libraries_block_on_libraries_uninstall(mocker):
     offshoot.config["allow"]["callbacks"] = True
 
 
+def test_plugin_should_map_pluggables_once_when_validating_and_calling_back_all_of_its_files(mocker):
+    mocker.patch.object(TestPlugin, "files", [
+        {"path": "test_plugin_pluggable_expected.py", "pluggable": "TestPluggable"},
+        {"path": "test_plugin_pluggable_expected.py", "pluggable": "TestPluggable"}
+    ])
+
+    mocker.spy(offshoot, "pluggable_classes")
+    mocker.spy(offshoot, "validate_plugin_file")
+
+    TestPlugin.install_files()
+
+    assert offshoot.validate_plugin_file.call_count == 2
+    assert offshoot.pluggable_classes.call_count == 1
+
+    TestPlugin.uninstall_files()
+
+    assert offshoot.pluggable_classes.call_count == 2
+
+
 def test_plugin_should_be_able_to_validate_a_file_against_a_pluggable_specification(mocker):
     mocker.spy(offshoot, "validate_plugin_file")
 
@@ -1176,14 +3307,91 @@ def test_plugin_should_pass_plugin_dependency_verification_if_all_dependencies_a
     TestPlugin.install()
     TestPlugin2.install()
 
+    TestPlugin2.uninstall()
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["files"] = True
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+def test_plugin_files_are_validated_without_importing_pluggable_classes_if_static_pluggables_is_set(mocker):
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+    offshoot.config["static_pluggables"] = True
+
+    mocker.spy(offshoot, "pluggable_classes")
+    mocker.spy(offshoot, "validate_plugin_file")
+
+    TestPlugin.install()
+
+    assert offshoot.pluggable_classes.call_count == 0
+
+    offshoot.validate_plugin_file.assert_called_once_with(
+        "plugins/TestPlugin/files/test_plugin_pluggable_expected.py",
+        "TestPluggable",
+        TestPluggable.method_directives()
+    )
+
+    with pytest.raises(offshoot.PluginError):
+        TestInvalidPlugin.install()
+
     TestPlugin.uninstall()
+
+    assert offshoot.pluggable_classes.call_count == 0
+
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+    offshoot.config["static_pluggables"] = False
+
+
+def test_plugin_an_error_should_be_raised_on_uninstall_if_an_installed_plugin_depends_on_it():
+    offshoot.config["allow"]["files"] = False
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+    TestPlugin2.install()
+
+    with pytest.raises(offshoot.PluginError):
+        TestPlugin.uninstall()
+
+    assert offshoot.Manifest().contains_plugin("TestPlugin")
+
     TestPlugin2.uninstall()
+    TestPlugin.uninstall()
+
+    offshoot.config["allow"]["files"] = True
+    offshoot.config["allow"]["config"] = True
+    offshoot.config["allow"]["libraries"] = True
+    offshoot.config["allow"]["callbacks"] = True
+
+
+def test_plugin_should_uninstall_dependent_plugins_first_on_cascading_uninstall(mocker):
+    offshoot.config["allow"]["files"] = False
+    offshoot.config["allow"]["config"] = False
+    offshoot.config["allow"]["libraries"] = False
+    offshoot.config["allow"]["callbacks"] = False
+
+    TestPlugin.install()
+    TestPlugin2.install()
+
+    mocker.spy(TestPlugin2, "uninstall")
+
+    TestPlugin.uninstall(cascade=True)
+
+    assert TestPlugin2.uninstall.call_count == 1
+    assert len(offshoot.Manifest().list_plugins()) == 0
 
     offshoot.config["allow"]["files"] = True
     offshoot.config["allow"]["config"] = True
     offshoot.config["allow"]["libraries"] = True
     offshoot.config["allow"]["callbacks"] = True
 
+
 def test_teardown():
     os.remove("plugins")
     os.remove("config")
@@ -1192,5 +3400,8 @@ def test_teardown():
     if os.path.isfile("offshoot.manifest.json"):
         os.remove("offshoot.manifest.json")
 
+    if os.path.isfile("offshoot.manifest.lock"):
+        os.remove("offshoot.manifest.lock")
+
     if os.path.isfile("requirements.plugins.txt"):
         os.remove("requirements.plugins.txt")